@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlmodel import Session
+
+from auth import get_current_user
+from config import settings
+from db import get_read_session, pool_metrics
+from models import TokenData
+from services import analytics
+from services.google_books import governor, upstream_health
+from services.marvin_ai import llm_cache
+
+ADMIN_USERNAMES = {
+    name.strip() for name in settings.ADMIN_USERNAMES.split(",") if name.strip()
+}
+
+router = APIRouter()
+
+
+def require_admin(current_user: TokenData = Depends(get_current_user)) -> TokenData:
+    if current_user.username not in ADMIN_USERNAMES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required"
+        )
+    return current_user
+
+
+@router.get("/pool")
+def get_pool_metrics(admin: TokenData = Depends(require_admin)):
+    return pool_metrics()
+
+
+@router.get("/stats")
+def get_site_stats(
+    admin: TokenData = Depends(require_admin),
+    session: Session = Depends(get_read_session),
+):
+    return analytics.site_stats(session)
+
+
+@router.get("/google-books/quota")
+def get_google_quota(admin: TokenData = Depends(require_admin)):
+    return governor.metrics()
+
+
+@router.get("/google-books/health")
+def get_google_health(admin: TokenData = Depends(require_admin)):
+    return upstream_health()
+
+
+@router.get("/recommendations/cache")
+def get_recommendation_cache_stats(admin: TokenData = Depends(require_admin)):
+    return llm_cache.stats()
@@ -1,6 +1,7 @@
 import requests
 import streamlit as st
 
+from client_cache import cover_url, get_json
 from config import settings
 
 st.set_page_config(page_title="Book Tracker", layout="centered")
@@ -11,6 +12,7 @@ st.title("📚 ReadRadar")
 API_URL = settings.API_URL
 GOOGLE_BOOKS_SEARCH_URL = f"{API_URL}/google-books/search/"
 GOOGLE_BOOKS_DETAILS_URL = f"{API_URL}/google-books/details/"
+TRENDING_URL = f"{API_URL}/books/trending"
 
 # Ensure session state variables exist
 st.session_state.setdefault("access_token", None)
@@ -40,6 +42,10 @@ def get_user_from_api():
 if st.session_state.access_token:
     st.sidebar.success(f"Logged in as {st.session_state.username}")
     if st.sidebar.button("Logout"):
+        requests.post(
+            f"{API_URL}/auth/logout",
+            headers={"Authorization": f"Bearer {st.session_state.access_token}"},
+        )
         st.session_state.access_token = None
         st.session_state.username = None
         st.rerun()
@@ -81,10 +87,10 @@ if page != st.session_state.page:
 # Function to fetch and store book details in session state
 def fetch_book_details(book_id):
     details_url = f"{GOOGLE_BOOKS_DETAILS_URL}{book_id}/"
-    response = requests.get(details_url)
+    status_code, details = get_json(details_url)
 
-    if response.status_code == 200:
-        st.session_state.selected_book_details = response.json()
+    if status_code == 200:
+        st.session_state.selected_book_details = details
     else:
         st.session_state.selected_book_details = None
         st.error("Failed to fetch book details.")
@@ -143,7 +149,8 @@ if search_query and (
     with st.spinner("Searching for books..."):
         try:
             response = requests.get(
-                GOOGLE_BOOKS_SEARCH_URL, params={"term": search_query}
+                GOOGLE_BOOKS_SEARCH_URL,
+                params={"term": search_query, "prefetch": True},
             )
             if response.status_code == 200:
                 st.session_state.search_results = response.json()
@@ -157,15 +164,24 @@ if search_query and (
             st.error(f"An error occurred: {e}")
 
 
-if st.session_state.search_results:
-    st.success(f"Found {len(st.session_state.search_results)} books:")
+books = st.session_state.search_results
+if not books:
+    # Before the first search, show what other readers are picking up.
+    status_code, trending = get_json(TRENDING_URL, params={"limit": 10})
+    books = trending if status_code == 200 else []
+
+if books:
+    if st.session_state.search_results:
+        st.success(f"Found {len(books)} books:")
+    else:
+        st.subheader("🔥 Popular this week")
 
-    for book in st.session_state.search_results:
+    for book in books:
         with st.container():
             col1, col2 = st.columns([1, 3])
 
             with col1:
-                st.image(book["cover_image_url"], width=120, caption=book["title"])
+                st.image(cover_url(book["id"]), width=120, caption=book["title"])
 
             with col2:
                 st.subheader(book["title"])
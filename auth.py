@@ -1,62 +1,62 @@
-from datetime import UTC, datetime, timedelta
-
-import jwt
+from anyio import from_thread
 from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlmodel import Session, select
 
 from config import settings
-from db import get_session
-from models import Token, User, UserCreate, UserRead
+from db import get_read_session, get_session
+from models import Token, TokenData, User, UserCreate, UserRead
+from services.passwords import (
+    HashingBusy,
+    hash_password_async,
+    verify_and_update_async,
+)
+from services.tokens import (
+    InvalidToken,
+    create_access_token,
+    revocations,
+    verify_access_token,
+)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 router = APIRouter()
 
-SECRET_KEY = settings.SECRET_KEY
-ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
-
-def create_access_token(data: dict, expires_delta: timedelta = None):
-    to_encode = data.copy()
-    expire = datetime.now(UTC) + (
-        expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    )
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
 
 
 def get_current_user(
     request: Request,
     token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session),
-):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+) -> TokenData:
+    """Identity from the bearer token or cookie, verified without a DB query."""
     if not token:
         token = request.cookies.get("access_token")
     if not token:
         raise credentials_exception
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        print("JWT Payload:", payload)
-        if username is None:
-            raise credentials_exception
-    except jwt.PyJWTError:
+        return verify_access_token(token)
+    except InvalidToken:
         raise credentials_exception
 
-    user = session.exec(select(User).where(User.username == username)).first()
-    if user is None:
-        raise credentials_exception
-    return user
 
+def hashing_busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-ins in progress, please retry shortly.",
+        headers={"Retry-After": "1"},
+    )
 
+
+# The handlers are plain `def` so their DB calls run on FastAPI's threadpool;
+# hashing is handed back to the event loop, which awaits the hashing pool.
 @router.post("/users/", response_model=UserRead)
 def create_user(user: UserCreate, session: Session = Depends(get_session)):
     existing_user = session.exec(
@@ -69,7 +69,10 @@ def create_user(user: UserCreate, session: Session = Depends(get_session)):
         username=user.username,
         email=user.email,
     )
-    db_user.set_password(user.password)
+    try:
+        db_user.password_hash = from_thread.run(hash_password_async, user.password)
+    except HashingBusy:
+        raise hashing_busy_exception()
     session.add(db_user)
     session.commit()
     session.refresh(db_user)
@@ -83,14 +86,28 @@ def login_for_access_token(
     session: Session = Depends(get_session),
 ):
     user = session.exec(select(User).where(User.username == form_data.username)).first()
-    if not user or not user.verify_password(form_data.password):
+    verified, new_hash = False, None
+    if user:
+        try:
+            verified, new_hash = from_thread.run(
+                verify_and_update_async, form_data.password, user.password_hash
+            )
+        except HashingBusy:
+            raise hashing_busy_exception()
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Stored hash used an older scheme or cost factor; upgrade it now.
+        user.password_hash = new_hash
+        session.add(user)
+        session.commit()
+        session.refresh(user)
 
-    access_token = create_access_token({"sub": user.username})
+    access_token = create_access_token(user.id, user.username)
 
     response.set_cookie(
         key="access_token",
@@ -102,7 +119,7 @@ def login_for_access_token(
     )
 
     return {
-        "access_token": user.get_token(),
+        "access_token": access_token,
         "token_type": "bearer",
         "user": {
             "id": user.id,
@@ -114,11 +131,22 @@ def login_for_access_token(
 
 
 @router.post("/logout")
-def logout(response: Response):
+def logout(
+    response: Response,
+    current_user: TokenData = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    revocations.revoke(session, current_user.jti, current_user.expires_at)
     response.delete_cookie("access_token")
     return {"message": "Successfully logged out"}
 
 
 @router.get("/users/me", response_model=UserRead)
-def read_users_me(current_user: User = Depends(get_current_user)):
-    return current_user
+def read_users_me(
+    current_user: TokenData = Depends(get_current_user),
+    session: Session = Depends(get_read_session),
+):
+    user = session.get(User, current_user.id)
+    if user is None:
+        raise credentials_exception
+    return user
@@ -0,0 +1,54 @@
+"""Description cleaning: BeautifulSoup's get_text() against strip_tags.
+
+Cleans synthetic Google Books style descriptions of about `--length`
+characters with both and reports the time per call, e.g.
+
+    python -m benchmarks.description_cleaning --length 4000 --runs 2000
+"""
+
+import argparse
+import time
+
+from bs4 import BeautifulSoup
+
+from services.html_text import strip_tags
+
+PARAGRAPH = (
+    "<p><b>A sweeping saga</b> of love &amp; loss, set against the "
+    "backdrop of a city at war.<br>Told with warmth and &ldquo;wit&rdquo;, "
+    "it follows <i>three generations</i> &#8212; and one secret.</p>\n"
+)
+
+
+def description(length: int) -> str:
+    return PARAGRAPH * max(1, length // len(PARAGRAPH))
+
+
+def per_call(clean, markup: str, runs: int) -> float:
+    started = time.perf_counter()
+    for _ in range(runs):
+        clean(markup)
+    return (time.perf_counter() - started) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--length", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=1000)
+    args = parser.parse_args()
+
+    markup = description(args.length)
+    soup = lambda text: BeautifulSoup(text, "html.parser").get_text()  # noqa: E731
+    assert strip_tags(markup) == soup(markup)
+
+    baseline = per_call(soup, markup, args.runs)
+    streaming = per_call(strip_tags, markup, args.runs)
+    print(f"{len(markup)} chars, {args.runs} runs")
+    print(f"  BeautifulSoup  {baseline * 1e6:9.1f}us/call")
+    print(
+        f"  strip_tags     {streaming * 1e6:9.1f}us/call  ({baseline / streaming:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
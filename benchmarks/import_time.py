@@ -0,0 +1,59 @@
+"""Cold-start import cost of the API process.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter and
+reports the total plus the slowest top-level packages, e.g.
+
+    python -m benchmarks.import_time --top 15
+"""
+
+import argparse
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def measure(module: str = "main") -> dict[str, float]:
+    """Cumulative import seconds per module imported while importing `module`."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        # Indentation marks nesting; the first (outermost) entry wins.
+        cumulative.setdefault(name.strip(), int(cumulative_us) / 1_000_000)
+    return cumulative
+
+
+def top_level(cumulative: dict[str, float]) -> dict[str, float]:
+    packages = defaultdict(float)
+    for name, seconds in cumulative.items():
+        root = name.split(".")[0]
+        packages[root] = max(packages[root], seconds)
+    return dict(packages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    cumulative = measure(args.module)
+    print(f"import {args.module}: {cumulative[args.module]:.3f}s")
+    packages = sorted(top_level(cumulative).items(), key=lambda item: -item[1])
+    for name, seconds in packages[: args.top]:
+        print(f"  {seconds:8.3f}s  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Login throughput at several bcrypt cost factors.
+
+Times password verification the way /auth/token runs it (on the hashing
+process pool) against the old inline path (on request threads), e.g.
+
+    python -m benchmarks.login_throughput --rounds 10 11 12 --logins 64
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.passwords import HashingPool, pwd_context, verify_password
+
+
+def threaded(password: str, password_hash: str, logins: int, threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(
+            executor.map(
+                lambda _: verify_password(password, password_hash), range(logins)
+            )
+        )
+    return time.perf_counter() - start
+
+
+async def pooled(pool: HashingPool, password: str, password_hash: str, logins: int):
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(pool.run(verify_password, password, password_hash) for _ in range(logins))
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12])
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=40)
+    args = parser.parse_args()
+
+    pool = HashingPool(workers=args.workers, max_pending=args.logins)
+    # Start the worker processes before timing anything.
+    asyncio.run(pool.run(len, "warm-up"))
+
+    print(f"{'rounds':>6} {'ms/hash':>8} {'threads/s':>10} {'pool/s':>8}")
+    for rounds in args.rounds:
+        password_hash = pwd_context.hash("password123", rounds=rounds)
+
+        start = time.perf_counter()
+        verify_password("password123", password_hash)
+        single = time.perf_counter() - start
+
+        inline = threaded("password123", password_hash, args.logins, args.threads)
+        offloaded = asyncio.run(pooled(pool, "password123", password_hash, args.logins))
+        print(
+            f"{rounds:>6} {single * 1000:>8.1f} {args.logins / inline:>10.1f} "
+            f"{args.logins / offloaded:>8.1f}"
+        )
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Connection-pool behaviour under concurrent load.
+
+Runs `--threads` clients that each check out a connection, run a query and
+hold it for `--hold-ms` (standing in for request work) and reports
+throughput plus the pool's own wait/timeout metrics, e.g.
+
+    python -m benchmarks.pool_load --threads 50 --pool-size 10 --max-overflow 20
+"""
+
+import argparse
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+
+from config import settings
+from db import DATABASE_URL, create_pooled_engine
+
+
+def run(engine, threads: int, requests: int, hold: float) -> tuple[int, float]:
+    completed = 0
+    lock = threading.Lock()
+
+    def client():
+        nonlocal completed
+        for _ in range(requests):
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text("SELECT 1"))
+                    time.sleep(hold)
+            except PoolTimeout:
+                continue
+            with lock:
+                completed += 1
+
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return completed, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=DATABASE_URL)
+    parser.add_argument("--threads", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--hold-ms", type=float, default=20)
+    parser.add_argument("--pool-size", type=int, default=settings.DB_POOL_SIZE)
+    parser.add_argument("--max-overflow", type=int, default=settings.DB_MAX_OVERFLOW)
+    parser.add_argument("--pool-timeout", type=float, default=settings.DB_POOL_TIMEOUT)
+    args = parser.parse_args()
+
+    engine = create_pooled_engine(
+        args.url,
+        pool_size=args.pool_size,
+        max_overflow=args.max_overflow,
+        pool_timeout=args.pool_timeout,
+    )
+    completed, elapsed = run(engine, args.threads, args.requests, args.hold_ms / 1000)
+    metrics = engine.pool.metrics()
+    waits = metrics["wait_seconds"]
+    print(
+        f"pool_size={args.pool_size} max_overflow={args.max_overflow} "
+        f"threads={args.threads}"
+    )
+    print(f"  {completed} queries in {elapsed:.2f}s ({completed / elapsed:.0f}/s)")
+    print(
+        f"  checkout wait p50={waits['p50'] * 1000:.1f}ms "
+        f"p95={waits['p95'] * 1000:.1f}ms p99={waits['p99'] * 1000:.1f}ms"
+    )
+    print(f"  checkouts={metrics['checkouts']} timeouts={metrics['timeouts']}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
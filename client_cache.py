@@ -0,0 +1,47 @@
+import json
+
+import requests
+import streamlit as st
+
+from config import settings
+
+
+def get_json(url, params=None, headers=None):
+    """GET JSON, revalidating with If-None-Match against the copy from last time.
+
+    Responses are kept in the Streamlit session, so a rerun only downloads a
+    payload the API says has changed. Returns (status_code, data).
+    """
+    cache = st.session_state.setdefault("etag_cache", {})
+    key = (url, tuple(sorted((params or {}).items())))
+    headers = dict(headers or {})
+    if key in cache:
+        headers["If-None-Match"] = cache[key][0]
+
+    response = requests.get(url, params=params, headers=headers)
+    if response.status_code == 304:
+        return 200, cache[key][1]
+    if response.status_code != 200:
+        cache.pop(key, None)
+        return response.status_code, None
+
+    data = response.json()
+    if "ETag" in response.headers:
+        cache[key] = (response.headers["ETag"], data)
+    return 200, data
+
+
+def iter_sse(response):
+    """Yield (event, data) pairs from a text/event-stream response."""
+    event = "message"
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event: "):
+            event = line[len("event: ") :]
+        elif line.startswith("data: "):
+            yield event, json.loads(line[len("data: ") :])
+            event = "message"
+
+
+def cover_url(bookid: str, width: int = 120) -> str:
+    """The API's cached, resized copy of a Google Books cover."""
+    return f"{settings.API_URL}/covers/{bookid}?w={width}"
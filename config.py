@@ -1,6 +1,6 @@
 import os
+import sys
 
-import streamlit as st
 from pydantic_settings import BaseSettings
 
 
@@ -14,12 +14,70 @@ class Settings(BaseSettings):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
+    DATABASE_REPLICA_URL: str = ""
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+    CHANGELOG_RETENTION_DAYS: int = 30
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 10.0
+    DB_POOL_RECYCLE: int = 1800
+    ADMIN_USERNAMES: str = ""
+    ANALYTICS_REFRESH_SECONDS: int = 300
+    ANALYTICS_CHUNK_SIZE: int = 50_000
+    # Totals for the deployment; each API worker gets its `per_worker` share.
+    GOOGLE_QUOTA_PER_MINUTE: int = 60
+    GOOGLE_QUOTA_PER_DAY: int = 1000
+    GOOGLE_TIMEOUT_SECONDS: float = 5.0
+    GOOGLE_SLOW_CALL_SECONDS: float = 2.0
+    GOOGLE_BREAKER_FAILURES: int = 5
+    GOOGLE_BREAKER_RESET_SECONDS: float = 30.0
+    GOOGLE_HEDGE_REQUESTS: bool = False
+    COOCCURRENCE_SNAPSHOT: str = "cooccurrence.npz"
+    COOCCURRENCE_REBUILD_SECONDS: float = 15 * 60
+    TRENDING_SNAPSHOT: str = "trending.json"
+    COVER_CACHE_DIR: str = "covers"
+    COVER_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    TRENDING_SYNC_SECONDS: float = 60.0
+    # Job threads per API worker process.
+    JOB_WORKERS: int = 2
+    JOB_POLL_SECONDS: float = 1.0
+    CACHE_BACKEND: str = "memory"
+    CACHE_PATH: str = "cache.sqlite3"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    LLM_MODEL: str = "gpt-4o"
+    LLM_CACHE_PATH: str = "llm_cache.sqlite3"
+    LLM_CACHE_TTL_SECONDS: int = 30 * 24 * 60 * 60
+    LLM_CACHE_MAX_ENTRIES: int = 20_000
+    BCRYPT_ROUNDS: int = 12
+    PREVIOUS_SECRET_KEYS: str = ""
+    REVOCATION_SYNC_SECONDS: float = 30.0
+    PASSWORD_HASH_WORKERS: int | None = None
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    # API worker processes; gunicorn.conf.py exports it for the workers.
+    WEB_CONCURRENCY: int = 1
+
+    def per_worker(self, total: int) -> int:
+        """This worker's share of a deployment-wide limit of `total`."""
+        return max(1, total // max(1, self.WEB_CONCURRENCY))
 
     class Config:
         env_file = ".env"
         extra = "allow"
 
 
+def streamlit_secrets():
+    """Streamlit secrets when they hold a database section, else None.
+
+    Only called once Streamlit is already imported (i.e. inside
+    `streamlit run`), so the API process never imports it.
+    """
+    import streamlit as st
+
+    if "database" in st.secrets:
+        return st.secrets
+    return None
+
+
 def load_settings():
     """Load settings from environment variables for FastAPI or from Streamlit secrets for Streamlit."""
     if "ALEMBIC" in os.environ:
@@ -44,31 +102,25 @@ def load_settings():
             POSTGRES_PASSWORD=os.getenv("POSTGRES_PASSWORD", ""),
             POSTGRES_DB=os.getenv("POSTGRES_DB", ""),
         )
-    elif (
-        not os.getenv("ALEMBIC") and "database" in st.secrets
-    ):  # Check if running in Streamlit
+    elif "streamlit" in sys.modules and (secrets := streamlit_secrets()):
         print("✅ Found 'database' in secrets.")
         print(
             "🔹 DATABASE_URL from secrets:",
-            st.secrets["database"].get("DATABASE_URL", "❌ Not Found"),
+            secrets["database"].get("DATABASE_URL", "❌ Not Found"),
         )
 
         return Settings(
-            SECRET_KEY=st.secrets.get("security", {}).get(
-                "SECRET_KEY", "default_secret"
-            ),
-            ALGORITHM=st.secrets.get("security", {}).get("ALGORITHM", "HS256"),
-            ACCESS_TOKEN_EXPIRE_MINUTES=st.secrets.get("security", {}).get(
+            SECRET_KEY=secrets.get("security", {}).get("SECRET_KEY", "default_secret"),
+            ALGORITHM=secrets.get("security", {}).get("ALGORITHM", "HS256"),
+            ACCESS_TOKEN_EXPIRE_MINUTES=secrets.get("security", {}).get(
                 "ACCESS_TOKEN_EXPIRE_MINUTES", 30
             ),
-            API_URL=st.secrets.get("api", {}).get("API_URL", "http://localhost:8000"),
-            OPENAI_API_KEY=st.secrets.get("openai", {}).get("OPENAI_API_KEY", ""),
-            DATABASE_URL=st.secrets.get("database", {}).get("DATABASE_URL", ""),
-            POSTGRES_USER=st.secrets.get("database", {}).get("POSTGRES_USER", ""),
-            POSTGRES_PASSWORD=st.secrets.get("database", {}).get(
-                "POSTGRES_PASSWORD", ""
-            ),
-            POSTGRES_DB=st.secrets.get("database", {}).get("POSTGRES_DB", ""),
+            API_URL=secrets.get("api", {}).get("API_URL", "http://localhost:8000"),
+            OPENAI_API_KEY=secrets.get("openai", {}).get("OPENAI_API_KEY", ""),
+            DATABASE_URL=secrets.get("database", {}).get("DATABASE_URL", ""),
+            POSTGRES_USER=secrets.get("database", {}).get("POSTGRES_USER", ""),
+            POSTGRES_PASSWORD=secrets.get("database", {}).get("POSTGRES_PASSWORD", ""),
+            POSTGRES_DB=secrets.get("database", {}).get("POSTGRES_DB", ""),
         )
     else:
         print("❌ No 'database' found in secrets.")
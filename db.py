@@ -1,20 +1,161 @@
+import time
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
 from sqlmodel import Session, SQLModel, create_engine, select
 
 from config import settings
 from models import User
+from services.cache import make_cache
+from services.resilience import LatencyStats
+from services.tokens import InvalidToken, verify_access_token
 
 DATABASE_URL = settings.DATABASE_URL
+REPLICA_URL = settings.DATABASE_REPLICA_URL
 
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+if REPLICA_URL.startswith("postgres://"):
+    REPLICA_URL = REPLICA_URL.replace("postgres://", "postgresql://", 1)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait and how often they time out."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_times = LatencyStats(window=1000)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.disconnects = 0
+
+    def _do_get(self):
+        started = time.monotonic()
+        try:
+            connection = super()._do_get()
+        except PoolTimeout:
+            self.timeouts += 1
+            raise
+        self.wait_times.record(time.monotonic() - started)
+        self.checkouts += 1
+        return connection
+
+    def recreate(self):
+        # Pool invalidation builds a fresh pool; carry the counters over.
+        pool = super().recreate()
+        pool.wait_times = self.wait_times
+        pool.checkouts = self.checkouts
+        pool.timeouts = self.timeouts
+        pool.disconnects = self.disconnects
+        return pool
+
+    def metrics(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "disconnects": self.disconnects,
+            "wait_seconds": self.wait_times.summary(),
+        }
+
+
+def create_pooled_engine(
+    url: str,
+    pool_size: int = settings.DB_POOL_SIZE,
+    max_overflow: int = settings.DB_MAX_OVERFLOW,
+    pool_timeout: float = settings.DB_POOL_TIMEOUT,
+    pool_recycle: int = settings.DB_POOL_RECYCLE,
+):
+    """Engine with an instrumented pool and no per-checkout pre-ping.
+
+    Instead of a round-trip on every checkout, idle connections are kept
+    alive with TCP keepalives and recycled before server-side timeouts; a
+    connection that still turns out dead fails one request and invalidates
+    every older connection in the pool at once.
+    """
+    connect_args = {}
+    if url.startswith("postgresql"):
+        connect_args = {
+            "keepalives": 1,
+            "keepalives_idle": 30,
+            "keepalives_interval": 10,
+            "keepalives_count": 3,
+        }
+    engine = create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=False,
+        connect_args=connect_args,
+    )
+
+    @event.listens_for(engine, "handle_error")
+    def count_disconnects(context):
+        if context.is_disconnect:
+            engine.pool.disconnects += 1
+            context.invalidate_pool_on_disconnect = True
 
-engine = create_engine(
-    DATABASE_URL, pool_size=10, max_overflow=20, pool_pre_ping=True, pool_recycle=1800
+    return engine
+
+
+engine = create_pooled_engine(DATABASE_URL)
+replica_engine = create_pooled_engine(REPLICA_URL) if REPLICA_URL else engine
+
+# Users who committed a write recently; their reads stay on the primary until
+# the replica has caught up. Shared between workers with a shared backend.
+recent_writers = make_cache(
+    "recent-writers", ttl=settings.READ_YOUR_WRITES_SECONDS, maxsize=10_000
 )
 
 
-def get_session():
+def pool_metrics() -> dict:
+    metrics = {"primary": engine.pool.metrics()}
+    if replica_engine is not engine:
+        metrics["replica"] = replica_engine.pool.metrics()
+    return metrics
+
+
+def request_user_id(request: Request) -> int | None:
+    authorization = request.headers.get("Authorization", "")
+    token = authorization.removeprefix("Bearer ").strip() or request.cookies.get(
+        "access_token"
+    )
+    if not token:
+        return None
+    try:
+        return verify_access_token(token).id
+    except InvalidToken:
+        return None
+
+
+def get_session(request: Request):
+    """Primary session; a commit pins the requesting user's reads to the primary."""
     with Session(engine) as session:
+        user_id = request_user_id(request)
+        if user_id is not None:
+            event.listen(
+                session, "after_commit", lambda _: recent_writers.set(user_id, True)
+            )
+        yield session
+
+
+def get_read_session(request: Request):
+    """Session for read-only endpoints, served by the replica when one is set."""
+    chosen = replica_engine
+    if chosen is not engine:
+        user_id = request_user_id(request)
+        if user_id is not None and user_id in recent_writers:
+            chosen = engine
+    with Session(chosen) as session:
         yield session
 
 
@@ -0,0 +1,42 @@
+import os
+
+
+def available_cores() -> int:
+    # Respects CPU pinning in containers, unlike os.cpu_count().
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", available_cores()))
+# Workers read this back (settings.WEB_CONCURRENCY) to size their share of
+# state that stays per process:
+# - the Google Books quota governor and prefetch budget each get 1/workers
+#   of GOOGLE_QUOTA_PER_MINUTE / GOOGLE_QUOTA_PER_DAY, so together they
+#   stay within the configured quota;
+# - the default password hashing pool is split across workers the same way;
+# - JOB_WORKERS job threads start in every worker (claims are atomic, so
+#   this only multiplies concurrency; set JOB_WORKERS=0 to run jobs in a
+#   separate `python -m services.jobs` process instead);
+# - circuit breakers trip per worker, on the failures that worker sees;
+# - the co-occurrence index only applies the writes its worker served and is
+#   rebuilt from the DB every COOCCURRENCE_REBUILD_SECONDS to catch up.
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# Graceful restarts: `kill -HUP <master>` replaces workers one by one, and a
+# worker being stopped gets this long to finish in-flight requests.
+graceful_timeout = 30
+timeout = 60
+keepalive = 5
+
+# Recycle workers now and then so slow leaks cannot accumulate.
+max_requests = 2000
+max_requests_jitter = 200
+
+# Per-process caches would each warm up separately; share them via a file
+# unless a backend (e.g. redis) was chosen explicitly.
+if workers > 1:
+    os.environ.setdefault("CACHE_BACKEND", "sqlite")
@@ -1,52 +1,119 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from typing import Optional
 
+import httpx
 import uvicorn
-from fastapi import Body, Depends, FastAPI, HTTPException, Query, Request
+from fastapi import (
+    Body,
+    Depends,
+    FastAPI,
+    HTTPException,
+    Path,
+    Query,
+    Request,
+    Response,
+)
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import desc
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import desc, or_
 from sqlmodel import Session, select
 
+from admin import router as admin_router
 from auth import get_current_user
 from auth import router as auth_router
 from config import settings
-from db import create_db_and_tables, get_session
+from db import create_db_and_tables, engine, get_read_session, get_session
 from models import (
+    BatchRecommendationRequest,
     Book,
     BookCreate,
     BookDetails,
     BookRead,
     BookSearchResult,
+    LibraryVersionRead,
     RateLimit,
+    ReadingStats,
+    RecommendationJob,
+    RecommendationJobCreate,
+    RecommendationJobRead,
     SaveBookRequest,
     StatusEnum,
+    TokenData,
     User,
+    UserBookBatchRequest,
+    UserBookBatchResponse,
+    UserBookChangeRead,
+    UserBookDelta,
     UserBookResponse,
     UserBookStatus,
     UserBookStatusUpdate,
+    UserBookTombstone,
     UserRead,
 )
+from services import cooccurrence, covers, jobs, library, reading_stats, trending
+from services.cache import TTLCache
 from services.google_books import (
+    PREFETCH_TOP_K,
+    UPSTREAM_UNAVAILABLE,
+    Prefetch,
+    UpstreamServerError,
     clean_and_shorten_description,
     get_book_details,
+    prefetch_book_details,
     search_books,
 )
-from services.marvin_ai import recommend_similar_books
+from services.http_cache import conditional_response, is_not_modified, make_etag
+from services.marvin_ai import (
+    SeedBook,
+    recommend_for_seed,
+    recommend_for_seeds,
+)
+from services.passwords import hashing_pool
+from services.quota import Priority, QuotaExceeded
+from services.recommender import recommend_from_catalogue, recommender, search_entry
+from services.resilience import CircuitOpenError
+from services.tokens import revocations
 
 OPENAI_API_KEY = settings.OPENAI_API_KEY
 API_URL = settings.API_URL
 
 
+job_pool: jobs.JobWorkerPool | None = None
+
+
 @asynccontextmanager
 async def lifespan(app):
+    global job_pool
     create_db_and_tables()
+    cooccurrence.index.load_snapshot(settings.COOCCURRENCE_SNAPSHOT)
+    cooccurrence.start(engine, settings.COOCCURRENCE_REBUILD_SECONDS)
+    if settings.JOB_WORKERS > 0:
+        job_pool = jobs.JobWorkerPool(
+            engine,
+            run_recommendation_job,
+            concurrency=settings.JOB_WORKERS,
+            poll_interval=settings.JOB_POLL_SECONDS,
+        )
+        job_pool.start()
+    revocations.start(engine, settings.REVOCATION_SYNC_SECONDS)
+    trending.tracker.start(settings.TRENDING_SNAPSHOT, settings.TRENDING_SYNC_SECONDS)
     yield
+    cooccurrence.stop()
+    trending.tracker.stop()
+    revocations.stop()
+    if job_pool is not None:
+        job_pool.stop()
+    hashing_pool.shutdown()
 
 
 app = FastAPI(lifespan=lifespan)
 
 app.include_router(auth_router, prefix="/auth", tags=["Auth"])
+app.include_router(admin_router, prefix="/admin", tags=["Admin"])
 
 
 app.add_middleware(
@@ -57,8 +124,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.exception_handler(QuotaExceeded)
+@app.exception_handler(CircuitOpenError)
+@app.exception_handler(UpstreamServerError)
+def upstream_unavailable_handler(
+    request: Request, exc: QuotaExceeded | CircuitOpenError | UpstreamServerError
+):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(int(exc.retry_after) + 1)},
+    )
+
+
+@app.exception_handler(httpx.TransportError)
+def upstream_unreachable_handler(request: Request, exc: httpx.TransportError):
+    # Timeouts and connection errors before the breaker has opened.
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Google Books could not be reached, please retry."},
+        headers={"Retry-After": str(int(UpstreamServerError.retry_after) + 1)},
+    )
+
+
 RATE_LIMIT = 5
 TIME_WINDOW = 60
+DETAILS_MAX_AGE = 5 * 60
+TRENDING_MAX_AGE = 60
+COVER_MAX_AGE = 7 * 24 * 60 * 60
+
+RESOLVE_MAX_WORKERS = 8
+resolve_executor = ThreadPoolExecutor(
+    max_workers=RESOLVE_MAX_WORKERS, thread_name_prefix="resolve-titles"
+)
+
+# Latest detail prefetch per client, cancelled when that client searches again.
+active_prefetches = TTLCache(ttl=TIME_WINDOW, maxsize=1024)
 
 
 def get_client_ip(request: Request) -> str:
@@ -93,29 +195,95 @@ def check_rate_limit(client_ip: int, endpoint: str, db: Session = Depends(get_se
 def get_recommendations(
     title: str, authors: list[str] = [], description: str = ""
 ) -> list[BookSearchResult]:
-    recommended_titles = recommend_similar_books(
-        title=title, authors=authors, description=description
+    recommended_titles = recommend_for_seed(
+        SeedBook(title=title, authors=authors, description=description)
+    )
+    return resolve_recommendations(
+        recommended_titles, resolve_titles(recommended_titles)
     )
 
-    cleaned_titles = [title.split(" by ")[0] for title in recommended_titles]
-
-    recommendations = []
-    for title in cleaned_titles:
-        google_books_results = search_books(title)
-
-        if google_books_results:
-            first_result = google_books_results[0]
-            recommendations.append(
-                BookSearchResult(
-                    id=first_result["google_id"],
-                    title=first_result["title"],
-                    authors=first_result["authors"],
-                    published_date=first_result["published_date"],
-                    cover_image_url=first_result["cover_image_url"],
-                )
-            )
 
-    return recommendations
+def seed_from_book(book: Book) -> SeedBook:
+    return SeedBook(
+        title=book.title,
+        authors=book.authors.split(", ") if book.authors else [],
+        description=book.description or "",
+    )
+
+
+def clean_title(title: str) -> str:
+    return title.split(" by ")[0]
+
+
+def _first_match(title: str) -> BookSearchResult | None:
+    try:
+        google_books_results = search_books(title, priority=Priority.BACKGROUND)
+    except UPSTREAM_UNAVAILABLE as e:
+        print(f"Could not resolve recommended title '{title}': {e}")
+        return None
+    if not google_books_results:
+        return None
+    return to_search_result(google_books_results[0])
+
+
+def resolve_titles(titles: list[str]) -> dict[str, BookSearchResult]:
+    """Look up each distinct recommended title on Google Books concurrently."""
+    unique = list(dict.fromkeys(clean_title(title) for title in titles))
+    matches = resolve_executor.map(_first_match, unique)
+    return {title: match for title, match in zip(unique, matches) if match}
+
+
+def resolve_recommendations(
+    titles: list[str], resolved: dict[str, BookSearchResult]
+) -> list[BookSearchResult]:
+    return [
+        resolved[clean_title(title)]
+        for title in titles
+        if clean_title(title) in resolved
+    ]
+
+
+def to_search_result(book: dict) -> BookSearchResult:
+    return BookSearchResult(
+        id=book["google_id"],
+        title=book["title"],
+        authors=book["authors"],
+        published_date=book["published_date"],
+        cover_image_url=book["cover_image_url"],
+    )
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_recommendations(seed: SeedBook, local: list[dict] | None = None):
+    """Yield each recommendation as an SSE event as soon as it is resolved."""
+    try:
+        if local:
+            for entry in local:
+                yield sse_event("book", to_search_result(entry).model_dump())
+        else:
+            titles = recommend_for_seed(seed)
+            unique = list(dict.fromkeys(clean_title(title) for title in titles))
+            lookups = [resolve_executor.submit(_first_match, title) for title in unique]
+            for lookup in as_completed(lookups):
+                match = lookup.result()
+                if match:
+                    yield sse_event("book", match.model_dump())
+    except Exception as e:
+        # Headers are already sent, so errors are reported in-band.
+        print(f"Recommendation stream failed: {e}")
+        yield sse_event("error", {"detail": "Failed to generate recommendations."})
+    yield sse_event("done", {})
+
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 def parse_published_date(date_str: str) -> Optional[datetime.date]:
@@ -130,6 +298,51 @@ def parse_published_date(date_str: str) -> Optional[datetime.date]:
     return None
 
 
+def search_local_catalogue(session: Session, term: str, limit: int = 10) -> list[dict]:
+    """Match saved books by title or author, shaped like `search_books` results."""
+    # Wildcards in the term are literal text, not LIKE patterns.
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    pattern = f"%{escaped}%"
+    books = session.exec(
+        select(Book)
+        .where(
+            or_(
+                Book.title.ilike(pattern, escape="\\"),
+                Book.authors.ilike(pattern, escape="\\"),
+            )
+        )
+        .limit(limit)
+    ).all()
+    return [search_entry(book) for book in books]
+
+
+def local_book_details(session: Session, book_id: str) -> dict | None:
+    """Build Google-style volume info for a book already in the catalogue."""
+    book = session.exec(select(Book).where(Book.bookid == book_id)).first()
+    if book is None:
+        return None
+    return {
+        "title": book.title,
+        "authors": book.authors.split(", ") if book.authors else [],
+        "publisher": book.publisher or "N/A",
+        "publishedDate": book.published_date.strftime("%Y-%m-%d")
+        if book.published_date
+        else "N/A",
+        "description": book.description or "",
+    }
+
+
+def get_book_details_or_local(session: Session, book_id: str) -> dict | None:
+    try:
+        return get_book_details(book_id)
+    except UPSTREAM_UNAVAILABLE:
+        details = local_book_details(session, book_id)
+        if details is None:
+            raise
+        print(f"Google Books unavailable, serving local details for {book_id}")
+        return details
+
+
 @app.get("/")
 def root():
     return {"message": "FastAPI is running!"}
@@ -141,8 +354,8 @@ if __name__ == "__main__":
 
 @app.get("/users/", response_model=list[UserRead])
 def get_users(
-    current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    current_user: TokenData = Depends(get_current_user),
+    session: Session = Depends(get_read_session),
 ):
     users = session.exec(select(User)).all()
     return users
@@ -151,7 +364,7 @@ def get_users(
 @app.post("/books/", response_model=BookRead)
 def create_book(
     book: BookCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: TokenData = Depends(get_current_user),
     session: Session = Depends(get_session),
 ):
     db_book = Book(
@@ -165,11 +378,12 @@ def create_book(
     session.add(db_book)
     session.commit()
     session.refresh(db_book)
+    recommender.mark_stale()
     return db_book
 
 
 @app.get("/books/", response_model=list[BookRead])
-def get_books(session: Session = Depends(get_session)):
+def get_books(session: Session = Depends(get_read_session)):
     books = session.exec(select(Book)).all()
     return [BookRead.model_validate(book, from_attributes=True) for book in books]
 
@@ -177,54 +391,143 @@ def get_books(session: Session = Depends(get_session)):
 @app.post("/user-books/", response_model=UserBookStatus)
 def add_user_book(
     user_book: UserBookStatus,
-    current_user: User = Depends(get_current_user),
+    current_user: TokenData = Depends(get_current_user),
     session: Session = Depends(get_session),
 ):
     db_user_book = UserBookStatus(**user_book.model_dump())
     session.add(db_user_book)
     session.commit()
     session.refresh(db_user_book)
+    cooccurrence.record_change(
+        session,
+        db_user_book.user_id,
+        db_user_book.book_id,
+        0.0,
+        cooccurrence.interaction_weight(db_user_book.status, db_user_book.rating),
+    )
     return db_user_book
 
 
-@app.get("/user-books/", response_model=list[UserBookResponse])
+def user_book_response(user_book_status: UserBookStatus, book: Book):
+    return UserBookResponse(
+        id=book.id,
+        title=book.title,
+        bookid=book.bookid,
+        description=book.description,
+        authors=book.authors,
+        publisher=book.publisher,
+        published_date=book.published_date,
+        created_at=user_book_status.created_at,
+        status=user_book_status.status,
+        rating=user_book_status.rating,
+        notes=user_book_status.notes,
+    )
+
+
+@app.get("/user-books/version", response_model=LibraryVersionRead)
+def get_library_version(
+    user_id: int,
+    current_user: TokenData = Depends(get_current_user),
+    session: Session = Depends(get_read_session),
+):
+    version, _ = library.current_version(session, user_id)
+    return {"user_id": user_id, "version": version}
+
+
+@app.get("/user-books/stats", response_model=ReadingStats)
+def get_reading_stats(
+    user_id: int,
+    current_user: TokenData = Depends(get_current_user),
+    session: Session = Depends(get_read_session),
+):
+    return reading_stats.summary(session, user_id)
+
+
+# Sent when a delta cursor predates compacted deletes; the client has to
+# fetch its library again from scratch (since=0 / after_id=0).
+resync_required = HTTPException(
+    status_code=410,
+    detail="Change history before this cursor was compacted; do a full resync.",
+)
+
+
+@app.get("/user-books/changes", response_model=list[UserBookChangeRead])
+def get_user_book_changes(
+    user_id: int,
+    after_id: int = Query(0, ge=0, description="Last change id the client has seen"),
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: TokenData = Depends(get_current_user),
+    session: Session = Depends(get_read_session),
+):
+    if library.resync_needed(session, user_id, after_id=after_id):
+        raise resync_required
+    return library.changes_after(session, user_id, after_id, limit)
+
+
+@app.get("/user-books/", response_model=list[UserBookResponse] | UserBookDelta)
 def get_user_books(
+    request: Request,
     user_id: int,
     status: str = None,
-    current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    since: int | None = Query(
+        None, ge=0, description="Only return changes after this library version"
+    ),
+    current_user: TokenData = Depends(get_current_user),
+    session: Session = Depends(get_read_session),
 ):
-    query = (
-        select(UserBookStatus, Book)
-        .join(Book, UserBookStatus.book_id == Book.id)
-        .where(UserBookStatus.user_id == user_id)
-        .order_by(desc(UserBookStatus.created_at))
+    version, last_modified = library.current_version(session, user_id)
+    if since is not None:
+        if library.resync_needed(session, user_id, since=since):
+            raise resync_required
+        return get_user_books_delta(session, user_id, since, version)
+
+    def build():
+        query = (
+            select(UserBookStatus, Book)
+            .join(Book, UserBookStatus.book_id == Book.id)
+            .where(UserBookStatus.user_id == user_id)
+            .order_by(desc(UserBookStatus.created_at))
+        )
+        if status:
+            query = query.where(UserBookStatus.status == status)
+        user_books = session.exec(query).all()
+        if not user_books:
+            raise HTTPException(status_code=404, detail="No saved books found.")
+        return [user_book_response(*row) for row in user_books]
+
+    return conditional_response(
+        request,
+        make_etag("user-books", user_id, status, version),
+        build,
+        cache_control="private, no-cache",
+        last_modified=last_modified,
     )
 
-    if status:
-        query = query.where(UserBookStatus.status == status)
-    user_books = session.exec(query).all()
-
-    if not user_books:
-        raise HTTPException(status_code=404, detail="No saved books found.")
-
-    books_with_details = [
-        UserBookResponse(
-            id=book.id,
-            title=book.title,
-            bookid=book.bookid,
-            description=book.description,
-            authors=book.authors,
-            publisher=book.publisher,
-            published_date=book.published_date,
-            created_at=user_book_status.created_at,
-            status=user_book_status.status,
-            rating=user_book_status.rating,
-            notes=user_book_status.notes,
-        )
-        for user_book_status, book in user_books
-    ]
-    return books_with_details
+
+def get_user_books_delta(
+    session: Session, user_id: int, since: int, version: int
+) -> UserBookDelta:
+    """Rows changed and book ids removed after `since`, whatever their status."""
+    changed, deleted = [], []
+    if since < version:
+        changed = session.exec(
+            select(UserBookStatus, Book)
+            .join(Book, UserBookStatus.book_id == Book.id)
+            .where(UserBookStatus.user_id == user_id)
+            .where(UserBookStatus.version > since)
+            .order_by(desc(UserBookStatus.created_at))
+        ).all()
+        deleted = session.exec(
+            select(UserBookTombstone.book_id)
+            .where(UserBookTombstone.user_id == user_id)
+            .where(UserBookTombstone.version > since)
+        ).all()
+    return UserBookDelta(
+        since=since,
+        version=version,
+        changed=[user_book_response(*row) for row in changed],
+        deleted=list(deleted),
+    )
 
 
 @app.patch("/user-books/{user_id}/{book_id}/", response_model=UserBookStatus)
@@ -232,7 +535,7 @@ def update_user_book(
     user_id: int,
     book_id: int,
     updates: UserBookStatusUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: TokenData = Depends(get_current_user),
     session: Session = Depends(get_session),
 ):
     db_user_book = session.exec(
@@ -244,20 +547,50 @@ def update_user_book(
     if db_user_book is None:
         raise HTTPException(status_code=404, detail="UserBookStatus not found.")
 
+    old_weight = cooccurrence.interaction_weight(
+        db_user_book.status, db_user_book.rating
+    )
     for key, value in updates.model_dump(exclude_unset=True).items():
         setattr(db_user_book, key, value)
 
     session.add(db_user_book)
     session.commit()
     session.refresh(db_user_book)
+    cooccurrence.record_change(
+        session,
+        user_id,
+        book_id,
+        old_weight,
+        cooccurrence.interaction_weight(db_user_book.status, db_user_book.rating),
+    )
     return db_user_book
 
 
+@app.post("/user-books/batch/", response_model=UserBookBatchResponse)
+def batch_update_user_books(
+    batch: UserBookBatchRequest,
+    current_user: TokenData = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    version, results, previous = library.apply_batch(
+        session, batch.user_id, batch.items
+    )
+    cooccurrence.record_changes(
+        session,
+        batch.user_id,
+        {
+            book_id: cooccurrence.interaction_weight(status, rating)
+            for book_id, (status, rating) in previous.items()
+        },
+    )
+    return UserBookBatchResponse(version=version, results=results)
+
+
 @app.delete("/user-books/{user_id}/{book_id}/", status_code=204)
 def delete_user_book(
     user_id: int,
     book_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: TokenData = Depends(get_current_user),
     session: Session = Depends(get_session),
 ):
     db_user_book = session.exec(
@@ -267,24 +600,53 @@ def delete_user_book(
     ).first()
     if db_user_book is None:
         raise HTTPException(status_code=404, detail="UserBookStatus not found.")
+    old_weight = cooccurrence.interaction_weight(
+        db_user_book.status, db_user_book.rating
+    )
     session.delete(db_user_book)
     session.commit()
+    cooccurrence.record_change(session, user_id, book_id, old_weight, 0.0)
     return {"detail": "UserBookStatus deleted"}
 
 
 @app.get("/google-books/search/", response_model=list[BookSearchResult])
 def search_google_books(
+    request: Request,
+    session: Session = Depends(get_read_session),
     term: str = Query(
         ..., min_length=1, max_length=100, description="Search term for Google Books"
     ),
+    prefetch: bool = Query(
+        False, description="Warm the details cache for the top results"
+    ),
+    prefetch_top_k: int = Query(PREFETCH_TOP_K, ge=1, le=20),
 ):
-    books = search_books(term)
+    try:
+        books = search_books(term)
+    except UPSTREAM_UNAVAILABLE:
+        books = search_local_catalogue(session, term)
+        if not books:
+            raise
+        print(f"Google Books unavailable, serving local results for: {term}")
+        prefetch = False
 
     if not books:
         raise HTTPException(
             status_code=404, detail=f"No books found for the search term '{term}'."
         )
 
+    if prefetch:
+        client_ip = get_client_ip(request)
+        previous: Prefetch | None = active_prefetches.get(client_ip)
+        if previous is not None:
+            previous.cancel()
+        active_prefetches.set(
+            client_ip,
+            prefetch_book_details(
+                [book["google_id"] for book in books], top_k=prefetch_top_k
+            ),
+        )
+
     return [
         {
             "id": book["google_id"],
@@ -298,13 +660,24 @@ def search_google_books(
 
 
 @app.get("/google-books/details/{book_id}/", response_model=BookDetails)
-def get_google_book_details(book_id: str):
-    details = get_book_details(book_id)
+def get_google_book_details(
+    book_id: str, request: Request, session: Session = Depends(get_read_session)
+):
+    details = get_book_details_or_local(session, book_id)
     if not details:
         raise HTTPException(
             status_code=404, detail="Book with ID: '{book_id}' not found."
         )
 
+    return conditional_response(
+        request,
+        make_etag("details", book_id, details),
+        lambda: book_details_response(book_id, details),
+        cache_control=f"public, max-age={DETAILS_MAX_AGE}",
+    )
+
+
+def book_details_response(book_id: str, details: dict) -> dict:
     published_date = details.get("publishedDate", "N/A")
 
     if isinstance(published_date, str) and "T" in published_date:
@@ -317,7 +690,9 @@ def get_google_book_details(book_id: str):
         "authors": details.get("authors", []),
         "publisher": details.get("publisher", "N/A"),
         "published_date": published_date,
-        "description": clean_and_shorten_description(details.get("description", "N/A")),
+        "description": clean_and_shorten_description(
+            details.get("description", "N/A"), volume_id=book_id
+        ),
     }
 
 
@@ -326,7 +701,7 @@ def save_google_book(
     book_id: str, request: SaveBookRequest, session: Session = Depends(get_session)
 ):
     user_id = request.user_id
-    details = get_book_details(book_id)
+    details = get_book_details_or_local(session, book_id)
     if not details:
         raise HTTPException(
             status_code=404, detail="Book with ID: '{book_id}' not found."
@@ -339,7 +714,9 @@ def save_google_book(
         db_book = Book(
             bookid=book_id,
             title=details.get("title", "N/A"),
-            description=clean_and_shorten_description(details.get("description", "")),
+            description=clean_and_shorten_description(
+                details.get("description", ""), volume_id=book_id
+            ),
             authors=", ".join(details.get("authors", [])),
             publisher=details.get("publisher", "N/A"),
             published_date=parse_published_date(details.get("publishedDate", "N/A")),
@@ -347,6 +724,7 @@ def save_google_book(
         session.add(db_book)
         session.commit()
         session.refresh(db_book)
+        recommender.mark_stale()
 
     db_user_book = session.exec(
         select(UserBookStatus).where(
@@ -363,6 +741,13 @@ def save_google_book(
         session.add(user_book_status)
         session.commit()
         session.refresh(user_book_status)
+        cooccurrence.record_change(
+            session,
+            user_id,
+            db_book.id,
+            0.0,
+            cooccurrence.interaction_weight(user_book_status.status),
+        )
         return user_book_status
     else:
         raise HTTPException(status_code=400, detail="Book is already saved by user.")
@@ -372,19 +757,158 @@ def save_google_book(
 def get_book_recommendations(
     book_id: int, request: Request, session: Session = Depends(get_session)
 ):
+    book = session.get(Book, book_id)
+
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+
+    local = recommend_from_catalogue(session, book)
+    if local:
+        return [to_search_result(entry) for entry in local]
+
+    # Only the LLM path costs money, so only it counts against the rate limit.
     client_ip = get_client_ip(request)
     check_rate_limit(client_ip, "/books/recommendations/", session)
 
+    seed = seed_from_book(book)
+    return get_recommendations(
+        title=seed.title, authors=seed.authors, description=seed.description
+    )
+
+
+@app.get("/books/{book_id}/recommendations/stream")
+def stream_book_recommendations(
+    book_id: int, request: Request, session: Session = Depends(get_session)
+):
     book = session.get(Book, book_id)
 
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
-    authors = book.authors.split(", ") if book.authors else []
-    return get_recommendations(
-        title=book.title, authors=authors, description=book.description or ""
+
+    local = recommend_from_catalogue(session, book)
+    if not local:
+        client_ip = get_client_ip(request)
+        check_rate_limit(client_ip, "/books/recommendations/", session)
+
+    return sse_response(stream_recommendations(seed_from_book(book), local))
+
+
+@app.post(
+    "/books/recommendations/batch",
+    response_model=dict[int, list[BookSearchResult]],
+)
+def get_batch_recommendations(
+    body: BatchRecommendationRequest,
+    request: Request,
+    session: Session = Depends(get_session),
+):
+    book_ids = list(dict.fromkeys(body.book_ids))
+    books = session.exec(select(Book).where(Book.id.in_(book_ids))).all()
+    by_id = {book.id: book for book in books}
+    missing = [book_id for book_id in book_ids if book_id not in by_id]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Books not found: {missing}")
+
+    results = {}
+    llm_books = []
+    for book_id in book_ids:
+        local = recommend_from_catalogue(session, by_id[book_id])
+        if local:
+            results[book_id] = [to_search_result(entry) for entry in local]
+        else:
+            llm_books.append(by_id[book_id])
+
+    if llm_books:
+        client_ip = get_client_ip(request)
+        check_rate_limit(client_ip, "/books/recommendations/", session)
+
+        title_lists = recommend_for_seeds([seed_from_book(book) for book in llm_books])
+        resolved = resolve_titles([title for titles in title_lists for title in titles])
+        for book, titles in zip(llm_books, title_lists):
+            results[book.id] = resolve_recommendations(titles, resolved)
+
+    return results
+
+
+@app.get("/covers/{bookid}")
+def get_cover(
+    request: Request,
+    bookid: str = Path(pattern=r"^[A-Za-z0-9_-]{1,64}$"),
+    w: int | None = Query(None, ge=1, le=2048, description="Width in pixels"),
+):
+    """A book's cover from the local cache, fetched from Google on first use."""
+    max_age = COVER_MAX_AGE
+    try:
+        file, digest, media_type = covers.get_cover(bookid, w)
+    except httpx.HTTPError as e:
+        print(f"Cover fetch for {bookid} failed: {e}")
+        # Serve the placeholder briefly so the next render retries.
+        file, digest, media_type = covers.get_placeholder(w)
+        max_age = 60
+
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    if is_not_modified(request, etag):
+        file.close()
+        return Response(status_code=304, headers=headers)
+    headers["Content-Length"] = str(file.seek(0, os.SEEK_END))
+    file.seek(0)
+    return StreamingResponse(
+        covers.iter_file(file), media_type=media_type, headers=headers
     )
 
 
+@app.get("/books/trending", response_model=list[BookSearchResult])
+def get_trending_books(
+    request: Request,
+    limit: int = Query(10, ge=1, le=50),
+    session: Session = Depends(get_read_session),
+):
+    """Books most saved and progressed recently, from the in-memory tracker."""
+    book_ids = [book_id for book_id, _ in trending.tracker.top(limit)]
+
+    def build():
+        books = session.exec(select(Book).where(Book.id.in_(book_ids))).all()
+        by_id = {book.id: book for book in books}
+        return [
+            to_search_result(search_entry(by_id[book_id]))
+            for book_id in book_ids
+            if book_id in by_id
+        ]
+
+    return conditional_response(
+        request,
+        make_etag("trending", book_ids),
+        build,
+        cache_control=f"public, max-age={TRENDING_MAX_AGE}",
+    )
+
+
+@app.get("/books/{book_id}/also-saved", response_model=list[BookSearchResult])
+def get_also_saved(
+    book_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    session: Session = Depends(get_read_session),
+):
+    if session.get(Book, book_id) is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+
+    cooccurrence.ensure_built(session)
+    similar = cooccurrence.index.similar(book_id, limit)
+    if not similar:
+        return []
+
+    books = session.exec(
+        select(Book).where(Book.id.in_([similar_id for similar_id, _ in similar]))
+    ).all()
+    by_id = {book.id: book for book in books}
+    return [
+        to_search_result(search_entry(by_id[similar_id]))
+        for similar_id, _ in similar
+        if similar_id in by_id
+    ]
+
+
 @app.post("/recommend", response_model=list[BookSearchResult])
 def recommend_books(
     request: Request, session: Session = Depends(get_session), data: dict = Body(...)
@@ -397,3 +921,79 @@ def recommend_books(
         raise HTTPException(status_code=400, detail="Title is required")
 
     return get_recommendations(title=title)
+
+
+@app.post("/recommend/stream")
+def stream_recommend_books(
+    request: Request, session: Session = Depends(get_session), data: dict = Body(...)
+):
+    client_ip = get_client_ip(request)
+    check_rate_limit(client_ip, "/recommend", session)
+
+    title = data.get("title")
+    if not title:
+        raise HTTPException(status_code=400, detail="Title is required")
+
+    return sse_response(stream_recommendations(SeedBook(title=title)))
+
+
+def run_recommendation_job(session: Session, job: RecommendationJob) -> list[dict]:
+    """Job handler: the same pipeline as the synchronous recommendation routes."""
+    if job.book_id is not None:
+        book = session.get(Book, job.book_id)
+        if book is None:
+            raise ValueError(f"Book {job.book_id} no longer exists")
+        local = recommend_from_catalogue(session, book)
+        if local:
+            return [to_search_result(entry).model_dump() for entry in local]
+        seed = seed_from_book(book)
+    else:
+        seed = SeedBook(title=job.title)
+
+    recommendations = get_recommendations(
+        title=seed.title, authors=seed.authors, description=seed.description
+    )
+    return [recommendation.model_dump() for recommendation in recommendations]
+
+
+@app.post(
+    "/jobs/recommendations", status_code=202, response_model=RecommendationJobRead
+)
+def create_recommendation_job(
+    body: RecommendationJobCreate,
+    request: Request,
+    session: Session = Depends(get_session),
+):
+    if (body.book_id is None) == (not body.title):
+        raise HTTPException(
+            status_code=400, detail="Provide exactly one of book_id or title"
+        )
+    if body.book_id is not None and session.get(Book, body.book_id) is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+
+    client_ip = get_client_ip(request)
+    check_rate_limit(client_ip, "/jobs/recommendations", session)
+
+    job = jobs.enqueue(session, book_id=body.book_id, title=body.title)
+    if job_pool is not None:
+        job_pool.notify()
+    return read_job(job)
+
+
+@app.get("/jobs/{job_id}", response_model=RecommendationJobRead)
+def get_recommendation_job(job_id: int, session: Session = Depends(get_session)):
+    job = session.get(RecommendationJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return read_job(job)
+
+
+def read_job(job: RecommendationJob) -> RecommendationJobRead:
+    return RecommendationJobRead(
+        id=job.id,
+        status=job.status,
+        result=json.loads(job.result) if job.result else None,
+        error=job.error,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+    )
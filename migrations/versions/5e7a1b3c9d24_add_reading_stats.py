@@ -0,0 +1,46 @@
+"""Add reading stats and completed_at
+
+Revision ID: 5e7a1b3c9d24
+Revises: d2c84e1f5a07
+Create Date: 2026-10-19 17:42:36.904512
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5e7a1b3c9d24"
+down_revision: Union[str, None] = "d2c84e1f5a07"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "reading_stat",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("kind", sqlmodel.sql.sqltypes.AutoString(length=16), nullable=False),
+        sa.Column("key", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("total", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("user_id", "kind", "key"),
+    )
+    op.add_column(
+        "userbookstatus", sa.Column("completed_at", sa.DateTime(), nullable=True)
+    )
+    # Best guess for books finished before the column existed.
+    op.execute(
+        "UPDATE userbookstatus SET completed_at = COALESCE(updated_at, created_at) "
+        "WHERE status = 'COMPLETED'"
+    )
+    # Populate reading_stat afterwards with: python -m services.reading_stats rebuild
+
+
+def downgrade() -> None:
+    op.drop_column("userbookstatus", "completed_at")
+    op.drop_table("reading_stat")
@@ -0,0 +1,38 @@
+"""Add library compaction horizon
+
+Revision ID: 7c1f0e9a4b36
+Revises: 5e7a1b3c9d24
+Create Date: 2026-10-19 21:05:48.330214
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7c1f0e9a4b36"
+down_revision: Union[str, None] = "5e7a1b3c9d24"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "library_version",
+        sa.Column(
+            "compacted_version", sa.Integer(), nullable=False, server_default="0"
+        ),
+    )
+    op.add_column(
+        "library_version",
+        sa.Column(
+            "compacted_change_id", sa.Integer(), nullable=False, server_default="0"
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("library_version", "compacted_change_id")
+    op.drop_column("library_version", "compacted_version")
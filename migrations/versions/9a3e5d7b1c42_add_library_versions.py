@@ -0,0 +1,68 @@
+"""Add library versions and user book tombstones
+
+Revision ID: 9a3e5d7b1c42
+Revises: 4f8b2c6d9e31
+Create Date: 2026-10-19 14:05:51.227306
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9a3e5d7b1c42"
+down_revision: Union[str, None] = "4f8b2c6d9e31"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "library_version",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.create_table(
+        "userbook_tombstone",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("book_id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("user_id", "book_id"),
+    )
+    op.create_index(
+        op.f("ix_userbook_tombstone_version"),
+        "userbook_tombstone",
+        ["version"],
+        unique=False,
+    )
+    op.add_column(
+        "userbookstatus",
+        sa.Column("version", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.create_index(
+        op.f("ix_userbookstatus_version"), "userbookstatus", ["version"], unique=False
+    )
+
+    # Existing rows become version 1, so a client syncing from 0 gets them all.
+    op.execute("UPDATE userbookstatus SET version = 1")
+    op.execute(
+        "INSERT INTO library_version (user_id, version, updated_at) "
+        "SELECT DISTINCT user_id, 1, CURRENT_TIMESTAMP FROM userbookstatus"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_userbookstatus_version"), table_name="userbookstatus")
+    op.drop_column("userbookstatus", "version")
+    op.drop_index(
+        op.f("ix_userbook_tombstone_version"), table_name="userbook_tombstone"
+    )
+    op.drop_table("userbook_tombstone")
+    op.drop_table("library_version")
@@ -0,0 +1,49 @@
+"""Add userbook change log
+
+Revision ID: d2c84e1f5a07
+Revises: 9a3e5d7b1c42
+Create Date: 2026-10-19 16:20:12.418093
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d2c84e1f5a07"
+down_revision: Union[str, None] = "9a3e5d7b1c42"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "userbook_change",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("book_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "op", sa.Enum("SAVE", "UPDATE", "DELETE", name="changeop"), nullable=False
+        ),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("ts", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_userbook_change_user_id_id",
+        "userbook_change",
+        ["user_id", "id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_userbook_change_ts"), "userbook_change", ["ts"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_userbook_change_ts"), table_name="userbook_change")
+    op.drop_index("ix_userbook_change_user_id_id", table_name="userbook_change")
+    op.drop_table("userbook_change")
+    sa.Enum(name="changeop").drop(op.get_bind(), checkfirst=True)
@@ -1,21 +1,14 @@
-from datetime import UTC, datetime, timedelta
+from datetime import UTC, datetime
 from enum import Enum
 from typing import Optional
 
-import jwt
-from passlib.context import CryptContext
 from pydantic import BaseModel
-from sqlalchemy import Column, String
+from sqlalchemy import Column, Index, String
 from sqlmodel import Field, Relationship, SQLModel
 
-from config import settings
+from services.passwords import pwd_context
 
 BOOK_COVER_URL = "https://books.google.com/books/content?id={bookid}&printsec=frontcover&img=1&zoom=1&source=gbs_gdata"
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-SECRET_KEY = settings.SECRET_KEY
-ALGORITHM = settings.ALGORITHM
-ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
 
 class StatusEnum(str, Enum):
@@ -24,6 +17,13 @@ class StatusEnum(str, Enum):
     TO_READ = "to_read"
 
 
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
 class UserBase(SQLModel):
     username: str
     email: Optional[str]
@@ -49,6 +49,86 @@ class UserBookStatus(SQLModel, table=True):
     notes: Optional[str] = Field(default=None)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = Field(default=None)
+    # Set when the status becomes completed; see services.reading_stats.
+    completed_at: Optional[datetime] = Field(default=None)
+    # Library version at which this row last changed; see services.library.
+    version: int = Field(default=0, nullable=False, index=True)
+
+
+class LibraryVersion(SQLModel, table=True):
+    __tablename__ = "library_version"
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    version: int = Field(default=0, nullable=False)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    # Newest version / change id whose delete was compacted away; cursors
+    # older than these may have missed it and need a full resync.
+    compacted_version: int = Field(default=0, nullable=False)
+    compacted_change_id: int = Field(default=0, nullable=False)
+
+
+class UserBookTombstone(SQLModel, table=True):
+    __tablename__ = "userbook_tombstone"
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    book_id: int = Field(primary_key=True)
+    version: int = Field(nullable=False, index=True)
+    deleted_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class ChangeOp(str, Enum):
+    SAVE = "save"
+    UPDATE = "update"
+    DELETE = "delete"
+
+
+class UserBookChange(SQLModel, table=True):
+    """Append-only log of library changes, scanned by (user_id, id)."""
+
+    __tablename__ = "userbook_change"
+    __table_args__ = (Index("ix_userbook_change_user_id_id", "user_id", "id"),)
+
+    id: int = Field(default=None, primary_key=True)
+    user_id: int = Field(nullable=False)
+    book_id: int = Field(nullable=False)
+    op: ChangeOp = Field(nullable=False)
+    version: int = Field(nullable=False)
+    ts: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+class UserBookChangeRead(SQLModel):
+    id: int
+    book_id: int
+    op: ChangeOp
+    version: int
+    ts: datetime
+
+
+class ReadingStat(SQLModel, table=True):
+    """One precomputed (kind, key) counter of a user's reading stats."""
+
+    __tablename__ = "reading_stat"
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    kind: str = Field(primary_key=True, max_length=16)
+    key: str = Field(primary_key=True)
+    count: int = Field(default=0, nullable=False)
+    total: float = Field(default=0.0, nullable=False)
+
+
+class AuthorCount(SQLModel):
+    author: str
+    count: int
+
+
+class ReadingStats(SQLModel):
+    user_id: int
+    status_counts: dict[str, int] = Field(default_factory=dict)
+    completed_per_month: dict[str, int] = Field(default_factory=dict)
+    completed_per_year: dict[str, int] = Field(default_factory=dict)
+    rated_count: int = 0
+    average_rating: Optional[float] = None
+    top_authors: list[AuthorCount] = Field(default_factory=list)
 
 
 class User(UserBase, table=True):
@@ -67,11 +147,6 @@ class User(UserBase, table=True):
     def set_password(self, password: str):
         self.password_hash = pwd_context.hash(password)
 
-    def get_token(self) -> str:
-        expire = datetime.now(UTC) + timedelta(minutes=int(ACCESS_TOKEN_EXPIRE_MINUTES))
-        to_encode = {"sub": self.username, "exp": expire}
-        return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-
 
 class Book(BookBase, table=True):
     __tablename__ = "book"
@@ -100,7 +175,12 @@ class Token(SQLModel):
 
 
 class TokenData(SQLModel):
-    username: str | None = None
+    """Identity carried by a verified access token; no DB row is loaded."""
+
+    id: int
+    username: str
+    jti: str
+    expires_at: datetime
 
 
 class BookCreate(BookBase):
@@ -124,6 +204,45 @@ class UserBookStatusUpdate(SQLModel):
     notes: Optional[str] = Field(default=None)
 
 
+class UserBookBatchItem(SQLModel):
+    """One entry of a batch edit: delete the book, or apply the fields set."""
+
+    book_id: int
+    delete: bool = False
+    status: Optional[StatusEnum] = None
+    rating: Optional[int] = None
+    notes: Optional[str] = None
+
+    def changes(self) -> dict:
+        changes = self.model_dump(exclude_unset=True, exclude={"book_id", "delete"})
+        if changes.get("status", ...) is None:
+            changes.pop("status")
+        return changes
+
+
+class UserBookBatchRequest(SQLModel):
+    user_id: int
+    items: list[UserBookBatchItem] = Field(min_length=1, max_length=500)
+
+
+class BatchOutcome(str, Enum):
+    UPDATED = "updated"
+    DELETED = "deleted"
+    UNCHANGED = "unchanged"
+    NOT_FOUND = "not_found"
+    DUPLICATE = "duplicate"
+
+
+class UserBookBatchResult(SQLModel):
+    book_id: int
+    outcome: BatchOutcome
+
+
+class UserBookBatchResponse(SQLModel):
+    version: int
+    results: list[UserBookBatchResult]
+
+
 class BookSearchResult(SQLModel):
     id: str
     title: str
@@ -146,6 +265,10 @@ class SaveBookRequest(BaseModel):
     user_id: int
 
 
+class BatchRecommendationRequest(BaseModel):
+    book_ids: list[int] = Field(min_length=1, max_length=10)
+
+
 class UserBookResponse(SQLModel):
     id: int
     title: str
@@ -160,6 +283,20 @@ class UserBookResponse(SQLModel):
     notes: Optional[str] = None
 
 
+class LibraryVersionRead(SQLModel):
+    user_id: int
+    version: int
+
+
+class UserBookDelta(SQLModel):
+    """Changes to a user's library after version `since`, up to `version`."""
+
+    since: int
+    version: int
+    changed: list[UserBookResponse]
+    deleted: list[int]
+
+
 class RateLimit(SQLModel, table=True):
     __tablename__ = "rate_limit"
 
@@ -167,3 +304,39 @@ class RateLimit(SQLModel, table=True):
     user_id: int = Field(foreign_key="user.id", index=True, nullable=False)
     endpoint: str = Field(nullable=False, index=True)
     timestamp: datetime = Field(default_factory=lambda: datetime.utcnow())
+
+
+class RevokedToken(SQLModel, table=True):
+    __tablename__ = "revoked_token"
+
+    jti: str = Field(primary_key=True, max_length=32)
+    expires_at: datetime = Field(nullable=False, index=True)
+
+
+class RecommendationJob(SQLModel, table=True):
+    __tablename__ = "recommendation_job"
+
+    id: int = Field(default=None, primary_key=True)
+    status: JobStatus = Field(default=JobStatus.QUEUED, nullable=False, index=True)
+    book_id: Optional[int] = Field(default=None, foreign_key="book.id")
+    title: Optional[str] = Field(default=None)
+    result: Optional[str] = Field(default=None)
+    error: Optional[str] = Field(default=None)
+    attempts: int = Field(default=0, nullable=False)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = Field(default=None)
+    finished_at: Optional[datetime] = Field(default=None)
+
+
+class RecommendationJobCreate(BaseModel):
+    book_id: Optional[int] = None
+    title: Optional[str] = None
+
+
+class RecommendationJobRead(SQLModel):
+    id: int
+    status: JobStatus
+    result: Optional[list[BookSearchResult]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
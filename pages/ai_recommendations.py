@@ -1,10 +1,12 @@
 import requests
 import streamlit as st
 
+from client_cache import cover_url, get_json, iter_sse
 from config import settings
 
 API_URL = settings.API_URL
 RECOMMENDATIONS_URL = f"{API_URL}/recommend"
+RECOMMENDATIONS_STREAM_URL = f"{API_URL}/recommend/stream"
 GOOGLE_BOOKS_DETAILS_URL = f"{API_URL}/google-books/details/"
 
 st.title("📖 AI-Powered Book Recommendations")
@@ -37,6 +39,10 @@ def get_user_from_api():
 if st.session_state.access_token:
     st.sidebar.success(f"Logged in as {st.session_state.username}")
     if st.sidebar.button("Logout"):
+        requests.post(
+            f"{API_URL}/auth/logout",
+            headers={"Authorization": f"Bearer {st.session_state.access_token}"},
+        )
         st.session_state.access_token = None
         st.session_state.username = None
         st.rerun()
@@ -76,24 +82,39 @@ if page != st.session_state.page:
             st.switch_page("pages/login.py")
 
 
-# Function to fetch AI recommendations (stored in session state)
+# Function to fetch AI recommendations (stored in session state), rendering
+# each one as soon as the API streams it
 def fetch_recommendations(query):
-    response = requests.post(RECOMMENDATIONS_URL, json={"title": query})
+    st.session_state.ai_recommendations = []
+    live_results = st.empty()
 
-    if response.status_code == 200:
-        st.session_state.ai_recommendations = response.json()
-    else:
-        st.session_state.ai_recommendations = []
-        st.error("Failed to fetch recommendations. Please try again.")
+    with requests.post(
+        RECOMMENDATIONS_STREAM_URL, json={"title": query}, stream=True
+    ) as response:
+        if response.status_code != 200:
+            st.error("Failed to fetch recommendations. Please try again.")
+            return
+
+        with st.spinner("Finding recommendations..."):
+            for event, data in iter_sse(response):
+                if event == "book":
+                    st.session_state.ai_recommendations.append(data)
+                    with live_results.container():
+                        for book in st.session_state.ai_recommendations:
+                            st.write(f"📕 **{book['title']}**")
+                elif event == "error":
+                    st.error("Failed to fetch recommendations. Please try again.")
+
+    live_results.empty()
 
 
 # Function to fetch book details using Google Books API (stored in session state)
 def fetch_book_details(book_id):
     details_url = f"{GOOGLE_BOOKS_DETAILS_URL}{book_id}/"
-    response = requests.get(details_url)
+    status_code, details = get_json(details_url)
 
-    if response.status_code == 200:
-        st.session_state.selected_book_details = response.json()
+    if status_code == 200:
+        st.session_state.selected_book_details = details
     else:
         st.session_state.selected_book_details = None
         st.error("Failed to fetch book details.")
@@ -150,7 +171,7 @@ if st.session_state.ai_recommendations:
             col1, col2 = st.columns([1, 3])
 
             with col1:
-                st.image(book["cover_image_url"], width=120)
+                st.image(cover_url(book["id"]), width=120)
 
             with col2:
                 st.subheader(book["title"])
@@ -4,13 +4,13 @@ from datetime import datetime
 import requests
 import streamlit as st
 
+from client_cache import cover_url, get_json, iter_sse
 from config import settings
 
 API_URL = settings.API_URL
 SAVED_BOOKS_URL = f"{API_URL}/user-books/"
 GOOGLE_BOOKS_SEARCH_URL = f"{API_URL}/google-books/search/"
 GOOGLE_BOOKS_DETAILS_URL = f"{API_URL}/google-books/details/"
-BOOK_COVER_URL = "https://books.google.com/books/content?id={bookid}&printsec=frontcover&img=1&zoom=1&source=gbs_gdata"
 
 
 st.title("📚 Saved Books")
@@ -56,6 +56,10 @@ if "page" not in st.session_state:
 if st.session_state.access_token:
     st.sidebar.success(f"Logged in as {st.session_state.username}")
     if st.sidebar.button("Logout"):
+        requests.post(
+            f"{API_URL}/auth/logout",
+            headers={"Authorization": f"Bearer {st.session_state.access_token}"},
+        )
         st.session_state.access_token = None
         st.session_state.username = None
         st.rerun()
@@ -101,10 +105,10 @@ if "username" not in st.session_state:
 # Function to fetch and store book details in session state
 def fetch_book_details(book_id):
     details_url = f"{GOOGLE_BOOKS_DETAILS_URL}{book_id}/"
-    response = requests.get(details_url)
+    status_code, details = get_json(details_url)
 
-    if response.status_code == 200:
-        st.session_state.selected_book_details = response.json()
+    if status_code == 200:
+        st.session_state.selected_book_details = details
     else:
         st.session_state.selected_book_details = None
         st.error("Failed to fetch book details.")
@@ -145,12 +149,37 @@ def save_book(book_id):
         st.session_state[f"save_error_{book_id}"] = save_response.text
 
 
-def fetch_saved_books(user_id):
+def fetch_saved_books(user_id=None):
+    """Bring the local copy of the library up to date by applying only the changes."""
+    user_id = user_id or st.session_state.user_id
+    library = st.session_state.get("library")
+    if not library or library["user_id"] != user_id:
+        library = {"user_id": user_id, "version": 0, "books": {}}
+
     headers = {"Authorization": f"Bearer {st.session_state.access_token}"}
     response = requests.get(
-        SAVED_BOOKS_URL, params={"user_id": user_id}, headers=headers
+        SAVED_BOOKS_URL,
+        params={"user_id": user_id, "since": library["version"]},
+        headers=headers,
+    )
+    if response.status_code == 410:
+        # Our version predates compacted deletes; start over from nothing.
+        library = {"user_id": user_id, "version": 0, "books": {}}
+        response = requests.get(
+            SAVED_BOOKS_URL, params={"user_id": user_id, "since": 0}, headers=headers
+        )
+    if response.status_code == 200:
+        delta = response.json()
+        for book in delta["changed"]:
+            library["books"][book["id"]] = book
+        for book_id in delta["deleted"]:
+            library["books"].pop(book_id, None)
+        library["version"] = delta["version"]
+        st.session_state.library = library
+
+    return sorted(
+        library["books"].values(), key=lambda book: book["created_at"], reverse=True
     )
-    return response.json() if response.status_code == 200 else []
 
 
 def format_published_date(date_str):
@@ -177,6 +206,41 @@ def fetch_recommendations(book_id):
     return response.json() if response.status_code == 200 else ""
 
 
+def stream_recommendations(book_id):
+    """Fetch recommendations for one book, showing each as it arrives."""
+    rec_url = f"{API_URL}/books/{book_id}/recommendations/stream"
+    recommendations = []
+    live_results = st.empty()
+
+    with requests.get(rec_url, stream=True) as response:
+        if response.status_code != 200:
+            return "error"
+        for event, data in iter_sse(response):
+            if event == "book":
+                recommendations.append(data)
+                with live_results.container():
+                    for rec in recommendations:
+                        st.write(f"📕 **{rec['title']}**")
+            elif event == "error":
+                return "error"
+
+    live_results.empty()
+    return recommendations
+
+
+def fetch_batch_recommendations(book_ids, batch_size=10):
+    rec_url = f"{API_URL}/books/recommendations/batch"
+    for start in range(0, len(book_ids), batch_size):
+        chunk = book_ids[start : start + batch_size]
+        response = requests.post(rec_url, json={"book_ids": chunk})
+        if response.ok:
+            for book_id, recommendations in response.json().items():
+                st.session_state[f"rec_{book_id}"] = recommendations
+        else:
+            for book_id in chunk:
+                st.session_state[f"rec_{book_id}"] = "error"
+
+
 def update_book_status(book_id, status, rating, notes):
     user_id = st.session_state.user_id
     update_url = f"{API_URL}/user-books/{user_id}/{book_id}/"
@@ -195,9 +259,7 @@ def display_book(book):
         st.success(st.session_state["update_success"])
         del st.session_state["update_success"]
 
-    cover_image_url = (
-        BOOK_COVER_URL.format(bookid=book["bookid"]) if "bookid" in book else None
-    )
+    cover_image_url = cover_url(book["bookid"]) if "bookid" in book else None
     published_date = format_published_date(book.get("published_date"))
     authors = parse_authors(book["authors"])
 
@@ -295,12 +357,9 @@ def display_book(book):
 
         with st.expander(f"🔍 AI Recommendations for '{book['title']}'"):
             if st.button("Generate AI Recommendations", key=f"btn_{book['id']}"):
-                rec_url = f"{API_URL}/books/{book['id']}/recommendations"
-                response = requests.get(rec_url)
-                if response.ok:
-                    st.session_state[f"rec_{book['id']}"] = response.json()
-                else:
-                    st.session_state[f"rec_{book['id']}"] = "error"
+                st.session_state[f"rec_{book['id']}"] = stream_recommendations(
+                    book["id"]
+                )
 
             recommendations = st.session_state.get(f"rec_{book['id']}", None)
 
@@ -313,8 +372,7 @@ def display_book(book):
                     with st.container():
                         st.markdown(f"### 📕 {rec['title']}")
                         st.write(f"**Authors:** {', '.join(rec['authors'])}")
-                        if rec.get("cover_image_url"):
-                            st.image(rec["cover_image_url"], width=120)
+                        st.image(cover_url(rec["id"]), width=120)
 
                         col1, col2 = st.columns([1, 1])
 
@@ -418,6 +476,10 @@ if saved_books:
             reverse=reverse_sort,
         )
 
+    if st.button("✨ Generate AI Recommendations for all shown books"):
+        with st.spinner("Generating recommendations..."):
+            fetch_batch_recommendations([book["id"] for book in saved_books])
+
     for book in saved_books:
         display_book(book)
 else:
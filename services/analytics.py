@@ -0,0 +1,154 @@
+import threading
+from datetime import datetime
+
+import numpy as np
+from sqlmodel import Session, select
+
+from config import settings
+from models import Book, StatusEnum, UserBookStatus
+from services.cache import make_cache
+
+STATUSES = list(StatusEnum)
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+TOP_BOOKS = 20
+ACTIVE_DAYS = 30
+
+stats_cache = make_cache("analytics", ttl=settings.ANALYTICS_REFRESH_SECONDS, maxsize=1)
+_refresh_lock = threading.Lock()
+
+
+class SiteAggregates:
+    """Running site-wide aggregates over `userbookstatus`, fed chunk by chunk.
+
+    Every accumulator is sized by distinct books, days or (recent day, user)
+    pairs rather than by rows, so memory stays bounded by the chunk size.
+    """
+
+    def __init__(self, today: np.datetime64):
+        self.today = today
+        self.entries = 0
+        self.saves = np.zeros(0, dtype=np.int64)
+        self.status_by_day = {}
+        self.ratings = np.zeros(6, dtype=np.int64)
+        self.active = set()
+
+    def add(self, chunk: list[tuple]):
+        user_ids, book_ids, statuses, ratings, created, updated = zip(*chunk)
+        count = len(chunk)
+        self.entries += count
+        user_ids = np.fromiter(user_ids, dtype=np.int64, count=count)
+        book_ids = np.fromiter(book_ids, dtype=np.int64, count=count)
+        codes = np.fromiter(
+            (STATUS_CODES[StatusEnum(status)] for status in statuses),
+            dtype=np.int64,
+            count=count,
+        )
+        ratings = np.array(ratings, dtype=np.float64)
+        created = np.array(created, dtype="datetime64[D]")
+        updated = np.array(updated, dtype="datetime64[D]")
+
+        # Most-saved books: a bincount indexed by book id.
+        counts = np.bincount(book_ids)
+        if len(counts) > len(self.saves):
+            self.saves = np.pad(self.saves, (0, len(counts) - len(self.saves)))
+        self.saves[: len(counts)] += counts
+
+        # Current status of the entries saved on each day.
+        days = created.astype(np.int64)
+        keys, key_counts = np.unique(days * len(STATUSES) + codes, return_counts=True)
+        for key, key_count in zip(keys.tolist(), key_counts.tolist()):
+            day, code = divmod(key, len(STATUSES))
+            self.status_by_day.setdefault(day, [0] * len(STATUSES))[code] += key_count
+
+        # Rating histogram over 1-5; unrated entries are NaN and dropped.
+        rated = ratings[~np.isnan(ratings)].astype(np.int64)
+        self.ratings += np.bincount(rated[(rated >= 1) & (rated <= 5)], minlength=6)
+
+        # Active readers: distinct users who saved or edited on each recent day.
+        horizon = (self.today - ACTIVE_DAYS).astype(np.int64)
+        for day_column in (created, updated):
+            valid = ~np.isnat(day_column)
+            active_days = day_column[valid].astype(np.int64)
+            recent = active_days > horizon
+            pairs = np.unique(active_days[recent] * (1 << 32) + user_ids[valid][recent])
+            self.active.update(pairs.tolist())
+
+    def top_books(self, limit: int) -> list[tuple[int, int]]:
+        if not self.saves.any():
+            return []
+        limit = min(limit, int(np.count_nonzero(self.saves)))
+        top = np.argpartition(-self.saves, limit - 1)[:limit]
+        top = top[np.argsort(-self.saves[top], kind="stable")]
+        return [(int(book_id), int(self.saves[book_id])) for book_id in top]
+
+    def active_readers(self) -> dict[str, int]:
+        per_day = np.bincount(
+            (np.array(sorted(self.active), dtype=np.int64) >> 32)
+            - int((self.today - ACTIVE_DAYS + 1).astype(np.int64)),
+            minlength=ACTIVE_DAYS,
+        )
+        first = self.today - ACTIVE_DAYS + 1
+        return {
+            str(first + offset): int(readers)
+            for offset, readers in enumerate(per_day[:ACTIVE_DAYS].tolist())
+        }
+
+
+def _day(day: int) -> str:
+    return str(np.datetime64(day, "D"))
+
+
+def compute(session: Session, chunk_size: int | None = None) -> dict:
+    """Site-wide dashboard aggregates, streamed through in `chunk_size` rows."""
+    chunk_size = chunk_size or settings.ANALYTICS_CHUNK_SIZE
+    aggregates = SiteAggregates(np.datetime64(datetime.utcnow().date(), "D"))
+    result = session.execute(
+        select(
+            UserBookStatus.user_id,
+            UserBookStatus.book_id,
+            UserBookStatus.status,
+            UserBookStatus.rating,
+            UserBookStatus.created_at,
+            UserBookStatus.updated_at,
+        ).execution_options(yield_per=chunk_size)
+    )
+    for chunk in result.partitions():
+        aggregates.add(chunk)
+
+    top = aggregates.top_books(TOP_BOOKS)
+    titles = dict(
+        session.exec(
+            select(Book.id, Book.title).where(Book.id.in_([book for book, _ in top]))
+        ).all()
+    )
+    return {
+        "computed_at": datetime.utcnow().isoformat(),
+        "entries": aggregates.entries,
+        "most_saved": [
+            {"book_id": book_id, "title": titles.get(book_id), "saves": saves}
+            for book_id, saves in top
+        ],
+        "status_by_day": {
+            _day(day): dict(zip((status.value for status in STATUSES), counts))
+            for day, counts in sorted(aggregates.status_by_day.items())
+        },
+        "rating_histogram": {
+            str(rating): int(count)
+            for rating, count in enumerate(aggregates.ratings.tolist())
+            if rating
+        },
+        "active_readers": aggregates.active_readers(),
+    }
+
+
+def site_stats(session: Session) -> dict:
+    """`compute`'s result, recomputed at most every ANALYTICS_REFRESH_SECONDS."""
+    stats = stats_cache.get("site")
+    if stats is not None:
+        return stats
+    with _refresh_lock:
+        stats = stats_cache.get("site")
+        if stats is None:
+            stats = compute(session)
+            stats_cache.set("site", stats)
+    return stats
@@ -0,0 +1,185 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import settings
+
+
+class TTLCache:
+    """Thread-safe in-memory LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, ttl: int, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None, stale: bool = False):
+        """Return a live entry, or with `stale=True` an expired one not yet evicted."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at < time.monotonic() and not stale:
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+
+class SQLiteCache:
+    """TTLCache-compatible cache in a SQLite file shared by all worker processes.
+
+    Expired rows are kept until evicted so `get(stale=True)` still works;
+    once a namespace holds more than `maxsize` rows the ones closest to
+    expiry are dropped. Values must be JSON-serialisable.
+    """
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str, namespace: str, ttl: int, maxsize: int = 1024):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._local = threading.local()
+        self._writes = 0
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS cache (namespace TEXT NOT NULL, "
+            "key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; SQLite handles locking between processes.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None, stale: bool = False):
+        row = (
+            self._connection()
+            .execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, json.dumps(key)),
+            )
+            .fetchone()
+        )
+        if row is None or (row[1] < time.time() and not stale):
+            return default
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+            (
+                self.namespace,
+                json.dumps(key),
+                json.dumps(value),
+                time.time() + self.ttl,
+            ),
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0 or self.maxsize < self.PRUNE_EVERY:
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key IN (SELECT key FROM "
+                "cache WHERE namespace = ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.maxsize),
+            )
+
+    def delete(self, key):
+        self._connection().execute(
+            "DELETE FROM cache WHERE namespace = ? AND key = ?",
+            (self.namespace, json.dumps(key)),
+        )
+
+    def clear(self):
+        self._connection().execute(
+            "DELETE FROM cache WHERE namespace = ?", (self.namespace,)
+        )
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+
+class RedisCache:
+    """TTLCache-compatible cache in Redis (or any Redis-compatible store).
+
+    Keys live for `STALE_FACTOR` times the TTL so stale reads keep working;
+    bound memory with the server's `maxmemory` / `allkeys-lru` policy.
+    """
+
+    STALE_FACTOR = 4
+
+    def __init__(self, url: str, namespace: str, ttl: int):
+        import redis
+
+        self.namespace = namespace
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url)
+
+    def _key(self, key) -> str:
+        return f"{self.namespace}:{json.dumps(key)}"
+
+    def get(self, key, default=None, stale: bool = False):
+        raw = self._client.get(self._key(key))
+        if raw is None:
+            return default
+        entry = json.loads(raw)
+        if entry["expires_at"] < time.time() and not stale:
+            return default
+        return entry["value"]
+
+    def set(self, key, value):
+        entry = {"value": value, "expires_at": time.time() + self.ttl}
+        self._client.set(
+            self._key(key), json.dumps(entry), ex=self.ttl * self.STALE_FACTOR
+        )
+
+    def delete(self, key):
+        self._client.delete(self._key(key))
+
+    def clear(self):
+        for key in self._client.scan_iter(match=f"{self.namespace}:*"):
+            self._client.delete(key)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+
+def make_cache(namespace: str, ttl: int, maxsize: int = 1024):
+    """Build a cache on the backend selected by `CACHE_BACKEND`.
+
+    "memory" is per process; "sqlite" and "redis" are shared by every
+    worker, which is what multi-worker deployments should use.
+    """
+    if settings.CACHE_BACKEND == "sqlite":
+        return SQLiteCache(settings.CACHE_PATH, namespace, ttl, maxsize)
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCache(settings.REDIS_URL, namespace, ttl)
+    return TTLCache(ttl, maxsize)
@@ -0,0 +1,344 @@
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+from sqlmodel import Session, select
+
+from models import StatusEnum, UserBookStatus
+
+STATUS_WEIGHTS = {
+    StatusEnum.TO_READ: 1.0,
+    StatusEnum.READING: 2.0,
+    StatusEnum.COMPLETED: 3.0,
+}
+COMPACT_AFTER = 10_000
+
+
+def interaction_weight(status: str | None, rating: int | None = None) -> float:
+    """How strongly a user's shelf entry signals interest in a book."""
+    if status is None:
+        return 0.0
+    weight = STATUS_WEIGHTS[StatusEnum(status)]
+    if rating is not None:
+        weight *= 1 + 0.25 * (rating - 3)
+    return weight
+
+
+class CooccurrenceIndex:
+    """Item-item cosine similarity over a weighted user x book matrix.
+
+    `matrix` holds C = RᵀR as CSR, where R[u, i] is `interaction_weight` of
+    user u's entry for book i. Saves, PATCHes and deletes are applied
+    incrementally as sparse row deltas and folded into the CSR once
+    `COMPACT_AFTER` deltas accumulate, so a lookup is one CSR row slice plus a
+    small dict merge. `built_at` is when the rows it was built from were read.
+    """
+
+    def __init__(self):
+        self.matrix = sparse.csr_matrix((0, 0), dtype=np.float64)
+        self.diagonal = np.zeros(0)
+        self.book_ids = np.zeros(0, dtype=np.int64)
+        self.index_of: dict[int, int] = {}
+        self.built = False
+        self.built_at: float | None = None
+        self._deltas = defaultdict(lambda: defaultdict(float))
+        self._delta_count = 0
+        self._lock = threading.Lock()
+
+    def _index(self, book_id: int) -> int:
+        index = self.index_of.get(book_id)
+        if index is None:
+            index = len(self.book_ids)
+            self.index_of[book_id] = index
+            self.book_ids = np.append(self.book_ids, book_id)
+        return index
+
+    def build(self, session: Session):
+        started = time.time()
+        rows = session.exec(
+            select(
+                UserBookStatus.user_id,
+                UserBookStatus.book_id,
+                UserBookStatus.status,
+                UserBookStatus.rating,
+            )
+        ).all()
+        users = {user_id: n for n, user_id in enumerate({row[0] for row in rows})}
+        book_ids = np.array(sorted({row[1] for row in rows}), dtype=np.int64)
+        index_of = {int(book_id): n for n, book_id in enumerate(book_ids)}
+
+        interactions = sparse.csr_matrix(
+            (
+                [interaction_weight(status, rating) for _, _, status, rating in rows],
+                (
+                    [users[row[0]] for row in rows],
+                    [index_of[row[1]] for row in rows],
+                ),
+            ),
+            shape=(len(users), len(book_ids)),
+        )
+        self.load((interactions.T @ interactions).tocsr(), book_ids, started)
+        print(f"Built co-occurrence index over {len(book_ids)} books")
+
+    def load(
+        self,
+        matrix: sparse.csr_matrix,
+        book_ids: np.ndarray,
+        built_at: float | None = None,
+    ):
+        with self._lock:
+            self.matrix = matrix
+            self.diagonal = matrix.diagonal()
+            self.book_ids = book_ids
+            self.index_of = {int(book_id): n for n, book_id in enumerate(book_ids)}
+            self._deltas.clear()
+            self._delta_count = 0
+            self.built = True
+            self.built_at = built_at
+
+    def save(self, path: str):
+        with self._lock:
+            self._compact()
+            built = {} if self.built_at is None else {"built_at": self.built_at}
+            np.savez(
+                path,
+                data=self.matrix.data,
+                indices=self.matrix.indices,
+                indptr=self.matrix.indptr,
+                shape=self.matrix.shape,
+                book_ids=self.book_ids,
+                **built,
+            )
+
+    def load_snapshot(self, path: str) -> bool:
+        if not Path(path).exists():
+            return False
+        snapshot = np.load(path)
+        matrix = sparse.csr_matrix(
+            (snapshot["data"], snapshot["indices"], snapshot["indptr"]),
+            shape=tuple(snapshot["shape"]),
+        )
+        # Snapshots written before build times were recorded count as stale.
+        built_at = float(snapshot["built_at"]) if "built_at" in snapshot.files else None
+        self.load(matrix, snapshot["book_ids"], built_at)
+        print(f"Loaded co-occurrence snapshot from {path}")
+        return True
+
+    def age(self) -> float:
+        """Seconds since the rows behind the index were read; inf if unknown."""
+        if self.built_at is None:
+            return float("inf")
+        return time.time() - self.built_at
+
+    def apply_change(
+        self,
+        book_id: int,
+        old_weight: float,
+        new_weight: float,
+        other_books: list[tuple[int, float]],
+    ):
+        """Update C after one user's weight for `book_id` changed.
+
+        `other_books` are that user's remaining (book_id, weight) entries.
+        """
+        change = new_weight - old_weight
+        if not self.built or change == 0:
+            return
+        with self._lock:
+            i = self._index(book_id)
+            self._deltas[i][i] += new_weight**2 - old_weight**2
+            for other_id, weight in other_books:
+                j = self._index(other_id)
+                self._deltas[i][j] += change * weight
+                self._deltas[j][i] += change * weight
+            self._delta_count += 1 + 2 * len(other_books)
+            if self._delta_count >= COMPACT_AFTER:
+                self._compact()
+
+    def _compact(self):
+        if not self._delta_count:
+            return
+        size = len(self.book_ids)
+        rows, cols, values = [], [], []
+        for i, row in self._deltas.items():
+            for j, value in row.items():
+                rows.append(i)
+                cols.append(j)
+                values.append(value)
+        delta = sparse.csr_matrix((values, (rows, cols)), shape=(size, size))
+        base = self.matrix
+        base.resize((size, size))
+        self.matrix = (base + delta).tocsr()
+        self.matrix.eliminate_zeros()
+        self.diagonal = self.matrix.diagonal()
+        self._deltas.clear()
+        self._delta_count = 0
+
+    def _row(self, i: int) -> dict[int, float]:
+        row = {}
+        if i < self.matrix.shape[0]:
+            start, end = self.matrix.indptr[i], self.matrix.indptr[i + 1]
+            row = dict(zip(self.matrix.indices[start:end], self.matrix.data[start:end]))
+        for j, value in self._deltas.get(i, {}).items():
+            row[j] = row.get(j, 0.0) + value
+        return row
+
+    def _diagonal(self, indices: np.ndarray) -> np.ndarray:
+        base = np.zeros(len(indices))
+        in_base = indices < len(self.diagonal)
+        base[in_base] = self.diagonal[indices[in_base]]
+        for n, j in enumerate(indices):
+            base[n] += self._deltas.get(j, {}).get(j, 0.0)
+        return base
+
+    def similar(self, book_id: int, limit: int = 10) -> list[tuple[int, float]]:
+        """Top `limit` (book_id, cosine) pairs most often saved with `book_id`."""
+        with self._lock:
+            i = self.index_of.get(book_id)
+            if i is None:
+                return []
+            row = self._row(i)
+            self_weight = row.pop(i, 0.0)
+            if self_weight <= 0 or not row:
+                return []
+            indices = np.fromiter(row.keys(), dtype=np.int64, count=len(row))
+            values = np.fromiter(row.values(), dtype=np.float64, count=len(row))
+            norms = np.sqrt(self._diagonal(indices) * self_weight)
+            book_ids = self.book_ids[indices]
+
+        keep = (values > 1e-9) & (norms > 0)
+        scores = values[keep] / norms[keep]
+        book_ids = book_ids[keep]
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit)[:limit]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(int(book_ids[n]), float(scores[n])) for n in top]
+
+
+index = CooccurrenceIndex()
+_build_lock = threading.Lock()
+
+
+def ensure_built(session: Session):
+    if not index.built:
+        with _build_lock:
+            if not index.built:
+                index.build(session)
+
+
+_stopping = threading.Event()
+_thread = None
+
+
+def rebuild(engine):
+    with Session(engine) as session, _build_lock:
+        index.build(session)
+
+
+def start(engine, interval: float):
+    """Rebuild the index from the DB every `interval` seconds in the background.
+
+    A snapshot misses saves made after it was written, and each API worker
+    only applies the changes it served itself; periodic rebuilds bound how
+    stale either can get. An index already older than `interval` (e.g. an
+    old snapshot) is rebuilt straight away and keeps serving meanwhile.
+    """
+
+    def run():
+        wait = max(0.0, interval - index.age())
+        while not _stopping.wait(wait):
+            try:
+                rebuild(engine)
+            except Exception as e:
+                print(f"Co-occurrence rebuild failed: {e}")
+            wait = interval
+
+    global _thread
+    _stopping.clear()
+    _thread = threading.Thread(target=run, name="cooccurrence-rebuild", daemon=True)
+    _thread.start()
+
+
+def stop():
+    global _thread
+    _stopping.set()
+    if _thread is not None:
+        _thread.join(timeout=5)
+        _thread = None
+
+
+def record_change(
+    session: Session,
+    user_id: int,
+    book_id: int,
+    old_weight: float,
+    new_weight: float,
+):
+    """Feed a committed save/PATCH/DELETE into the index."""
+    if not index.built:
+        return
+    others = session.exec(
+        select(UserBookStatus.book_id, UserBookStatus.status, UserBookStatus.rating)
+        .where(UserBookStatus.user_id == user_id)
+        .where(UserBookStatus.book_id != book_id)
+    ).all()
+    index.apply_change(
+        book_id,
+        old_weight,
+        new_weight,
+        [
+            (other, interaction_weight(status, rating))
+            for other, status, rating in others
+        ],
+    )
+
+
+def record_changes(session: Session, user_id: int, old_weights: dict[int, float]):
+    """Feed a committed batch of one user's changes into the index.
+
+    `old_weights` maps each changed book to its weight before the batch; the
+    new weights are read back. Changes are applied one at a time against the
+    user's shelf as it stood between them, which keeps the cross terms
+    between two changed books exact.
+    """
+    if not index.built or not old_weights:
+        return
+    rows = session.exec(
+        select(
+            UserBookStatus.book_id, UserBookStatus.status, UserBookStatus.rating
+        ).where(UserBookStatus.user_id == user_id)
+    ).all()
+    new_weights = {
+        book_id: interaction_weight(status, rating) for book_id, status, rating in rows
+    }
+    shelf = {**new_weights, **old_weights}
+    for book_id, old_weight in old_weights.items():
+        new_weight = new_weights.get(book_id, 0.0)
+        index.apply_change(
+            book_id,
+            old_weight,
+            new_weight,
+            [
+                (other, weight)
+                for other, weight in shelf.items()
+                if other != book_id and weight
+            ],
+        )
+        shelf[book_id] = new_weight
+
+
+if __name__ == "__main__":
+    # Offline full rebuild; the API loads the snapshot on startup and rebuilds
+    # in the background once it is older than COOCCURRENCE_REBUILD_SECONDS.
+    from config import settings
+    from db import engine
+
+    with Session(engine) as session:
+        index.build(session)
+    index.save(settings.COOCCURRENCE_SNAPSHOT)
+    print(f"Wrote co-occurrence snapshot to {settings.COOCCURRENCE_SNAPSHOT}")
@@ -0,0 +1,267 @@
+import hashlib
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO
+
+import httpx
+from PIL import Image, UnidentifiedImageError
+
+from config import settings
+from models import BOOK_COVER_URL
+from services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Requested widths snap up to one of these, bounding the variants per book.
+COVER_WIDTHS = (80, 120, 160, 240, 320, 480)
+PLACEHOLDER_SIZE = (128, 192)
+PLACEHOLDER_KEY = "placeholder"
+# Last-access times are only rewritten when older than this.
+TOUCH_AFTER = 60
+
+
+class CoverStore:
+    """Content-addressed cover images on disk, bounded by `max_bytes`.
+
+    Files are named by the sha256 of their bytes, so the many books sharing
+    one "no cover" image take a single file. A SQLite index maps each
+    (bookid, width) variant to its digest and tracks last access; once the
+    files total more than `max_bytes` the least recently used variants are
+    dropped until 90% remains, along with files nothing references any more.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(
+                self.root / "index.sqlite3", check_same_thread=False
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cover ("
+                "key TEXT PRIMARY KEY, digest TEXT NOT NULL, "
+                "media_type TEXT NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_cover_accessed_at ON cover (accessed_at)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_cover_digest ON cover (digest)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS blob "
+                "(digest TEXT PRIMARY KEY, size INTEGER NOT NULL)"
+            )
+        return self._conn
+
+    def path_for(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def get(self, key: str) -> tuple[BinaryIO, str, str] | None:
+        """(file, digest, media_type) of a stored variant, or None.
+
+        The file is opened under the lock, so eviction by another thread
+        cannot unlink it between lookup and open; the open handle stays
+        readable after an unlink. The caller closes it.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT digest, media_type, accessed_at FROM cover WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            digest, media_type, accessed_at = row
+            try:
+                file = self.path_for(digest).open("rb")
+            except FileNotFoundError:
+                # Evicted by another worker sharing the directory.
+                conn.execute("DELETE FROM cover WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            if accessed_at < now - TOUCH_AFTER:
+                conn.execute(
+                    "UPDATE cover SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+                conn.commit()
+            return file, digest, media_type
+
+    def put(self, key: str, data: bytes, media_type: str) -> str:
+        """Store `data` under `key` and return its digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        with self._lock:
+            conn = self._connection()
+            if not path.exists():
+                path.parent.mkdir(exist_ok=True)
+                temporary = path.with_suffix(f".{os.getpid()}.tmp")
+                temporary.write_bytes(data)
+                os.replace(temporary, path)
+            conn.execute(
+                "INSERT OR IGNORE INTO blob VALUES (?, ?)", (digest, len(data))
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO cover VALUES (?, ?, ?, ?)",
+                (key, digest, media_type, time.time()),
+            )
+            self._evict(conn)
+            conn.commit()
+        return digest
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            conn = self._connection()
+            return conn.execute("SELECT COALESCE(SUM(size), 0) FROM blob").fetchone()[0]
+
+    def _evict(self, conn: sqlite3.Connection):
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blob").fetchone()
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        oldest = conn.execute(
+            "SELECT key, digest FROM cover ORDER BY accessed_at"
+        ).fetchall()
+        for key, digest in oldest:
+            if total <= target:
+                break
+            conn.execute("DELETE FROM cover WHERE key = ?", (key,))
+            still_used = conn.execute(
+                "SELECT 1 FROM cover WHERE digest = ? LIMIT 1", (digest,)
+            ).fetchone()
+            if still_used:
+                continue
+            (size,) = conn.execute(
+                "SELECT size FROM blob WHERE digest = ?", (digest,)
+            ).fetchone()
+            conn.execute("DELETE FROM blob WHERE digest = ?", (digest,))
+            self.path_for(digest).unlink(missing_ok=True)
+            total -= size
+
+
+store = CoverStore(settings.COVER_CACHE_DIR, settings.COVER_CACHE_MAX_BYTES)
+inflight = SingleFlight()
+
+
+def snap_width(width: int | None) -> int | None:
+    if width is None:
+        return None
+    return next((size for size in COVER_WIDTHS if size >= width), COVER_WIDTHS[-1])
+
+
+def fetch_original(bookid: str) -> tuple[bytes, str] | None:
+    """The cover as Google serves it, or None when it has no image for `bookid`.
+
+    Only a 404 or a 200 that is not a readable image count as "no cover";
+    transport errors and other error statuses (429, 5xx) raise so a temporary
+    failure is not cached.
+    """
+    response = httpx.get(
+        BOOK_COVER_URL.format(bookid=bookid),
+        timeout=settings.GOOGLE_TIMEOUT_SECONDS,
+        follow_redirects=True,
+    )
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    media_type = response.headers.get("Content-Type", "").split(";")[0]
+    if response.status_code != 200 or not media_type.startswith("image/"):
+        return None
+    try:
+        Image.open(io.BytesIO(response.content))
+    except UnidentifiedImageError:
+        logger.warning("Cover for %s is not an image Pillow can read", bookid)
+        return None
+    return response.content, media_type
+
+
+def resize(data: bytes, width: int) -> bytes:
+    """A JPEG at most `width` pixels wide; smaller images are not upscaled.
+
+    Data Pillow cannot decode (e.g. a truncated download) is replaced by the
+    placeholder.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except OSError as e:
+        logger.warning("Could not decode cover image, using the placeholder: %s", e)
+        image = Image.open(io.BytesIO(placeholder_image()))
+    with image:
+        image = image.convert("RGB")
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, "JPEG", quality=85, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def placeholder_image() -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", PLACEHOLDER_SIZE, (224, 224, 224)).save(out, "JPEG")
+    return out.getvalue()
+
+
+def _variant(key: str, width: int | None, load_original) -> tuple[BinaryIO, str, str]:
+    variant_key = f"{key}:{width or 'original'}"
+    cover = store.get(variant_key)
+    if cover is not None:
+        return cover
+
+    def build():
+        original = store.get(f"{key}:original")
+        if original is None:
+            data, media_type = load_original()
+            digest = store.put(f"{key}:original", data, media_type)
+        else:
+            file, digest, media_type = original
+            with file:
+                data = file.read()
+        if width is None:
+            return data, digest, media_type
+        data = resize(data, width)
+        return data, store.put(variant_key, data, "image/jpeg"), "image/jpeg"
+
+    # The bytes are already in memory on a miss; each waiter gets its own reader.
+    data, digest, media_type = inflight.do(variant_key, build)
+    return io.BytesIO(data), digest, media_type
+
+
+def iter_file(file: BinaryIO, chunk_size: int = 64 * 1024):
+    """Yield `file` in chunks, closing it once exhausted."""
+    with file:
+        while chunk := file.read(chunk_size):
+            yield chunk
+
+
+def get_placeholder(width: int | None = None) -> tuple[BinaryIO, str, str]:
+    return _variant(
+        PLACEHOLDER_KEY,
+        snap_width(width),
+        lambda: (placeholder_image(), "image/jpeg"),
+    )
+
+
+def get_cover(bookid: str, width: int | None = None) -> tuple[BinaryIO, str, str]:
+    """(file, digest, media_type) of `bookid`'s cover at about `width` pixels.
+
+    Books Google has no cover for get the placeholder, which is cached too.
+    """
+    return _variant(
+        bookid,
+        snap_width(width),
+        lambda: fetch_original(bookid) or (placeholder_image(), "image/jpeg"),
+    )
@@ -1,22 +1,232 @@
+import hashlib
+import random
 import textwrap
+import threading
+import time
 import urllib.parse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import httpx
-from bs4 import BeautifulSoup
+
+from config import settings
+from services.cache import make_cache
+from services.html_text import strip_tags
+from services.quota import Priority, QuotaExceeded, QuotaGovernor
+from services.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LatencyStats,
+    hedged_call,
+)
+from services.singleflight import SingleFlight
 
 BASE_URL = "https://www.googleapis.com/books/v1/volumes"
 BOOK_URL = BASE_URL + "/{}"
 SEARCH_URL = BASE_URL + "?q={}&langRestrict=en"
 
+DETAILS_CACHE_TTL = 60 * 60
+SEARCH_CACHE_TTL = 15 * 60
+PREFETCH_TOP_K = 5
+PREFETCH_MAX_WORKERS = 4
+PREFETCH_BUDGET_PER_MINUTE = 30
+MAX_RETRIES = 3
+BACKOFF_BASE = 1.0
+RETRY_STATUSES = {429, 503}
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.05
+# A call this many times slower than the host's p95 counts as a failure.
+SLOW_CALL_P95_FACTOR = 4
+MIN_SLOW_CALL_SECONDS = 0.5
+
+
+class UpstreamServerError(httpx.HTTPStatusError):
+    """Google answered with a 5xx, after any retries."""
+
+    retry_after = 5.0
+
+
+# Errors meaning Google could not be reached in time; callers may fall back.
+UPSTREAM_UNAVAILABLE = (
+    CircuitOpenError,
+    QuotaExceeded,
+    httpx.TransportError,
+    UpstreamServerError,
+)
+
+details_cache = make_cache("details", ttl=DETAILS_CACHE_TTL, maxsize=2048)
+search_cache = make_cache("search", ttl=SEARCH_CACHE_TTL, maxsize=1024)
+description_cache = make_cache("descriptions", ttl=DETAILS_CACHE_TTL, maxsize=2048)
+# Each API worker runs its own governor, so each gets an equal share.
+governor = QuotaGovernor(
+    per_minute=settings.per_worker(settings.GOOGLE_QUOTA_PER_MINUTE),
+    per_day=settings.per_worker(settings.GOOGLE_QUOTA_PER_DAY),
+)
+inflight = SingleFlight()
+breakers: dict[str, CircuitBreaker] = {}
+latency_stats: dict[str, LatencyStats] = {}
+_hosts_lock = threading.Lock()
+
+
+def _host_state(url: str) -> tuple[CircuitBreaker, LatencyStats]:
+    host = urllib.parse.urlsplit(url).hostname
+    with _hosts_lock:
+        if host not in breakers:
+            breakers[host] = CircuitBreaker(
+                host,
+                failure_threshold=settings.GOOGLE_BREAKER_FAILURES,
+                reset_timeout=settings.GOOGLE_BREAKER_RESET_SECONDS,
+                slow_call_threshold=settings.GOOGLE_SLOW_CALL_SECONDS,
+            )
+            latency_stats[host] = LatencyStats()
+        return breakers[host], latency_stats[host]
+
+
+def _timed_get(url: str, stats: LatencyStats) -> httpx.Response:
+    started = time.monotonic()
+    response = httpx.get(url, timeout=settings.GOOGLE_TIMEOUT_SECONDS)
+    stats.record(time.monotonic() - started)
+    return response
+
+
+def _send(url: str, priority: Priority, stats: LatencyStats) -> httpx.Response:
+    """Send once, or hedge with a second attempt after the host's p95 latency."""
+    if not settings.GOOGLE_HEDGE_REQUESTS or stats.count() < HEDGE_MIN_SAMPLES:
+        return _timed_get(url, stats)
+    delay = max(HEDGE_MIN_DELAY, stats.percentile(95))
+    return hedged_call(
+        lambda: _timed_get(url, stats),
+        delay,
+        can_hedge=lambda: governor.try_acquire(priority),
+    )
+
+
+def _slow_call_threshold(stats: LatencyStats) -> float:
+    """Calls slower than this count against the host's breaker.
+
+    Relative to the host's own p95, so a brownout shows up against its usual
+    speed, but never above GOOGLE_SLOW_CALL_SECONDS: the window includes the
+    slow calls, and a host that degrades gradually must still trip.
+    """
+    ceiling = settings.GOOGLE_SLOW_CALL_SECONDS
+    if stats.count() < HEDGE_MIN_SAMPLES:
+        return ceiling
+    relative = SLOW_CALL_P95_FACTOR * stats.percentile(95)
+    return min(ceiling, max(MIN_SLOW_CALL_SECONDS, relative))
+
+
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Honour Retry-After when present, otherwise full-jitter exponential backoff."""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return random.uniform(0, BACKOFF_BASE * 2**attempt)
+
+
+def google_get(url: str, priority: Priority = Priority.INTERACTIVE) -> httpx.Response:
+    """GET a Google Books URL under the quota governor and circuit breaker."""
+    breaker, stats = _host_state(url)
+    breaker.before_call()
+    try:
+        for attempt in range(MAX_RETRIES + 1):
+            governor.acquire(priority)
+            started = time.monotonic()
+            response = _send(url, priority, stats)
+            elapsed = time.monotonic() - started
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                break
+            delay = _retry_delay(response, attempt)
+            print(
+                f"Google Books returned {response.status_code}, backing off {delay:.1f}s"
+            )
+            governor.backoff(delay)
+    except QuotaExceeded:
+        breaker.abandon()
+        raise
+    except httpx.TransportError:
+        breaker.record_failure()
+        raise
+
+    if response.status_code == 429:
+        # Still throttled after every retry: a quota problem, not a host fault.
+        breaker.abandon()
+        retry_after = response.headers.get("Retry-After", "")
+        raise QuotaExceeded(
+            "Google Books is rate limiting requests.",
+            retry_after=float(retry_after) if retry_after.isdigit() else 60.0,
+        )
+    breaker.record(response.status_code < 500, elapsed, _slow_call_threshold(stats))
+    if response.status_code >= 500:
+        raise UpstreamServerError(
+            f"Google Books returned {response.status_code}",
+            request=response.request,
+            response=response,
+        )
+    response.raise_for_status()
+    return response
+
+
+def upstream_health() -> dict:
+    with _hosts_lock:
+        hosts = list(breakers)
+    return {
+        host: {**breakers[host].summary(), "latency": latency_stats[host].summary()}
+        for host in hosts
+    }
+
+
+def normalize_term(term: str) -> str:
+    return " ".join(term.casefold().split())
+
+
+def search_books(term: str, priority: Priority = Priority.INTERACTIVE):
+    """Search books by term, sharing one upstream call among concurrent callers.
+
+    Only callers of the same priority share a call, so an interactive search
+    never inherits a prefetch's short quota deadline or its failure.
+    """
+    key = normalize_term(term)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached
+    try:
+        return inflight.do(("search", key, priority), _search_books, term, priority)
+    except UPSTREAM_UNAVAILABLE:
+        stale = search_cache.get(key, stale=True)
+        if stale is None:
+            raise
+        return stale
+
+
+async def search_books_async(term: str, priority: Priority = Priority.INTERACTIVE):
+    key = normalize_term(term)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached
+    try:
+        return await inflight.do_async(
+            ("search", key, priority), _search_books, term, priority
+        )
+    except UPSTREAM_UNAVAILABLE:
+        stale = search_cache.get(key, stale=True)
+        if stale is None:
+            raise
+        return stale
+
 
-def search_books(term: str):
+def _search_books(term: str, priority: Priority):
     """Search books by term"""
+    books = _query_books(term, priority)
+    search_cache.set(normalize_term(term), books)
+    return books
+
+
+def _query_books(term: str, priority: Priority):
 
     encoded_term = urllib.parse.quote(term)
     query = SEARCH_URL.format(encoded_term)
 
-    response = httpx.get(query)
-    response.raise_for_status()
+    response = google_get(query, priority)
 
     data = response.json()
 
@@ -70,15 +280,138 @@ def search_books(term: str):
     return books
 
 
-def get_book_details(book_id: str):
-    """Retrieve details for a specific book."""
+def get_book_details(book_id: str, priority: Priority = Priority.INTERACTIVE):
+    """Retrieve details for a specific book, using the details cache when warm."""
+    cached = details_cache.get(book_id)
+    if cached is not None:
+        return cached
+    try:
+        return inflight.do(
+            ("details", book_id, priority), _fetch_book_details, book_id, priority
+        )
+    except UPSTREAM_UNAVAILABLE:
+        stale = details_cache.get(book_id, stale=True)
+        if stale is None:
+            raise
+        return stale
+
+
+async def get_book_details_async(
+    book_id: str, priority: Priority = Priority.INTERACTIVE
+):
+    cached = details_cache.get(book_id)
+    if cached is not None:
+        return cached
+    try:
+        return await inflight.do_async(
+            ("details", book_id, priority), _fetch_book_details, book_id, priority
+        )
+    except UPSTREAM_UNAVAILABLE:
+        stale = details_cache.get(book_id, stale=True)
+        if stale is None:
+            raise
+        return stale
+
+
+def _fetch_book_details(book_id: str, priority: Priority):
     book_url = BOOK_URL.format(book_id)
-    response = httpx.get(book_url)
-    response.raise_for_status()
-    return response.json().get("volumeInfo", {})
+    response = google_get(book_url, priority)
+    details = response.json().get("volumeInfo", {})
+    details_cache.set(book_id, details)
+    return details
+
+
+class MinuteBudget:
+    """Sliding one-minute window that caps how many calls may be spent."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._calls and now - self._calls[0] >= 60:
+                self._calls.popleft()
+            if len(self._calls) >= self.limit:
+                return False
+            self._calls.append(now)
+            return True
+
+
+prefetch_budget = MinuteBudget(settings.per_worker(PREFETCH_BUDGET_PER_MINUTE))
+_prefetch_executor = ThreadPoolExecutor(
+    max_workers=PREFETCH_MAX_WORKERS, thread_name_prefix="google-prefetch"
+)
+
+
+class Prefetch:
+    """Handle for a batch of scheduled detail prefetches."""
+
+    def __init__(self):
+        self.futures = []
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Stop queued lookups; ones already on the wire finish into the cache."""
+        self._cancelled.set()
+        for future in self.futures:
+            future.cancel()
+
+    def wait(self, timeout: float | None = None):
+        for future in self.futures:
+            if not future.cancelled():
+                future.result(timeout=timeout)
+
+
+def _prefetch_one(book_id: str, handle: Prefetch):
+    if handle.cancelled or book_id in details_cache:
+        return
+    if not prefetch_budget.try_acquire():
+        print(f"Prefetch budget exhausted, skipping: {book_id}")
+        return
+    try:
+        get_book_details(book_id, Priority.PREFETCH)
+    except (httpx.HTTPError, QuotaExceeded, CircuitOpenError) as e:
+        print(f"Prefetch failed for {book_id}: {e}")
+
+
+def prefetch_book_details(book_ids: list[str], top_k: int = PREFETCH_TOP_K) -> Prefetch:
+    """Warm the details cache for the first `top_k` ids in the background."""
+    handle = Prefetch()
+    for book_id in book_ids[:top_k]:
+        if book_id in details_cache:
+            continue
+        handle.futures.append(_prefetch_executor.submit(_prefetch_one, book_id, handle))
+    return handle
+
+
+def clean_and_shorten_description(
+    description: str, max_length: int = 300, volume_id: str | None = None
+):
+    """Remove HTML tags from the description and truncate it.
+
+    With a `volume_id` the result is memoized, keyed on a digest of the
+    description so an edited description upstream is cleaned afresh.
+    """
+    if volume_id is None:
+        return _clean_description(description, max_length)
+    digest = hashlib.blake2b(description.encode(), digest_size=16).hexdigest()
+    key = f"{volume_id}:{max_length}"
+    cached = description_cache.get(key)
+    if cached is not None and cached[0] == digest:
+        return cached[1]
+    cleaned = _clean_description(description, max_length)
+    description_cache.set(key, [digest, cleaned])
+    return cleaned
 
 
-def clean_and_shorten_description(description: str, max_length: int = 300):
-    """Remove HTML tags from the description and truncate it."""
-    plain_text = BeautifulSoup(description, "html.parser").get_text()
-    return textwrap.shorten(plain_text, width=max_length, placeholder="...")
+def _clean_description(description: str, max_length: int) -> str:
+    return textwrap.shorten(
+        strip_tags(description), width=max_length, placeholder="..."
+    )
@@ -0,0 +1,123 @@
+from html.entities import html5
+from html.parser import HTMLParser
+
+# Mirrors BeautifulSoup's html.parser tree builder, so `strip_tags(markup)`
+# equals `BeautifulSoup(markup, "html.parser").get_text()`.
+VOID_ELEMENTS = frozenset(
+    "area base basefont bgsound br col command embed frame hr image img input "
+    "isindex keygen link menuitem meta nextid param source spacer track wbr".split()
+)
+# get_text() skips the strings inside these.
+HIDDEN_CONTAINERS = frozenset({"script", "style", "template", "rt", "rp"})
+PRESERVE_WHITESPACE = frozenset({"pre", "textarea"})
+ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+NAMED_ENTITIES = {
+    name[:-1]: value for name, value in html5.items() if name.endswith(";")
+}
+
+
+def numeric_reference(code: int) -> str:
+    """The character `&#code;` stands for, by the rules bs4 applies."""
+    if code == 0 or code > 0x10FFFF or 0xD800 <= code <= 0xDFFF:
+        return "\ufffd"
+    if 0x80 <= code <= 0x9F:
+        # C1 controls are read as the windows-1252 byte they were meant as.
+        try:
+            return bytes([code]).decode("cp1252")
+        except UnicodeDecodeError:
+            pass
+    return chr(code)
+
+
+class TextExtractor(HTMLParser):
+    """Single-pass tag stripper; no tree is built.
+
+    Text is buffered into the same segments BeautifulSoup would create (one
+    per run between markup events) so whitespace-only segments collapse the
+    same way, and kept unless a hidden container is open when it ends.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.parts: list[str] = []
+        self._segment: list[str] = []
+        self._open: list[str] = []
+        self._hidden = 0
+        self._preserve = 0
+
+    def _flush(self, always_keep: bool = False):
+        if not self._segment:
+            return
+        text = "".join(self._segment)
+        self._segment = []
+        if not self._preserve and not text.strip(ASCII_SPACES):
+            text = "\n" if "\n" in text else " "
+        if always_keep or not self._hidden:
+            self.parts.append(text)
+
+    def _push(self, tag: str):
+        self._open.append(tag)
+        self._hidden += tag in HIDDEN_CONTAINERS
+        self._preserve += tag in PRESERVE_WHITESPACE
+
+    def _pop_to(self, tag: str):
+        if tag not in self._open:
+            return
+        while self._open:
+            popped = self._open.pop()
+            self._hidden -= popped in HIDDEN_CONTAINERS
+            self._preserve -= popped in PRESERVE_WHITESPACE
+            if popped == tag:
+                return
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag not in VOID_ELEMENTS:
+            self._push(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush()
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag not in VOID_ELEMENTS:
+            self._pop_to(tag)
+
+    def handle_data(self, data):
+        self._segment.append(data)
+
+    def handle_entityref(self, name):
+        # Unknown names stay literal, minus the semicolon, as in bs4.
+        self._segment.append(NAMED_ENTITIES.get(name, f"&{name}"))
+
+    def handle_charref(self, name):
+        self._segment.append(
+            numeric_reference(int(name[1:], 16) if name[:1] in "xX" else int(name))
+        )
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def unknown_decl(self, data):
+        self._flush()
+        if data.upper().startswith("CDATA["):
+            self._segment.append(data[len("CDATA[") :])
+            # CDATA is kept even inside hidden containers.
+            self._flush(always_keep=True)
+
+    def text(self) -> str:
+        self._flush()
+        return "".join(self.parts)
+
+
+def strip_tags(markup: str) -> str:
+    extractor = TextExtractor()
+    extractor.feed(markup)
+    extractor.close()
+    return extractor.text()
@@ -0,0 +1,64 @@
+import hashlib
+import json
+from datetime import UTC, datetime
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+
+def make_etag(*parts) -> str:
+    """Weak ETag over any JSON-serialisable parts."""
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode()
+    return f'W/"{hashlib.sha256(encoded).hexdigest()[:20]}"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" name the same representation.
+    wanted = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == wanted
+        for candidate in if_none_match.split(",")
+    )
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: datetime | None = None
+) -> bool:
+    """RFC 9110 precedence: If-None-Match wins over If-Modified-Since."""
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        return _matches(if_none_match, etag)
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return last_modified.replace(tzinfo=UTC, microsecond=0) <= since
+    return False
+
+
+def conditional_response(
+    request: Request,
+    etag: str,
+    build,
+    cache_control: str,
+    last_modified: datetime | None = None,
+) -> Response:
+    """304 when the client's copy is current, else the JSON from `build()`.
+
+    `build` is only called on a miss, so a revalidation skips both the work
+    behind the body and its serialisation.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(
+            last_modified.replace(tzinfo=UTC), usegmt=True
+        )
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(jsonable_encoder(build()), headers=headers)
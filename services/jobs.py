@@ -0,0 +1,165 @@
+import json
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+from sqlmodel import Session, select
+
+from models import JobStatus, RecommendationJob
+
+# A running job older than this is assumed to belong to a dead worker.
+STALE_AFTER = timedelta(minutes=10)
+MAX_ATTEMPTS = 3
+
+
+def enqueue(session: Session, **fields) -> RecommendationJob:
+    job = RecommendationJob(**fields)
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    return job
+
+
+def fail_abandoned(session: Session) -> int:
+    """Mark jobs whose worker died during their last attempt as FAILED."""
+    now = datetime.utcnow()
+    failed = session.execute(
+        update(RecommendationJob)
+        .where(RecommendationJob.status == JobStatus.RUNNING)
+        .where(RecommendationJob.started_at < now - STALE_AFTER)
+        .where(RecommendationJob.attempts >= MAX_ATTEMPTS)
+        .values(
+            status=JobStatus.FAILED,
+            error=f"Abandoned by its worker after {MAX_ATTEMPTS} attempts.",
+            finished_at=now,
+        )
+    ).rowcount
+    if failed:
+        session.commit()
+    return failed
+
+
+def claim_next(session: Session) -> RecommendationJob | None:
+    """Atomically move the oldest runnable job to RUNNING and return it.
+
+    The conditional UPDATE makes the claim safe between competing workers,
+    in-process or in separate `python -m services.jobs` processes. Stale jobs
+    that have no attempts left are failed first.
+    """
+    fail_abandoned(session)
+    stale_before = datetime.utcnow() - STALE_AFTER
+    runnable = or_(
+        RecommendationJob.status == JobStatus.QUEUED,
+        (RecommendationJob.status == JobStatus.RUNNING)
+        & (RecommendationJob.started_at < stale_before),
+    )
+    candidates = session.exec(
+        select(RecommendationJob.id, RecommendationJob.status)
+        .where(runnable)
+        .where(RecommendationJob.attempts < MAX_ATTEMPTS)
+        .order_by(RecommendationJob.id)
+        .limit(5)
+    ).all()
+
+    for job_id, status in candidates:
+        claimed = session.execute(
+            update(RecommendationJob)
+            .where(RecommendationJob.id == job_id)
+            .where(RecommendationJob.status == status)
+            .where(runnable)
+            .values(
+                status=JobStatus.RUNNING,
+                started_at=datetime.utcnow(),
+                attempts=RecommendationJob.attempts + 1,
+            )
+        )
+        session.commit()
+        if claimed.rowcount == 1:
+            return session.get(RecommendationJob, job_id)
+    return None
+
+
+def run_job(session: Session, job: RecommendationJob, handler):
+    """Run `handler(session, job)` and store its JSON-able result on the job."""
+    try:
+        result = handler(session, job)
+    except Exception as e:
+        session.rollback()
+        print(f"Recommendation job {job.id} failed: {e}")
+        job.status = JobStatus.FAILED
+        job.error = str(e) or type(e).__name__
+    else:
+        job.status = JobStatus.SUCCEEDED
+        job.result = json.dumps(result)
+        job.error = None
+    job.finished_at = datetime.utcnow()
+    session.add(job)
+    session.commit()
+
+
+class JobWorkerPool:
+    """Fixed number of worker threads draining the recommendation job table.
+
+    Workers poll every `poll_interval` seconds; `notify` wakes them at once
+    when a job is enqueued in the same process.
+    """
+
+    def __init__(self, engine, handler, concurrency: int, poll_interval: float = 1.0):
+        self.engine = engine
+        self.handler = handler
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for n in range(self.concurrency):
+            thread = threading.Thread(
+                target=self._work, name=f"job-worker-{n}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        self._wakeup.set()
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                with Session(self.engine) as session:
+                    job = claim_next(session)
+                    if job is not None:
+                        run_job(session, job, self.handler)
+                        continue
+            except Exception as e:
+                print(f"Job worker error: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+
+if __name__ == "__main__":
+    # Standalone worker process; set JOB_WORKERS=0 on the API to use only this.
+    from config import settings
+    from db import engine
+    from main import run_recommendation_job
+
+    pool = JobWorkerPool(
+        engine,
+        run_recommendation_job,
+        concurrency=max(settings.JOB_WORKERS, 1),
+        poll_interval=settings.JOB_POLL_SECONDS,
+    )
+    pool.start()
+    print(f"Recommendation workers running: {pool.concurrency}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pool.stop()
@@ -0,0 +1,401 @@
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, delete, event, func, insert, update
+from sqlmodel import Session, select
+
+from models import (
+    BatchOutcome,
+    ChangeOp,
+    LibraryVersion,
+    StatusEnum,
+    UserBookBatchItem,
+    UserBookBatchResult,
+    UserBookChange,
+    UserBookStatus,
+    UserBookTombstone,
+)
+from services import reading_stats, trending
+
+
+def bump_version(connection, user_id: int) -> int:
+    """Increment and return `user_id`'s library version on `connection`.
+
+    Runs inside the caller's transaction, so the new version becomes
+    visible together with the change it describes.
+    """
+    now = datetime.utcnow()
+    bumped = connection.execute(
+        update(LibraryVersion)
+        .where(LibraryVersion.user_id == user_id)
+        .values(version=LibraryVersion.version + 1, updated_at=now)
+    )
+    if bumped.rowcount == 0:
+        connection.execute(
+            insert(LibraryVersion).values(user_id=user_id, version=1, updated_at=now)
+        )
+    return connection.execute(
+        select(LibraryVersion.version).where(LibraryVersion.user_id == user_id)
+    ).scalar_one()
+
+
+def record_deleted(connection, user_id: int, book_ids: list[int], version: int):
+    connection.execute(
+        delete(UserBookTombstone)
+        .where(UserBookTombstone.user_id == user_id)
+        .where(UserBookTombstone.book_id.in_(book_ids))
+    )
+    connection.execute(
+        insert(UserBookTombstone),
+        [
+            {"user_id": user_id, "book_id": book_id, "version": version}
+            for book_id in book_ids
+        ],
+    )
+
+
+def record_restored(connection, user_id: int, book_ids: list[int]):
+    connection.execute(
+        delete(UserBookTombstone)
+        .where(UserBookTombstone.user_id == user_id)
+        .where(UserBookTombstone.book_id.in_(book_ids))
+    )
+
+
+def _stored_entries(connection, user_id: int, book_ids: list[int]) -> dict:
+    """(status, rating, completed_at) per book as the database holds them.
+
+    Read back rather than taken from attribute history, which is empty for
+    attributes set on an instance expired by an earlier commit.
+    """
+    rows = connection.execute(
+        select(
+            UserBookStatus.book_id,
+            UserBookStatus.status,
+            UserBookStatus.rating,
+            UserBookStatus.completed_at,
+        )
+        .where(UserBookStatus.user_id == user_id)
+        .where(UserBookStatus.book_id.in_(book_ids))
+    ).all()
+    return {book_id: tuple(entry) for book_id, *entry in rows}
+
+
+@event.listens_for(Session, "before_flush")
+def track_library_changes(session, flush_context, instances):
+    """Version and log every flushed save, edit and delete of a `UserBookStatus`.
+
+    Each user touched by the flush gets one version bump; changed rows are
+    stamped with it and with `updated_at`, deleted rows leave a tombstone,
+    every change is appended to `userbook_change` and folded into the
+    user's reading stats.
+    """
+    now = datetime.utcnow()
+    changes = defaultdict(list)
+    for row in session.new:
+        if isinstance(row, UserBookStatus):
+            row.updated_at = now
+            if row.completed_at is None:
+                row.completed_at = reading_stats.completed_at(
+                    None, None, row.status, now
+                )
+            changes[row.user_id].append((row, ChangeOp.SAVE))
+    for row in session.dirty:
+        if isinstance(row, UserBookStatus) and session.is_modified(row):
+            row.updated_at = now
+            changes[row.user_id].append((row, ChangeOp.UPDATE))
+    for row in session.deleted:
+        if isinstance(row, UserBookStatus):
+            changes[row.user_id].append((row, ChangeOp.DELETE))
+
+    if not changes:
+        return
+    # Core statements on the connection: session.execute would autoflush.
+    connection = session.connection()
+    for user_id, user_changes in changes.items():
+        stored = _stored_entries(
+            connection,
+            user_id,
+            [row.book_id for row, op in user_changes if op != ChangeOp.SAVE],
+        )
+        version = bump_version(connection, user_id)
+        upserted, deleted, stats = [], [], []
+        for row, op in user_changes:
+            before = stored.get(row.book_id)
+            if op == ChangeOp.DELETE:
+                deleted.append(row.book_id)
+                stats.append((row.book_id, before, None))
+                continue
+            if op == ChangeOp.UPDATE and before is not None:
+                row.completed_at = reading_stats.completed_at(
+                    before[0], before[2], row.status, now
+                )
+            row.version = version
+            upserted.append(row.book_id)
+            if before is None or StatusEnum(before[0]) != StatusEnum(row.status):
+                queue_trending(session, row.book_id, row.status)
+            stats.append(
+                (row.book_id, before, (row.status, row.rating, row.completed_at))
+            )
+        if upserted:
+            record_restored(connection, user_id, upserted)
+        if deleted:
+            record_deleted(connection, user_id, deleted, version)
+        log_changes(
+            connection,
+            user_id,
+            [(row.book_id, op) for row, op in user_changes],
+            version,
+            now,
+        )
+        reading_stats.record_changes(connection, user_id, stats)
+
+
+def queue_trending(session: Session, book_id: int, status: str):
+    """Count a save or status change towards trending once it commits."""
+    session.info.setdefault("trending", []).append((book_id, status))
+
+
+@event.listens_for(Session, "after_commit")
+def publish_trending(session):
+    for book_id, status in session.info.pop("trending", ()):
+        trending.tracker.record_status(book_id, status)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_trending(session):
+    session.info.pop("trending", None)
+
+
+def log_changes(
+    connection,
+    user_id: int,
+    changes: list[tuple[int, ChangeOp]],
+    version: int,
+    ts: datetime,
+):
+    connection.execute(
+        insert(UserBookChange),
+        [
+            {
+                "user_id": user_id,
+                "book_id": book_id,
+                "op": op,
+                "version": version,
+                "ts": ts,
+            }
+            for book_id, op in changes
+        ],
+    )
+
+
+def changes_after(
+    session: Session, user_id: int, after_id: int, limit: int
+) -> list[UserBookChange]:
+    """One range scan of the (user_id, id) index."""
+    return session.exec(
+        select(UserBookChange)
+        .where(UserBookChange.user_id == user_id)
+        .where(UserBookChange.id > after_id)
+        .order_by(UserBookChange.id)
+        .limit(limit)
+    ).all()
+
+
+def compact(session: Session, older_than: datetime) -> int:
+    """Drop log entries and tombstones older than `older_than` that are not needed.
+
+    An old entry is kept only while it is the newest entry for its
+    (user_id, book_id) and records a save or update, so replaying the log
+    still yields every book's latest state. Old deletes and their
+    tombstones are dropped entirely; the newest dropped version and change
+    id are recorded per user, so `resync_needed` can tell clients whose
+    cursor predates them to start over.
+    """
+    horizons = defaultdict(lambda: [0, 0])
+    for user_id, version in session.exec(
+        select(UserBookTombstone.user_id, func.max(UserBookTombstone.version))
+        .where(UserBookTombstone.deleted_at < older_than)
+        .group_by(UserBookTombstone.user_id)
+    ):
+        horizons[user_id][0] = version
+    for user_id, change_id in session.exec(
+        select(UserBookChange.user_id, func.max(UserBookChange.id))
+        .where(UserBookChange.ts < older_than)
+        .where(UserBookChange.op == ChangeOp.DELETE)
+        .group_by(UserBookChange.user_id)
+    ):
+        horizons[user_id][1] = change_id
+    for user_id, (version, change_id) in horizons.items():
+        session.execute(
+            update(LibraryVersion)
+            .where(LibraryVersion.user_id == user_id)
+            .where(LibraryVersion.compacted_version < version)
+            .values(compacted_version=version)
+        )
+        session.execute(
+            update(LibraryVersion)
+            .where(LibraryVersion.user_id == user_id)
+            .where(LibraryVersion.compacted_change_id < change_id)
+            .values(compacted_change_id=change_id)
+        )
+
+    newest = (
+        select(func.max(UserBookChange.id))
+        .group_by(UserBookChange.user_id, UserBookChange.book_id)
+        .scalar_subquery()
+    )
+    removed = session.execute(
+        delete(UserBookChange)
+        .where(UserBookChange.ts < older_than)
+        .where(
+            UserBookChange.id.not_in(newest) | (UserBookChange.op == ChangeOp.DELETE)
+        )
+    ).rowcount
+    session.execute(
+        delete(UserBookTombstone).where(UserBookTombstone.deleted_at < older_than)
+    )
+    session.commit()
+    return removed
+
+
+def apply_batch(
+    session: Session, user_id: int, items: list[UserBookBatchItem]
+) -> tuple[int, list[UserBookBatchResult], dict[int, tuple]]:
+    """Apply edits and deletes to one user's library in a single transaction.
+
+    The rows are read with one SELECT, then written with one DELETE and one
+    UPDATE per distinct set of changes, under a single version bump. Returns
+    the library version, a result per item, and the (status, rating) each
+    changed book had before the batch.
+    """
+    book_ids = {item.book_id for item in items}
+    existing = {
+        book_id: (status, rating, completed_at)
+        for book_id, status, rating, completed_at in session.exec(
+            select(
+                UserBookStatus.book_id,
+                UserBookStatus.status,
+                UserBookStatus.rating,
+                UserBookStatus.completed_at,
+            )
+            .where(UserBookStatus.user_id == user_id)
+            .where(UserBookStatus.book_id.in_(book_ids))
+        ).all()
+    }
+
+    results, logged, deleted, seen = [], [], [], set()
+    updates = defaultdict(list)
+    for item in items:
+        changes = item.changes()
+        if item.book_id in seen:
+            outcome = BatchOutcome.DUPLICATE
+        elif item.book_id not in existing:
+            outcome = BatchOutcome.NOT_FOUND
+        elif item.delete:
+            outcome = BatchOutcome.DELETED
+            deleted.append(item.book_id)
+            logged.append((item.book_id, ChangeOp.DELETE))
+        elif changes:
+            outcome = BatchOutcome.UPDATED
+            updates[tuple(sorted(changes.items()))].append(item.book_id)
+            logged.append((item.book_id, ChangeOp.UPDATE))
+        else:
+            outcome = BatchOutcome.UNCHANGED
+        seen.add(item.book_id)
+        results.append(UserBookBatchResult(book_id=item.book_id, outcome=outcome))
+
+    if not logged:
+        return current_version(session, user_id)[0], results, {}
+
+    # Core statements bypass the before_flush listener, so do its work here.
+    now = datetime.utcnow()
+    connection = session.connection()
+    version = bump_version(connection, user_id)
+    stats = []
+    for changes, changed_ids in updates.items():
+        values = dict(changes)
+        if "status" in values:
+            values["completed_at"] = (
+                case(
+                    (
+                        UserBookStatus.status == StatusEnum.COMPLETED,
+                        func.coalesce(UserBookStatus.completed_at, now),
+                    ),
+                    else_=now,
+                )
+                if values["status"] == StatusEnum.COMPLETED
+                else None
+            )
+        connection.execute(
+            update(UserBookStatus)
+            .where(UserBookStatus.user_id == user_id)
+            .where(UserBookStatus.book_id.in_(changed_ids))
+            .values(**values, version=version, updated_at=now)
+        )
+        for book_id in changed_ids:
+            status, rating, completed = before = existing[book_id]
+            new_status = values.get("status", status)
+            if StatusEnum(new_status) != StatusEnum(status):
+                queue_trending(session, book_id, new_status)
+            after = (
+                new_status,
+                values.get("rating", rating),
+                reading_stats.completed_at(status, completed, new_status, now),
+            )
+            stats.append((book_id, before, after))
+    if deleted:
+        connection.execute(
+            delete(UserBookStatus)
+            .where(UserBookStatus.user_id == user_id)
+            .where(UserBookStatus.book_id.in_(deleted))
+        )
+        record_deleted(connection, user_id, deleted, version)
+        stats.extend((book_id, existing[book_id], None) for book_id in deleted)
+    log_changes(connection, user_id, logged, version, now)
+    reading_stats.record_changes(connection, user_id, stats)
+    session.commit()
+    return (
+        version,
+        results,
+        {book_id: existing[book_id][:2] for book_id, _ in logged},
+    )
+
+
+def current_version(session: Session, user_id: int) -> tuple[int, datetime | None]:
+    row = session.get(LibraryVersion, user_id)
+    if row is None:
+        return 0, None
+    return row.version, row.updated_at
+
+
+def resync_needed(
+    session: Session,
+    user_id: int,
+    since: int | None = None,
+    after_id: int | None = None,
+) -> bool:
+    """Whether a delta cursor predates deletes that compaction dropped.
+
+    A cursor of 0 means the client holds nothing yet, so never needs one.
+    """
+    row = session.get(LibraryVersion, user_id)
+    if row is None:
+        return False
+    return bool(since and since < row.compacted_version) or bool(
+        after_id and after_id < row.compacted_change_id
+    )
+
+
+if __name__ == "__main__":
+    # Periodic compaction, e.g. from cron: python -m services.library compact
+    from config import settings
+    from db import engine
+
+    if sys.argv[1:2] != ["compact"]:
+        sys.exit("usage: python -m services.library compact")
+    horizon = datetime.utcnow() - timedelta(days=settings.CHANGELOG_RETENTION_DAYS)
+    with Session(engine) as session:
+        removed = compact(session, horizon)
+    print(f"Compacted {removed} change-log entries older than {horizon:%Y-%m-%d}")
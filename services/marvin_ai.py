@@ -1,13 +1,50 @@
+import functools
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+import time
 from typing import List
 
-import marvin
+from pydantic import BaseModel
 
 from config import settings
 
-marvin.settings.openai.api_key = settings.OPENAI_API_KEY
+_marvin_lock = threading.Lock()
 
 
-@marvin.fn
+def lazy_marvin_fn(fn):
+    """Like `@marvin.fn`, but Marvin is only imported on the first call.
+
+    Importing Marvin pulls in the whole LLM client stack, which the API
+    should not pay for on a cold start that never asks for recommendations.
+    """
+    compiled = None
+
+    @functools.wraps(fn)
+    def call(*args, **kwargs):
+        nonlocal compiled
+        if compiled is None:
+            with _marvin_lock:
+                if compiled is None:
+                    import marvin
+
+                    marvin.settings.openai.api_key = settings.OPENAI_API_KEY
+                    marvin.settings.openai.chat.completions.model = settings.LLM_MODEL
+                    compiled = marvin.fn(fn)
+        return compiled(*args, **kwargs)
+
+    return call
+
+
+class SeedBook(BaseModel):
+    title: str
+    authors: List[str] = []
+    description: str = ""
+
+
+@lazy_marvin_fn
 def recommend_similar_books(
     title: str, authors: List[str], description: str
 ) -> List[str]:
@@ -21,3 +58,214 @@ def recommend_similar_books(
 
      Return ** a Python list, not a single string, of exactly 5 book titles**, no more, no less.
     """
+
+
+@lazy_marvin_fn
+def recommend_similar_books_batch(books: List[SeedBook]) -> List[List[str]]:
+    """
+    For **each** book in `books` (title, authors, description), return exactly **5 book titles** that are similar to it.
+
+    Prioritize:
+     - Books by the same author or in the same genre.
+     - Well-known books with similar themes.
+     - Critically acclaimed books.
+
+     Return a list with **one inner list per input book, in the same order as the input**. Each inner list holds exactly 5 book titles.
+    """
+
+
+# Both prompts are fingerprinted because a seed's cached titles may have come
+# from either function; editing either docstring invalidates the cache.
+PROMPT_FINGERPRINT = hashlib.sha256(
+    (recommend_similar_books.__doc__ + recommend_similar_books_batch.__doc__).encode()
+).hexdigest()
+
+
+class LLMCache:
+    """Content-addressed, SQLite-backed store of LLM answers.
+
+    Entries expire after `ttl` seconds; once more than `max_entries` are
+    stored the least recently used tenth is evicted. The file is opened
+    lazily so importing this module has no side effects.
+    """
+
+    def __init__(self, path: str, ttl: int, max_entries: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed_at "
+                "ON llm_cache (accessed_at)"
+            )
+        return self._conn
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now - self.ttl:
+                self.misses += 1
+                return None
+            conn.execute(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, value):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            (count,) = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+            if count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache "
+                    "ORDER BY accessed_at LIMIT ?)",
+                    (count - int(self.max_entries * 0.9),),
+                )
+            conn.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,)
+            )
+            conn.commit()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            row = (
+                self._connection()
+                .execute("SELECT created_at FROM llm_cache WHERE key = ?", (key,))
+                .fetchone()
+            )
+        return row is not None and row[0] >= time.time() - self.ttl
+
+    def stats(self) -> dict:
+        with self._lock:
+            (entries,) = (
+                self._connection().execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+            )
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+llm_cache = LLMCache(
+    settings.LLM_CACHE_PATH,
+    ttl=settings.LLM_CACHE_TTL_SECONDS,
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+)
+
+
+def model_name() -> str:
+    return settings.LLM_MODEL
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+def seed_key(seed: SeedBook) -> str:
+    """Fingerprint of everything that determines the LLM's answer for a seed."""
+    payload = {
+        "title": _normalize(seed.title),
+        "authors": [_normalize(author) for author in seed.authors],
+        "description": _normalize(seed.description),
+        "prompt": PROMPT_FINGERPRINT,
+        "model": model_name(),
+    }
+    encoded = json.dumps(payload, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def recommend_for_seed(seed: SeedBook) -> List[str]:
+    """Recommended titles for one book, cached per seed."""
+    return recommend_for_seeds([seed])[0]
+
+
+def recommend_for_seeds(seeds: List[SeedBook]) -> List[List[str]]:
+    """Recommended titles for several books, packing cache misses into one LLM call."""
+    results = [llm_cache.get(seed_key(seed)) for seed in seeds]
+    misses = [n for n, titles in enumerate(results) if titles is None]
+
+    if len(misses) == 1:
+        seed = seeds[misses[0]]
+        batch = [
+            recommend_similar_books(
+                title=seed.title, authors=seed.authors, description=seed.description
+            )
+        ]
+    elif misses:
+        batch = recommend_similar_books_batch([seeds[n] for n in misses])
+        if len(batch) != len(misses):
+            print(
+                f"Batch recommendation returned {len(batch)} lists for "
+                f"{len(misses)} books, retrying one at a time"
+            )
+            batch = [recommend_for_seed(seeds[n]) for n in misses]
+    else:
+        batch = []
+
+    for n, titles in zip(misses, batch):
+        llm_cache.set(seed_key(seeds[n]), titles)
+        results[n] = titles
+    return results
+
+
+def prewarm(session, batch_size: int = 10, limit: int | None = None) -> int:
+    """Fill the cache for catalogue books that are not cached yet."""
+    from sqlmodel import select
+
+    from models import Book
+
+    books = session.exec(select(Book).order_by(Book.id)).all()
+    seeds = [
+        SeedBook(
+            title=book.title,
+            authors=book.authors.split(", ") if book.authors else [],
+            description=book.description or "",
+        )
+        for book in books
+    ]
+    pending = [seed for seed in seeds if seed_key(seed) not in llm_cache][:limit]
+    for start in range(0, len(pending), batch_size):
+        recommend_for_seeds(pending[start : start + batch_size])
+        print(f"Pre-warmed {min(start + batch_size, len(pending))}/{len(pending)}")
+    return len(pending)
+
+
+if __name__ == "__main__":
+    # Offline pre-warm: python -m services.marvin_ai prewarm [limit]
+    from sqlmodel import Session
+
+    from db import engine
+
+    if sys.argv[1:2] != ["prewarm"]:
+        sys.exit("usage: python -m services.marvin_ai prewarm [limit]")
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    with Session(engine) as session:
+        count = prewarm(session, limit=limit)
+    print(f"Cached recommendations for {count} books; {llm_cache.stats()}")
@@ -0,0 +1,93 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+from config import settings
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
+
+
+class HashingBusy(Exception):
+    """Raised when too many hashes are already queued for the pool."""
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    return pwd_context.verify(password, password_hash)
+
+
+def verify_and_update(password: str, password_hash: str) -> tuple[bool, str | None]:
+    """Verify a password, returning a fresh hash if the stored one is outdated."""
+    return pwd_context.verify_and_update(password, password_hash)
+
+
+class HashingPool:
+    """Bounded process pool that keeps bcrypt off the request threads.
+
+    bcrypt is deliberately CPU-bound, so running it on the threadpool that
+    also serves reads stalls those reads during a login burst. Hashes run in
+    `workers` separate processes instead; at most `max_pending` may be
+    queued before callers get `HashingBusy`. With `workers=0` hashing runs on
+    a thread, which is what tests and tiny deployments use.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn rather than fork: the API process is multi-threaded.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    async def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            if self.workers == 0:
+                return await asyncio.to_thread(fn, *args)
+            future = self._get_executor().submit(fn, *args)
+            return await asyncio.wrap_future(future)
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# By default the cores are split between API workers, each running its own pool.
+hashing_pool = HashingPool(
+    workers=settings.PASSWORD_HASH_WORKERS
+    if settings.PASSWORD_HASH_WORKERS is not None
+    else min(4, settings.per_worker(os.cpu_count() or 1)),
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
+
+
+async def hash_password_async(password: str) -> str:
+    return await hashing_pool.run(hash_password, password)
+
+
+async def verify_and_update_async(
+    password: str, password_hash: str
+) -> tuple[bool, str | None]:
+    return await hashing_pool.run(verify_and_update, password, password_hash)
@@ -0,0 +1,179 @@
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime
+from enum import IntEnum
+from zoneinfo import ZoneInfo
+
+# Google resets daily quotas at midnight Pacific time.
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    PREFETCH = 1
+    BACKGROUND = 2
+
+
+# How long each class may wait in the queue before it is dropped.
+DEFAULT_DEADLINES = {
+    Priority.INTERACTIVE: 10.0,
+    Priority.PREFETCH: 2.0,
+    Priority.BACKGROUND: 30.0,
+}
+
+
+def _by_name(counts: dict) -> dict:
+    return {priority.name.lower(): count for priority, count in counts.items()}
+
+
+class QuotaExceeded(Exception):
+    """Raised when a call cannot be granted quota before its deadline."""
+
+    def __init__(self, message: str, retry_after: float = 60.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QuotaGovernor:
+    """Token bucket shared by every outbound call to one upstream API.
+
+    Tokens refill at `per_minute / 60` per second up to `burst`. Waiting calls
+    are served strictly by priority, then arrival order, and give up once
+    their deadline passes. `backoff` pauses all issuance after a 429.
+    """
+
+    def __init__(self, per_minute: int, per_day: int, burst: int | None = None):
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.burst = burst or per_minute
+        self._rate = per_minute / 60
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._day = self._today()
+        self._day_count = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._metrics = {
+            "granted": dict.fromkeys(Priority, 0),
+            "queued": dict.fromkeys(Priority, 0),
+            "dropped": dict.fromkeys(Priority, 0),
+            "backoffs": 0,
+        }
+
+    @staticmethod
+    def _today():
+        return datetime.now(QUOTA_TIMEZONE).date()
+
+    def _refill(self, now: float):
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._refilled_at) * self._rate
+        )
+        self._refilled_at = now
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self._day_count = 0
+
+    def _drop(self, priority: Priority, message: str, retry_after: float):
+        self._metrics["dropped"][priority] += 1
+        raise QuotaExceeded(message, retry_after=retry_after)
+
+    def acquire(self, priority: Priority = Priority.INTERACTIVE, timeout=None):
+        """Block until a token is granted to this call or its deadline passes."""
+        if timeout is None:
+            timeout = DEFAULT_DEADLINES[priority]
+        deadline = time.monotonic() + timeout
+        entry = (priority, next(self._seq))
+
+        with self._cond:
+            self._refill(time.monotonic())
+            if self._day_count >= self.per_day:
+                self._drop(priority, "Daily Google Books quota exhausted.", 3600)
+
+            heapq.heappush(self._waiters, entry)
+            queued = False
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                ready = (
+                    self._waiters[0] == entry
+                    and self._tokens >= 1
+                    and now >= self._paused_until
+                )
+                if ready:
+                    heapq.heappop(self._waiters)
+                    self._tokens -= 1
+                    self._day_count += 1
+                    self._metrics["granted"][priority] += 1
+                    self._cond.notify_all()
+                    return
+
+                if not queued:
+                    self._metrics["queued"][priority] += 1
+                    queued = True
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    self._cond.notify_all()
+                    self._drop(
+                        priority,
+                        "Timed out waiting for Google Books quota.",
+                        max(self._paused_until - now, 1 / self._rate),
+                    )
+
+                if self._waiters[0] != entry:
+                    # Only the head of the queue polls the clock; the rest
+                    # are woken when it is granted or dropped.
+                    self._cond.wait(remaining)
+                    continue
+                until_token = max(0.0, (1 - self._tokens) / self._rate)
+                until_resume = max(0.0, self._paused_until - now)
+                self._cond.wait(min(remaining, max(until_token, until_resume, 0.01)))
+
+    def try_acquire(self, priority: Priority = Priority.INTERACTIVE) -> bool:
+        """Take a token only if one is free right now; never queues.
+
+        For optional calls such as hedges: a refusal is not a queued or
+        dropped call, so it is left out of the metrics.
+        """
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if (
+                self._waiters
+                or self._tokens < 1
+                or now < self._paused_until
+                or self._day_count >= self.per_day
+            ):
+                return False
+            self._tokens -= 1
+            self._day_count += 1
+            self._metrics["granted"][priority] += 1
+            return True
+
+    def backoff(self, delay: float):
+        """Stop granting tokens for `delay` seconds, e.g. after an HTTP 429."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self._tokens = 0.0
+            self._metrics["backoffs"] += 1
+
+    def metrics(self) -> dict:
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                "tokens_available": round(self._tokens, 2),
+                "waiting": len(self._waiters),
+                "used_today": self._day_count,
+                "daily_limit": self.per_day,
+                "granted": _by_name(self._metrics["granted"]),
+                "queued": _by_name(self._metrics["queued"]),
+                "dropped": _by_name(self._metrics["dropped"]),
+                "backoffs": self._metrics["backoffs"],
+            }
@@ -0,0 +1,164 @@
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import delete, insert, update
+from sqlmodel import Session, select
+
+from models import (
+    AuthorCount,
+    Book,
+    ReadingStat,
+    ReadingStats,
+    StatusEnum,
+    UserBookStatus,
+)
+
+TOP_AUTHORS = 10
+
+# (status, rating, completed_at) of one shelf entry, or None when absent.
+Entry = tuple[str, int | None, datetime | None] | None
+
+
+def completed_at(
+    old_status: str | None,
+    old_completed_at: datetime | None,
+    new_status: str,
+    now: datetime,
+) -> datetime | None:
+    """When a book counts as finished: set on entering completed, kept after."""
+    if StatusEnum(new_status) != StatusEnum.COMPLETED:
+        return None
+    if old_status is not None and StatusEnum(old_status) == StatusEnum.COMPLETED:
+        return old_completed_at or now
+    return now
+
+
+def contributions(entry: Entry, authors: str | None) -> dict[tuple[str, str], list]:
+    """The (kind, key) -> [count, total] rows one shelf entry adds to the stats."""
+    if entry is None:
+        return {}
+    status, rating, completed = entry
+    status = StatusEnum(status).value
+    rows = {("status", status): [1, 0.0]}
+    if status == StatusEnum.COMPLETED and completed is not None:
+        rows[("month", completed.strftime("%Y-%m"))] = [1, 0.0]
+    if rating is not None:
+        rows[("rating", "")] = [1, float(rating)]
+    for author in (authors or "").split(", "):
+        if author:
+            rows[("author", author)] = [1, 0.0]
+    return rows
+
+
+def _add(totals: dict, rows: dict, sign: int = 1):
+    for key, (count, total) in rows.items():
+        totals[key][0] += sign * count
+        totals[key][1] += sign * total
+
+
+def record_changes(connection, user_id: int, changes: list[tuple[int, Entry, Entry]]):
+    """Apply (book_id, before, after) shelf changes to `user_id`'s stats rows.
+
+    Runs on the caller's connection and transaction, alongside the change.
+    """
+    authors = dict(
+        connection.execute(
+            select(Book.id, Book.authors).where(
+                Book.id.in_({book_id for book_id, _, _ in changes})
+            )
+        ).all()
+    )
+    delta = defaultdict(lambda: [0, 0.0])
+    for book_id, before, after in changes:
+        _add(delta, contributions(before, authors.get(book_id)), -1)
+        _add(delta, contributions(after, authors.get(book_id)))
+
+    for (kind, key), (count, total) in delta.items():
+        if count == 0 and total == 0:
+            continue
+        updated = connection.execute(
+            update(ReadingStat)
+            .where(ReadingStat.user_id == user_id)
+            .where(ReadingStat.kind == kind)
+            .where(ReadingStat.key == key)
+            .values(count=ReadingStat.count + count, total=ReadingStat.total + total)
+        )
+        if updated.rowcount == 0:
+            connection.execute(
+                insert(ReadingStat).values(
+                    user_id=user_id, kind=kind, key=key, count=count, total=total
+                )
+            )
+    connection.execute(
+        delete(ReadingStat)
+        .where(ReadingStat.user_id == user_id)
+        .where(ReadingStat.count <= 0)
+    )
+
+
+def rebuild(session: Session, user_id: int | None = None) -> int:
+    """Recompute the stats rows from `userbookstatus` for one user or everyone."""
+    query = select(
+        UserBookStatus.user_id,
+        UserBookStatus.status,
+        UserBookStatus.rating,
+        UserBookStatus.completed_at,
+        Book.authors,
+    ).join(Book, UserBookStatus.book_id == Book.id)
+    if user_id is not None:
+        query = query.where(UserBookStatus.user_id == user_id)
+
+    totals = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+    for row_user_id, status, rating, completed, authors in session.exec(query):
+        _add(totals[row_user_id], contributions((status, rating, completed), authors))
+
+    stale = delete(ReadingStat)
+    if user_id is not None:
+        stale = stale.where(ReadingStat.user_id == user_id)
+    session.execute(stale)
+    rows = [
+        {"user_id": uid, "kind": kind, "key": key, "count": count, "total": total}
+        for uid, user_totals in totals.items()
+        for (kind, key), (count, total) in user_totals.items()
+    ]
+    if rows:
+        session.execute(insert(ReadingStat), rows)
+    session.commit()
+    return len(totals)
+
+
+def summary(session: Session, user_id: int) -> ReadingStats:
+    rows = session.exec(select(ReadingStat).where(ReadingStat.user_id == user_id)).all()
+    stats = ReadingStats(user_id=user_id)
+    authors = []
+    for row in rows:
+        if row.kind == "status":
+            stats.status_counts[row.key] = row.count
+        elif row.kind == "month":
+            stats.completed_per_month[row.key] = row.count
+            year = row.key[:4]
+            stats.completed_per_year[year] = (
+                stats.completed_per_year.get(year, 0) + row.count
+            )
+        elif row.kind == "rating":
+            stats.rated_count = row.count
+            stats.average_rating = round(row.total / row.count, 2)
+        elif row.kind == "author":
+            authors.append(AuthorCount(author=row.key, count=row.count))
+    authors.sort(key=lambda author: (-author.count, author.author))
+    stats.top_authors = authors[:TOP_AUTHORS]
+    stats.completed_per_month = dict(sorted(stats.completed_per_month.items()))
+    stats.completed_per_year = dict(sorted(stats.completed_per_year.items()))
+    return stats
+
+
+if __name__ == "__main__":
+    # Full rebuild, e.g. after a migration: python -m services.reading_stats rebuild
+    from db import engine
+
+    if sys.argv[1:2] != ["rebuild"]:
+        sys.exit("usage: python -m services.reading_stats rebuild")
+    with Session(engine) as session:
+        users = rebuild(session)
+    print(f"Rebuilt reading stats for {users} users")
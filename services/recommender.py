@@ -0,0 +1,231 @@
+import math
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from models import BOOK_COVER_URL, Book, UserBookStatus
+
+DIMENSIONS = 2048
+TITLE_WEIGHT = 2.0
+AUTHOR_WEIGHT = 3.0
+POPULARITY_WEIGHT = 0.1
+MIN_SIMILARITY = 0.15
+MIN_RESULTS = 3
+MIN_SEED_TOKENS = 5
+REBUILD_INTERVAL = 10 * 60
+# New books trigger at most one rebuild per this many seconds.
+REBUILD_DEBOUNCE = 30
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his in is it its of on "
+    "or she that the their they this to was were which who will with you your".split()
+)
+
+
+def tokenize(text: str | None) -> list[str]:
+    if not text:
+        return []
+    return [
+        token
+        for token in TOKEN_RE.findall(text.lower())
+        if token not in STOPWORDS and len(token) > 1
+    ]
+
+
+def _bucket(token: str) -> int:
+    # crc32 rather than hash() so buckets are stable across processes.
+    return zlib.crc32(token.encode()) % DIMENSIONS
+
+
+def book_features(title: str, authors: str | None, description: str | None) -> Counter:
+    """Weighted hashed term counts for one book."""
+    features = Counter()
+    for token in tokenize(title):
+        features[_bucket(token)] += TITLE_WEIGHT
+    for author in (authors or "").split(", "):
+        if author.strip():
+            features[_bucket("author:" + author.strip().lower())] += AUTHOR_WEIGHT
+    for token in tokenize(description):
+        features[_bucket(token)] += 1.0
+    return features
+
+
+def search_entry(book: Book) -> dict:
+    return {
+        "google_id": book.bookid,
+        "title": book.title,
+        "authors": book.authors.split(", ") if book.authors else ["Unknown Author"],
+        "published_date": book.published_date.strftime("%Y-%m-%d")
+        if book.published_date
+        else "Unknown Date",
+        "cover_image_url": BOOK_COVER_URL.format(bookid=book.bookid),
+    }
+
+
+class LocalRecommender:
+    """Cosine top-k over TF-IDF weighted hashed embeddings of the book table.
+
+    The whole catalogue lives in one L2-normalised float32 CSR matrix, so a
+    query is a single sparse matrix-vector product. Save counts from `userbookstatus` add a
+    small popularity boost so well-read books win ties.
+    """
+
+    def __init__(self):
+        self.matrix = sparse.csr_matrix((0, DIMENSIONS), dtype=np.float32)
+        self.idf = np.ones(DIMENSIONS, dtype=np.float32)
+        self.popularity = np.zeros(0, dtype=np.float32)
+        self.row_of: dict[int, int] = {}
+        self.entries: list[dict] = []
+        self.built = False
+        self.built_at = 0.0
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def mark_stale(self):
+        self._stale = True
+
+    def needs_rebuild(self) -> bool:
+        age = time.monotonic() - self.built_at
+        return (
+            not self.built
+            or age > REBUILD_INTERVAL
+            or (self._stale and age > REBUILD_DEBOUNCE)
+        )
+
+    def build(self, session: Session):
+        # Cleared first so books added while this runs trigger another build.
+        self._stale = False
+        books = session.exec(
+            select(
+                Book.id,
+                Book.bookid,
+                Book.title,
+                Book.authors,
+                Book.description,
+                Book.published_date,
+            )
+        ).all()
+        saves = dict(
+            session.exec(
+                select(UserBookStatus.book_id, func.count()).group_by(
+                    UserBookStatus.book_id
+                )
+            ).all()
+        )
+
+        rows, buckets, weights = [], [], []
+        for row, book in enumerate(books):
+            features = book_features(book.title, book.authors, book.description)
+            rows.extend([row] * len(features))
+            buckets.extend(features.keys())
+            weights.extend(features.values())
+        rows = np.array(rows, dtype=np.int64)
+        buckets = np.array(buckets, dtype=np.int64)
+
+        document_frequency = np.bincount(buckets, minlength=DIMENSIONS)
+        idf = (np.log((1 + len(books)) / (1 + document_frequency)) + 1).astype(
+            np.float32
+        )
+        values = np.log1p(np.array(weights, dtype=np.float32)) * idf[buckets]
+        norms = np.sqrt(np.bincount(rows, values**2, minlength=len(books)))
+        values /= np.where(norms == 0, 1, norms)[rows].astype(np.float32)
+        matrix = sparse.csr_matrix(
+            (values, (rows, buckets)), shape=(len(books), DIMENSIONS)
+        )
+
+        save_counts = np.array([saves.get(book.id, 0) for book in books], np.float32)
+        popularity = np.log1p(save_counts)
+        if len(books) and popularity.max() > 0:
+            popularity /= popularity.max()
+
+        with self._lock:
+            self.matrix = matrix
+            self.idf = idf
+            self.popularity = popularity
+            self.row_of = {book.id: row for row, book in enumerate(books)}
+            self.entries = [search_entry(book) for book in books]
+            self.built = True
+            self.built_at = time.monotonic()
+        print(f"Built local recommender over {len(books)} books")
+
+    def _vector(self, book: Book) -> np.ndarray:
+        vector = np.zeros(DIMENSIONS, dtype=np.float32)
+        for bucket, weight in book_features(
+            book.title, book.authors, book.description
+        ).items():
+            vector[bucket] = math.log1p(weight)
+        vector *= self.idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def recommend(self, book: Book, k: int = 5) -> list[dict] | None:
+        """Top-k similar catalogue books, or None when not confident enough."""
+        seed_tokens = len(tokenize(book.title)) + len(tokenize(book.description))
+        if seed_tokens < MIN_SEED_TOKENS:
+            return None
+
+        with self._lock:
+            matrix, popularity = self.matrix, self.popularity
+            entries, row = self.entries, self.row_of.get(book.id)
+            if row is not None:
+                seed = matrix[row].toarray().ravel()
+            else:
+                seed = self._vector(book)
+
+        if not len(entries):
+            return None
+
+        similarity = matrix @ seed
+        scores = similarity * (1 + POPULARITY_WEIGHT * popularity)
+        if row is not None:
+            scores[row] = -np.inf
+        top = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+        top = top[np.argsort(-scores[top])]
+
+        confident = [i for i in top if i != row and similarity[i] >= MIN_SIMILARITY]
+        if len(confident) < min(MIN_RESULTS, k):
+            return None
+        return [entries[i] for i in confident]
+
+
+recommender = LocalRecommender()
+_build_lock = threading.Lock()
+
+
+def _rebuild_in_background(engine):
+    if not _build_lock.acquire(blocking=False):
+        return  # already rebuilding
+
+    def run():
+        try:
+            with Session(engine) as session:
+                recommender.build(session)
+        except Exception as e:
+            print(f"Local recommender rebuild failed: {e}")
+        finally:
+            _build_lock.release()
+
+    threading.Thread(target=run, name="recommender-rebuild", daemon=True).start()
+
+
+def recommend_from_catalogue(session: Session, book: Book, k: int = 5):
+    """Answer from the local index, refreshing it once it has gone stale.
+
+    Only the first build runs on the request; later ones run on a background
+    thread while the current index keeps serving.
+    """
+    if not recommender.built:
+        with _build_lock:
+            if not recommender.built:
+                recommender.build(session)
+    elif recommender.needs_rebuild():
+        _rebuild_in_background(session.get_bind())
+    return recommender.recommend(book, k)
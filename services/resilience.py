@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that is currently failing."""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"Upstream {host} is unavailable, failing fast.")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class LatencyStats:
+    """Rolling window of recent call latencies (in seconds) for one host."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, p: float) -> float | None:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self) -> dict:
+        return {
+            "samples": self.count(),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class CircuitBreaker:
+    """Classic closed / open / half-open breaker for one upstream host.
+
+    Errors and calls slower than `slow_call_threshold` both count as failures,
+    so a brownout (slow but technically successful responses) trips the
+    breaker just like an outage. After `reset_timeout` a single probe call is
+    let through; its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        host: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        slow_call_threshold: float | None = None,
+    ):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call_threshold = slow_call_threshold
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                waited = time.monotonic() - self._opened_at
+                if waited < self.reset_timeout:
+                    raise CircuitOpenError(self.host, self.reset_timeout - waited)
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = True
+            elif self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    raise CircuitOpenError(self.host, self.reset_timeout)
+                self._probe_in_flight = True
+
+    def record(
+        self,
+        ok: bool,
+        seconds: float | None = None,
+        slow_call_threshold: float | None = None,
+    ):
+        """Count one call; `slow_call_threshold` overrides the fixed one."""
+        threshold = slow_call_threshold or self.slow_call_threshold
+        slow = threshold is not None and seconds is not None and seconds > threshold
+        if ok and not slow:
+            self.record_success()
+        else:
+            self.record_failure()
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(
+                        f"Circuit for {self.host} opened after {self._failures} failures"
+                    )
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def abandon(self):
+        """Release a half-open probe slot when the call never reached upstream."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self._failures}
+
+
+_hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+
+def hedged_call(fn, delay: float, can_hedge=lambda: True):
+    """Run `fn`, firing a second identical attempt if the first exceeds `delay`.
+
+    Returns the first successful result. `can_hedge` is consulted before the
+    second attempt is sent, e.g. to check that quota is available.
+    """
+    first = _hedge_executor.submit(fn)
+    try:
+        return first.result(timeout=delay)
+    except FutureTimeout:
+        pass
+
+    if not can_hedge():
+        return first.result()
+
+    second = _hedge_executor.submit(fn)
+    done, _ = wait([first, second], return_when=FIRST_COMPLETED)
+    winner = done.pop()
+    if winner.exception() is None:
+        return winner.result()
+    other = second if winner is first else first
+    return other.result()
@@ -0,0 +1,52 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into a single execution.
+
+    The first caller for a key (the leader) runs the function; every caller
+    that arrives while it is in flight waits on the same future and receives
+    the same result or exception. Sync and async callers share the in-flight
+    table, so a request thread and a coroutine asking for the same key still
+    produce one upstream call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+
+    def _claim(self, key) -> tuple[Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def _run(self, key, future: Future, fn, args, kwargs):
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def do(self, key, fn, *args, **kwargs):
+        future, leader = self._claim(key)
+        if leader:
+            self._run(key, future, fn, args, kwargs)
+        return future.result()
+
+    async def do_async(self, key, fn, *args, **kwargs):
+        future, leader = self._claim(key)
+        if leader:
+            await asyncio.to_thread(self._run, key, future, fn, args, kwargs)
+        return await asyncio.wrap_future(future)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
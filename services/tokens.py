@@ -0,0 +1,155 @@
+import hashlib
+import threading
+import uuid
+from datetime import UTC, datetime, timedelta
+
+import jwt
+from sqlalchemy import delete
+from sqlmodel import Session, select
+
+from config import settings
+from models import RevokedToken, TokenData
+
+ALGORITHM = settings.ALGORITHM
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
+
+
+class InvalidToken(Exception):
+    """Raised for any token that is malformed, expired, unknown or revoked."""
+
+
+def key_id(secret: str) -> str:
+    # Derived from the secret so rotating keys needs no extra configuration.
+    return hashlib.sha256(secret.encode()).hexdigest()[:16]
+
+
+class SigningKeys:
+    """The current signing key plus retired keys still accepted for verification.
+
+    To rotate, move the old `SECRET_KEY` into `PREVIOUS_SECRET_KEYS` and set a
+    new one; tokens signed with the old key stay valid until they expire.
+    """
+
+    def __init__(self, current: str, previous: list[str] = ()):
+        self.current_kid = key_id(current)
+        self.current = current
+        self.by_kid = {key_id(secret): secret for secret in previous if secret}
+        self.by_kid[self.current_kid] = current
+
+    def verification_key(self, kid: str | None) -> str:
+        if kid is None:
+            return self.current
+        try:
+            return self.by_kid[kid]
+        except KeyError:
+            raise InvalidToken(f"Unknown signing key {kid}")
+
+
+signing_keys = SigningKeys(
+    settings.SECRET_KEY,
+    [secret.strip() for secret in settings.PREVIOUS_SECRET_KEYS.split(",")],
+)
+
+
+class RevocationList:
+    """In-memory set of revoked token ids, mirrored from `revoked_token`.
+
+    Revocations made in this process apply immediately; those made by other
+    workers are picked up by `sync`, which the API runs every
+    `REVOCATION_SYNC_SECONDS`. Rows are dropped once their token has expired,
+    so the table only ever holds tokens that could still be presented.
+    """
+
+    def __init__(self):
+        self._revoked: dict[str, datetime] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def __contains__(self, jti: str) -> bool:
+        return jti in self._revoked
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def revoke(self, session: Session, jti: str, expires_at: datetime):
+        if session.get(RevokedToken, jti) is None:
+            session.add(RevokedToken(jti=jti, expires_at=expires_at))
+            session.commit()
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def sync(self, session: Session):
+        now = datetime.utcnow()
+        session.execute(delete(RevokedToken).where(RevokedToken.expires_at < now))
+        session.commit()
+        rows = session.exec(select(RevokedToken.jti, RevokedToken.expires_at)).all()
+        with self._lock:
+            self._revoked = dict(rows)
+
+    def start(self, engine, interval: float):
+        def run():
+            while not self._stopping.wait(interval):
+                try:
+                    with Session(engine) as session:
+                        self.sync(session)
+                except Exception as e:
+                    print(f"Revocation list sync failed: {e}")
+
+        with Session(engine) as session:
+            self.sync(session)
+        self._stopping.clear()
+        self._thread = threading.Thread(target=run, name="revocation-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+revocations = RevocationList()
+
+
+def create_access_token(
+    user_id: int, username: str, expires_delta: timedelta | None = None
+) -> str:
+    now = datetime.now(UTC)
+    claims = {
+        "sub": username,
+        "uid": user_id,
+        "jti": uuid.uuid4().hex,
+        "iat": now,
+        "exp": now
+        + (expires_delta or timedelta(minutes=int(ACCESS_TOKEN_EXPIRE_MINUTES))),
+    }
+    return jwt.encode(
+        claims,
+        signing_keys.current,
+        algorithm=ALGORITHM,
+        headers={"kid": signing_keys.current_kid},
+    )
+
+
+def verify_access_token(token: str) -> TokenData:
+    """Check signature, expiry and revocation without touching the database."""
+    try:
+        kid = jwt.get_unverified_header(token).get("kid")
+        payload = jwt.decode(
+            token,
+            signing_keys.verification_key(kid),
+            algorithms=[ALGORITHM],
+            options={"require": ["exp", "sub", "uid", "jti"]},
+        )
+    except jwt.PyJWTError as e:
+        raise InvalidToken(str(e))
+
+    if payload["jti"] in revocations:
+        raise InvalidToken("Token has been revoked")
+    return TokenData(
+        id=payload["uid"],
+        username=payload["sub"],
+        jti=payload["jti"],
+        expires_at=datetime.fromtimestamp(payload["exp"], UTC).replace(tzinfo=None),
+    )
@@ -0,0 +1,161 @@
+import fcntl
+import heapq
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from models import StatusEnum
+
+HALF_LIFE = 7 * 24 * 60 * 60
+# Past this many half-lives the stored (forward-decayed) scores are rebased.
+REBASE_AFTER = 64
+# Decayed scores below this are dropped on rebase.
+MIN_SCORE = 0.01
+
+EVENT_WEIGHTS = {
+    StatusEnum.TO_READ: 1.0,
+    StatusEnum.READING: 1.5,
+    StatusEnum.COMPLETED: 2.0,
+}
+
+
+class TrendingTracker:
+    """Time-decayed per-book event counts with an incremental top-K.
+
+    Scores use forward decay: an event of weight w at time t adds
+    w * 2^((t - t0) / HALF_LIFE) to its book, so older events never need
+    touching and the ranking is the same at any instant; `top` scales back
+    to present-day values. Each event is O(log n): the book's score goes up
+    and a new (score, book) entry is pushed on a heap. Superseded heap
+    entries are skipped lazily when read and dropped by `_compact`.
+
+    With several API workers each tracker only sees the events it served;
+    `sync` folds them into a shared snapshot file and loads the merged
+    totals back.
+    """
+
+    def __init__(self, half_life: float = HALF_LIFE, clock=time.time):
+        self.half_life = half_life
+        self.clock = clock
+        self.t0 = clock()
+        self.scores: dict[int, float] = {}
+        self.pending: dict[int, float] = {}
+        self._heap: list[tuple[float, int]] = []
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._path = None
+
+    def _growth(self, at: float) -> float:
+        return 2 ** ((at - self.t0) / self.half_life)
+
+    def record(self, book_id: int, weight: float = 1.0):
+        now = self.clock()
+        with self._lock:
+            if (now - self.t0) / self.half_life > REBASE_AFTER:
+                self._rebase(now)
+            amount = weight * self._growth(now)
+            score = self.scores.get(book_id, 0.0) + amount
+            self.scores[book_id] = score
+            self.pending[book_id] = self.pending.get(book_id, 0.0) + amount
+            heapq.heappush(self._heap, (-score, book_id))
+            if len(self._heap) > 2 * len(self.scores) + 64:
+                self._compact()
+
+    def record_status(self, book_id: int, status: str):
+        self.record(book_id, EVENT_WEIGHTS[StatusEnum(status)])
+
+    def top(self, limit: int = 10) -> list[tuple[int, float]]:
+        """The `limit` highest (book_id, decayed score) pairs, best first."""
+        with self._lock:
+            decay = self._growth(self.clock())
+            found, seen = [], set()
+            while self._heap and len(found) < limit:
+                negative, book_id = heapq.heappop(self._heap)
+                # Stale entries (an older score, or a repeat) are dropped here.
+                if book_id in seen or self.scores.get(book_id) != -negative:
+                    continue
+                seen.add(book_id)
+                found.append((negative, book_id))
+            for entry in found:
+                heapq.heappush(self._heap, entry)
+        return [(book_id, -negative / decay) for negative, book_id in found]
+
+    def _compact(self):
+        self._heap = [(-score, book_id) for book_id, score in self.scores.items()]
+        heapq.heapify(self._heap)
+
+    def _rebase(self, now: float):
+        factor = 1 / self._growth(now)
+        self.t0 = now
+        self.scores = {
+            book_id: score * factor
+            for book_id, score in self.scores.items()
+            if score * factor >= MIN_SCORE
+        }
+        self.pending = {
+            book_id: score * factor for book_id, score in self.pending.items()
+        }
+        self._compact()
+
+    def sync(self, path: str):
+        """Add this process's events since the last sync to `path`, reload all.
+
+        The file is locked for the read-modify-write, so concurrent workers
+        never lose each other's counts.
+        """
+        path = Path(path)
+        with open(path.with_suffix(".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            stored = json.loads(path.read_text()) if path.exists() else None
+            with self._lock:
+                merged = dict(self.pending)
+                if stored is not None:
+                    # Re-express the stored sums against this tracker's t0.
+                    factor = 2 ** ((stored["t0"] - self.t0) / self.half_life)
+                    for book_id, score in stored["scores"].items():
+                        book_id = int(book_id)
+                        merged[book_id] = merged.get(book_id, 0.0) + score * factor
+                # Drop books whose decayed score has faded to nothing.
+                floor = MIN_SCORE * self._growth(self.clock())
+                self.scores = {
+                    book_id: score
+                    for book_id, score in merged.items()
+                    if score >= floor
+                }
+                self.pending = {}
+                self._compact()
+                snapshot = {"t0": self.t0, "scores": self.scores}
+            temporary = path.with_suffix(".tmp")
+            temporary.write_text(json.dumps(snapshot))
+            os.replace(temporary, path)
+
+    def start(self, path: str, interval: float):
+        def run():
+            while not self._stopping.wait(interval):
+                try:
+                    self.sync(path)
+                except Exception as e:
+                    print(f"Trending snapshot sync failed: {e}")
+
+        try:
+            self.sync(path)
+        except Exception as e:
+            print(f"Could not load trending snapshot: {e}")
+        self._path = path
+        self._stopping.clear()
+        self._thread = threading.Thread(target=run, name="trending-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._path is not None:
+            self.sync(self._path)
+
+
+tracker = TrendingTracker()
@@ -7,7 +7,7 @@ from fastapi.testclient import TestClient
 from sqlalchemy.pool import StaticPool
 from sqlmodel import Session, SQLModel, create_engine
 
-from main import app, get_session
+from main import app, get_read_session, get_session
 from models import Book, User
 
 # --------------------
@@ -31,6 +31,7 @@ def client_fixture(session: Session):
         return session
 
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
@@ -0,0 +1,98 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+import admin
+from models import Book, StatusEnum, User, UserBookStatus
+from services import analytics
+
+
+@pytest.fixture(name="shelves")
+def shelves_fixture(session):
+    users = [
+        User(username=f"reader{n}", email=f"reader{n}@test.com", password_hash="x")
+        for n in range(4)
+    ]
+    books = [Book(title=f"Book {n}", bookid=f"vol{n}") for n in range(5)]
+    session.add_all(users + books)
+    session.commit()
+
+    today = datetime.utcnow()
+    entries = []
+    for n, user in enumerate(users):
+        for m, book in enumerate(books[: n + 2]):
+            entries.append(
+                UserBookStatus(
+                    user_id=user.id,
+                    book_id=book.id,
+                    status=list(StatusEnum)[(n + m) % 3],
+                    rating=(n + m) % 5 + 1 if m % 2 else None,
+                    created_at=today - timedelta(days=n + m),
+                )
+            )
+    session.add_all(entries)
+    session.commit()
+    return [
+        (
+            e.user_id,
+            e.book_id,
+            StatusEnum(e.status),
+            e.rating,
+            e.created_at,
+            e.updated_at,
+        )
+        for e in entries
+    ]
+
+
+def test_chunked_aggregates_match_row_by_row(session, shelves):
+    stats = analytics.compute(session, chunk_size=3)
+
+    saves = Counter(book_id for _, book_id, *_ in shelves)
+    assert stats["entries"] == len(shelves)
+    assert [(b["book_id"], b["saves"]) for b in stats["most_saved"]] == sorted(
+        saves.items(), key=lambda item: -item[1]
+    )
+    ratings = Counter(str(r) for _, _, _, r, *_ in shelves if r is not None)
+    assert {k: v for k, v in stats["rating_histogram"].items() if v} == ratings
+
+    status_by_day = {}
+    for _, _, status, _, created, _ in shelves:
+        day = status_by_day.setdefault(
+            created.date().isoformat(), {s.value: 0 for s in StatusEnum}
+        )
+        day[status.value] += 1
+    assert stats["status_by_day"] == status_by_day
+
+    # Saving also stamps updated_at, so every reader was active today too.
+    active = {}
+    for user_id, _, _, _, created, updated in shelves:
+        for day in (created, updated):
+            active.setdefault(day.date().isoformat(), set()).add(user_id)
+    assert {day: n for day, n in stats["active_readers"].items() if n} == {
+        day: len(users) for day, users in active.items()
+    }
+    assert len(stats["active_readers"]) == analytics.ACTIVE_DAYS
+
+
+def test_chunk_size_does_not_change_results(session, shelves):
+    one = analytics.compute(session, chunk_size=1)
+    all_at_once = analytics.compute(session, chunk_size=1000)
+    one.pop("computed_at"), all_at_once.pop("computed_at")
+
+    assert one == all_at_once
+
+
+def test_admin_stats_are_cached(auth_client, session, shelves, monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_USERNAMES", {"validuser"})
+    analytics.stats_cache.clear()
+    first = auth_client.get("/admin/stats").json()
+
+    session.add(Book(title="Late", bookid="late"))
+    session.add(UserBookStatus(user_id=shelves[0][0], book_id=5, status="to_read"))
+    session.commit()
+
+    assert auth_client.get("/admin/stats").json() == first
+    analytics.stats_cache.clear()
+    assert auth_client.get("/admin/stats").json()["entries"] == first["entries"] + 1
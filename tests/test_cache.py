@@ -0,0 +1,56 @@
+import pytest
+
+from services.cache import SQLiteCache, TTLCache
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make(request, tmp_path):
+    def factory(ttl=60, maxsize=1024, namespace="details"):
+        if request.param == "memory":
+            return TTLCache(ttl, maxsize)
+        return SQLiteCache(str(tmp_path / "cache.sqlite3"), namespace, ttl, maxsize)
+
+    return factory
+
+
+def test_backends_share_get_set_semantics(make):
+    cache = make()
+    cache.set("a", {"title": "Dune"})
+    cache.set(("search", "dune"), [{"google_id": "a"}])
+
+    assert cache.get("a") == {"title": "Dune"}
+    assert cache.get(("search", "dune")) == [{"google_id": "a"}]
+    assert "b" not in cache
+
+    cache.delete("a")
+    assert cache.get("a", default="missing") == "missing"
+    cache.clear()
+    assert ("search", "dune") not in cache
+
+
+def test_expired_entries_only_served_when_stale_allowed(make):
+    cache = make(ttl=-1)
+    cache.set("a", {"title": "Dune"})
+
+    assert cache.get("a") is None
+    assert cache.get("a", stale=True) == {"title": "Dune"}
+
+
+def test_backends_bound_their_size(make):
+    cache = make(maxsize=3)
+    for n in range(5):
+        cache.set(str(n), n)
+
+    assert [str(n) in cache for n in range(5)] == [False, False, True, True, True]
+
+
+def test_sqlite_cache_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    worker_a = SQLiteCache(path, "details", ttl=60)
+    worker_b = SQLiteCache(path, "details", ttl=60)
+    other_namespace = SQLiteCache(path, "search", ttl=60)
+
+    worker_a.set("a", {"title": "Dune"})
+
+    assert worker_b.get("a") == {"title": "Dune"}
+    assert "a" not in other_namespace
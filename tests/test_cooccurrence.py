@@ -0,0 +1,150 @@
+import time
+
+import pytest
+
+from models import Book, StatusEnum, User, UserBookStatus
+from services import cooccurrence
+from services.cooccurrence import CooccurrenceIndex, interaction_weight
+
+
+@pytest.fixture(name="library")
+def library_fixture(session):
+    users = [
+        User(username=f"reader{n}", email=f"reader{n}@test.com", password_hash="x")
+        for n in range(3)
+    ]
+    books = [Book(title=f"Book {n}", bookid=f"vol{n}") for n in range(4)]
+    session.add_all(users + books)
+    session.commit()
+
+    shelves = {0: [0, 1, 2], 1: [0, 1], 2: [2, 3]}
+    for user_index, book_indexes in shelves.items():
+        for book_index in book_indexes:
+            session.add(
+                UserBookStatus(
+                    user_id=users[user_index].id,
+                    book_id=books[book_index].id,
+                    status=StatusEnum.TO_READ,
+                )
+            )
+    session.commit()
+    cooccurrence.index = CooccurrenceIndex()
+    yield users, books
+    cooccurrence.index = CooccurrenceIndex()
+
+
+def test_similar_ranks_most_co_saved_first(session, library):
+    users, books = library
+    cooccurrence.ensure_built(session)
+
+    similar = cooccurrence.index.similar(books[0].id)
+
+    assert [book_id for book_id, _ in similar] == [books[1].id, books[2].id]
+
+
+def test_incremental_updates_match_full_rebuild(session, library):
+    users, books = library
+    cooccurrence.ensure_built(session)
+
+    row = session.get(UserBookStatus, (users[2].id, books[3].id))
+    old_weight = interaction_weight(row.status, row.rating)
+    row.status, row.rating = StatusEnum.COMPLETED, 5
+    session.add(row)
+    session.add(
+        UserBookStatus(
+            user_id=users[1].id, book_id=books[3].id, status=StatusEnum.READING
+        )
+    )
+    session.commit()
+    cooccurrence.record_change(
+        session,
+        users[2].id,
+        books[3].id,
+        old_weight,
+        interaction_weight("completed", 5),
+    )
+    cooccurrence.record_change(
+        session, users[1].id, books[3].id, 0.0, interaction_weight("reading")
+    )
+
+    incremental = {book.id: cooccurrence.index.similar(book.id) for book in books}
+    rebuilt = CooccurrenceIndex()
+    rebuilt.build(session)
+
+    for book in books:
+        expected = rebuilt.similar(book.id)
+        assert [b for b, _ in incremental[book.id]] == [b for b, _ in expected]
+        assert [s for _, s in incremental[book.id]] == pytest.approx(
+            [s for _, s in expected]
+        )
+
+
+def test_batch_changes_match_full_rebuild(session, library):
+    users, books = library
+    cooccurrence.ensure_built(session)
+
+    # Two changed books on one shelf exercise the cross term between them.
+    user_id = users[0].id
+    old_weights = {book.id: interaction_weight("to_read") for book in books[:2]}
+    first = session.get(UserBookStatus, (user_id, books[0].id))
+    first.status, first.rating = StatusEnum.COMPLETED, 4
+    session.delete(session.get(UserBookStatus, (user_id, books[1].id)))
+    session.commit()
+    cooccurrence.record_changes(session, user_id, old_weights)
+
+    rebuilt = CooccurrenceIndex()
+    rebuilt.build(session)
+    for book in books:
+        expected = rebuilt.similar(book.id)
+        actual = cooccurrence.index.similar(book.id)
+        assert [b for b, _ in actual] == [b for b, _ in expected]
+        assert [s for _, s in actual] == pytest.approx([s for _, s in expected])
+
+
+def test_snapshot_round_trip(session, library, tmp_path):
+    users, books = library
+    cooccurrence.ensure_built(session)
+    path = tmp_path / "cooccurrence.npz"
+    cooccurrence.index.save(str(path))
+
+    loaded = CooccurrenceIndex()
+    assert loaded.load_snapshot(str(path))
+    assert loaded.similar(books[0].id) == cooccurrence.index.similar(books[0].id)
+    assert loaded.built_at == cooccurrence.index.built_at
+
+
+def test_stale_snapshot_is_rebuilt_in_the_background(session, library, tmp_path):
+    users, books = library
+    cooccurrence.ensure_built(session)
+    cooccurrence.index.built_at -= 3600
+    path = tmp_path / "cooccurrence.npz"
+    cooccurrence.index.save(str(path))
+    # Saved after the snapshot was written, so only a rebuild can see it.
+    session.add(
+        UserBookStatus(
+            user_id=users[1].id, book_id=books[3].id, status=StatusEnum.TO_READ
+        )
+    )
+    session.commit()
+
+    cooccurrence.index = CooccurrenceIndex()
+    cooccurrence.index.load_snapshot(str(path))
+    assert books[3].id not in dict(cooccurrence.index.similar(books[0].id))
+
+    cooccurrence.start(session.get_bind(), interval=600)
+    try:
+        deadline = time.monotonic() + 5
+        while cooccurrence.index.age() > 600 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        cooccurrence.stop()
+
+    assert books[3].id in dict(cooccurrence.index.similar(books[0].id))
+
+
+def test_also_saved_endpoint(client, session, library):
+    users, books = library
+    response = client.get(f"/books/{books[3].id}/also-saved")
+
+    assert response.status_code == 200
+    assert [book["id"] for book in response.json()] == ["vol2"]
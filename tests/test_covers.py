@@ -0,0 +1,134 @@
+import io
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+from PIL import Image
+
+from services import covers
+from services.covers import CoverStore
+
+
+def jpeg(width: int, height: int, color=(200, 30, 30)) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(out, "JPEG")
+    return out.getvalue()
+
+
+@pytest.fixture(name="store")
+def store_fixture(tmp_path, monkeypatch):
+    store = CoverStore(str(tmp_path / "covers"), max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr(covers, "store", store)
+    return store
+
+
+def google_cover(content: bytes, status_code=200, content_type="image/jpeg"):
+    return MagicMock(
+        status_code=status_code,
+        content=content,
+        headers={"Content-Type": content_type},
+    )
+
+
+def test_fetches_once_and_serves_resized_variants(client, store):
+    with patch(
+        "services.covers.httpx.get", return_value=google_cover(jpeg(400, 600))
+    ) as mock_get:
+        small = client.get("/covers/vol1?w=100")
+        again = client.get("/covers/vol1?w=110")
+        original = client.get("/covers/vol1")
+
+    assert mock_get.call_count == 1
+    assert small.status_code == 200
+    assert small.headers["content-type"] == "image/jpeg"
+    assert "max-age=604800" in small.headers["cache-control"]
+    # 100 and 110 both snap to the 120px variant.
+    assert again.content == small.content
+    assert Image.open(io.BytesIO(small.content)).size == (120, 180)
+    assert Image.open(io.BytesIO(original.content)).size == (400, 600)
+
+    revalidated = client.get(
+        "/covers/vol1?w=100", headers={"If-None-Match": small.headers["etag"]}
+    )
+    assert revalidated.status_code == 304
+
+
+def test_missing_covers_share_one_placeholder_file(client, store):
+    with patch(
+        "services.covers.httpx.get",
+        return_value=google_cover(b"", status_code=404, content_type="text/html"),
+    ):
+        first = client.get("/covers/nocover1?w=120")
+        second = client.get("/covers/nocover2?w=120")
+
+    assert first.status_code == 200
+    assert first.headers["etag"] == second.headers["etag"]
+    files = [p for p in store.root.glob("*/*") if p.is_file()]
+    assert len(files) == 2  # one original placeholder, one 120px variant
+
+
+def test_upstream_errors_serve_an_uncached_placeholder(client, store):
+    with patch("services.covers.httpx.get", side_effect=httpx.ConnectTimeout("slow")):
+        response = client.get("/covers/vol2?w=120")
+
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "public, max-age=60"
+    assert store.get("vol2:120") is None
+
+
+def test_upstream_error_statuses_are_not_cached(client, store):
+    unavailable = httpx.Response(503, request=httpx.Request("GET", "https://test"))
+    with patch("services.covers.httpx.get", return_value=unavailable):
+        response = client.get("/covers/vol4?w=120")
+
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "public, max-age=60"
+    assert store.get("vol4:120") is None
+    assert store.get("vol4:original") is None
+
+
+def test_unreadable_covers_serve_the_placeholder(client, store):
+    placeholder = covers.resize(covers.placeholder_image(), 120)
+    truncated = jpeg(400, 600)[:300]
+
+    with patch("services.covers.httpx.get", return_value=google_cover(b"not an image")):
+        garbage = client.get("/covers/vol3?w=120")
+    assert garbage.status_code == 200
+    assert garbage.content == placeholder
+
+    assert covers.resize(truncated, 120) == placeholder
+
+
+def test_covers_evicted_by_another_worker_are_fetched_again(client, store):
+    with patch(
+        "services.covers.httpx.get", return_value=google_cover(jpeg(400, 600))
+    ) as mock_get:
+        first = client.get("/covers/vol4?w=120")
+        for path in store.root.glob("*/*"):
+            path.unlink()
+        second = client.get("/covers/vol4?w=120")
+
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert mock_get.call_count == 2
+
+
+def test_rejects_unsafe_book_ids(client, store):
+    assert client.get("/covers/..%2Fsecret").status_code in (404, 422)
+    assert client.get("/covers/a.b").status_code == 422
+
+
+def test_eviction_drops_oldest_entries_and_their_files(tmp_path):
+    store = CoverStore(str(tmp_path / "covers"), max_bytes=3000)
+    blobs = [bytes([n]) * 1000 for n in range(3)]
+    for n, blob in enumerate(blobs):
+        store.put(f"book{n}:original", blob, "image/jpeg")
+
+    store.put("book3:original", bytes([3]) * 1000, "image/jpeg")
+
+    assert store.total_bytes() <= 2700
+    assert store.get("book0:original") is None
+    file, _, _ = store.get("book3:original")
+    with file:
+        assert file.read() == bytes([3]) * 1000
+    assert len([p for p in store.root.glob("*/*") if p.is_file()]) == 2
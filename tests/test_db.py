@@ -0,0 +1,146 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlmodel import Session, SQLModel
+
+import admin
+import db
+from db import create_pooled_engine
+from main import app
+from models import Book, User
+from services.cache import TTLCache
+from services.tokens import create_access_token
+
+
+@pytest.fixture
+def small_engine(tmp_path):
+    engine = create_pooled_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.2,
+    )
+    yield engine
+    engine.dispose()
+
+
+def test_pool_metrics_track_checkouts_overflow_and_timeouts(small_engine):
+    first = small_engine.connect()
+    second = small_engine.connect()
+
+    metrics = small_engine.pool.metrics()
+    assert metrics["checked_out"] == 2
+    assert metrics["overflow"] == 1
+
+    with pytest.raises(PoolTimeout):
+        small_engine.connect()
+
+    first.close()
+    second.close()
+    metrics = small_engine.pool.metrics()
+    assert metrics["checked_out"] == 0
+    assert metrics["checkouts"] == 2
+    assert metrics["timeouts"] == 1
+    assert metrics["wait_seconds"]["samples"] == 2
+
+
+def test_waiting_checkout_is_timed(small_engine):
+    held = [small_engine.connect(), small_engine.connect()]
+    threading.Timer(0.1, lambda: held.pop().close()).start()
+
+    with small_engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    assert small_engine.pool.wait_times.percentile(100) >= 0.05
+    held[0].close()
+
+
+def test_pool_endpoint_requires_admin(auth_client, monkeypatch):
+    assert auth_client.get("/admin/pool").status_code == 403
+
+    monkeypatch.setattr(admin, "ADMIN_USERNAMES", {"validuser"})
+    response = auth_client.get("/admin/pool")
+
+    assert response.status_code == 200
+    assert {"checked_out", "overflow", "timeouts", "wait_seconds"} <= set(
+        response.json()["primary"]
+    )
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/admin/google-books/quota",
+        "/admin/google-books/health",
+        "/admin/recommendations/cache",
+    ],
+)
+def test_operational_endpoints_require_admin(auth_client, monkeypatch, path):
+    assert auth_client.get(path).status_code == 403
+
+    monkeypatch.setattr(admin, "ADMIN_USERNAMES", {"validuser"})
+    assert auth_client.get(path).status_code == 200
+
+
+@pytest.fixture
+def replicated(tmp_path, monkeypatch):
+    """Primary and replica SQLite files; replication is never run, so the
+    replica only has what was copied at setup time."""
+    primary = create_pooled_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_pooled_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    for engine in (primary, replica):
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.add(
+                User(id=1, username="reader", email="r@x.com", password_hash="x")
+            )
+            session.add(
+                User(id=2, username="writer", email="w@x.com", password_hash="x")
+            )
+            session.add(Book(id=1, bookid="dune", title="Dune"))
+            session.commit()
+
+    monkeypatch.setattr(db, "engine", primary)
+    monkeypatch.setattr(db, "replica_engine", replica)
+    monkeypatch.setattr(db, "recent_writers", TTLCache(ttl=60))
+    yield TestClient(app)
+    primary.dispose()
+    replica.dispose()
+
+
+def auth_headers(user_id: int, username: str) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(user_id, username)}"}
+
+
+def test_writes_go_to_primary_and_reads_to_replica(replicated):
+    writer = auth_headers(2, "writer")
+    reader = auth_headers(1, "reader")
+    response = replicated.post(
+        "/user-books/",
+        json={"user_id": 2, "book_id": 1, "status": "to_read"},
+        headers=writer,
+    )
+    assert response.status_code == 200
+
+    # Another user reads from the replica, which has not seen the write yet.
+    lagging = replicated.get("/user-books/?user_id=2", headers=reader)
+    assert lagging.status_code == 404
+
+
+def test_writer_reads_own_writes_until_window_expires(replicated):
+    writer = auth_headers(2, "writer")
+    replicated.post(
+        "/user-books/",
+        json={"user_id": 2, "book_id": 1, "status": "to_read"},
+        headers=writer,
+    )
+
+    response = replicated.get("/user-books/?user_id=2", headers=writer)
+    assert response.status_code == 200
+    assert [book["title"] for book in response.json()] == ["Dune"]
+
+    db.recent_writers.clear()
+    assert replicated.get("/user-books/?user_id=2", headers=writer).status_code == 404
@@ -0,0 +1,522 @@
+import asyncio
+import random
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+from bs4 import BeautifulSoup
+
+from config import settings
+from services import google_books
+from services.cache import TTLCache
+from services.html_text import strip_tags
+from services.quota import Priority, QuotaExceeded, QuotaGovernor
+from services.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LatencyStats,
+    hedged_call,
+)
+from services.singleflight import SingleFlight
+
+
+@pytest.fixture(autouse=True)
+def reset_google_state():
+    google_books.details_cache.clear()
+    google_books.search_cache.clear()
+    google_books.description_cache.clear()
+    google_books.breakers.clear()
+    google_books.latency_stats.clear()
+    yield
+    google_books.details_cache.clear()
+    google_books.search_cache.clear()
+    google_books.breakers.clear()
+    google_books.latency_stats.clear()
+
+
+def volume_response(book_id: str):
+    response = MagicMock(status_code=200)
+    response.json.return_value = {"id": book_id, "volumeInfo": {"title": book_id}}
+    return response
+
+
+# ----------------
+# DETAILS PREFETCH
+# ----------------
+
+
+def test_get_book_details_uses_cache():
+    with patch("services.google_books.httpx.get") as mock_get:
+        mock_get.return_value = volume_response("abc")
+        google_books.get_book_details("abc")
+        google_books.get_book_details("abc")
+
+    assert mock_get.call_count == 1
+
+
+def test_prefetch_warms_details_cache():
+    with patch("services.google_books.httpx.get") as mock_get:
+        mock_get.side_effect = lambda url, **kwargs: volume_response(
+            url.rsplit("/", 1)[-1]
+        )
+        handle = google_books.prefetch_book_details(["a", "b", "c"], top_k=2)
+        handle.wait(timeout=5)
+
+    assert google_books.details_cache.get("a") == {"title": "a"}
+    assert google_books.details_cache.get("b") == {"title": "b"}
+    assert "c" not in google_books.details_cache
+
+
+def test_cancelled_prefetch_skips_lookups():
+    handle = google_books.Prefetch()
+    handle.cancel()
+
+    with patch("services.google_books.httpx.get") as mock_get:
+        google_books._prefetch_one("abc", handle)
+
+    mock_get.assert_not_called()
+
+
+def test_prefetch_respects_minute_budget():
+    budget = google_books.MinuteBudget(limit=1)
+
+    with (
+        patch("services.google_books.prefetch_budget", budget),
+        patch("services.google_books.httpx.get") as mock_get,
+    ):
+        mock_get.side_effect = lambda url, **kwargs: volume_response(
+            url.rsplit("/", 1)[-1]
+        )
+        google_books._prefetch_one("a", google_books.Prefetch())
+        google_books._prefetch_one("b", google_books.Prefetch())
+
+    assert mock_get.call_count == 1
+
+
+# --------------
+# QUOTA GOVERNOR
+# --------------
+
+
+def test_governor_drops_call_after_deadline():
+    governor = QuotaGovernor(per_minute=60, per_day=1000, burst=1)
+    governor.acquire(Priority.INTERACTIVE)
+
+    with pytest.raises(QuotaExceeded):
+        governor.acquire(Priority.PREFETCH, timeout=0.05)
+
+    metrics = governor.metrics()
+    assert metrics["granted"]["interactive"] == 1
+    assert metrics["queued"]["prefetch"] == 1
+    assert metrics["dropped"]["prefetch"] == 1
+
+
+def test_governor_try_acquire_never_queues():
+    governor = QuotaGovernor(per_minute=60, per_day=1000, burst=1)
+
+    assert governor.try_acquire(Priority.PREFETCH)
+    assert not governor.try_acquire(Priority.PREFETCH)
+
+    metrics = governor.metrics()
+    assert metrics["granted"]["prefetch"] == 1
+    assert metrics["queued"]["prefetch"] == 0
+    assert metrics["dropped"]["prefetch"] == 0
+
+
+def test_governor_enforces_daily_limit():
+    governor = QuotaGovernor(per_minute=60, per_day=1)
+    governor.acquire()
+
+    with pytest.raises(QuotaExceeded):
+        governor.acquire()
+
+
+def test_governor_serves_higher_priority_first():
+    governor = QuotaGovernor(per_minute=600, per_day=1000, burst=1)
+    governor.acquire()
+    order = []
+
+    def worker(priority):
+        governor.acquire(priority, timeout=5)
+        order.append(priority)
+
+    background = threading.Thread(target=worker, args=(Priority.BACKGROUND,))
+    background.start()
+    time.sleep(0.02)
+    interactive = threading.Thread(target=worker, args=(Priority.INTERACTIVE,))
+    interactive.start()
+    background.join()
+    interactive.join()
+
+    assert order == [Priority.INTERACTIVE, Priority.BACKGROUND]
+
+
+def test_google_get_raises_quota_exceeded_when_429_persists():
+    throttled = MagicMock(status_code=429, headers={"Retry-After": "0"})
+    governor = QuotaGovernor(per_minute=600, per_day=1000)
+
+    with (
+        patch("services.google_books.governor", governor),
+        patch("services.google_books.httpx.get", return_value=throttled),
+        pytest.raises(QuotaExceeded),
+    ):
+        google_books.google_get("https://example.test")
+
+    breaker = google_books.breakers["example.test"]
+    assert breaker.summary() == {"state": "closed", "consecutive_failures": 0}
+
+
+def test_google_get_backs_off_on_429():
+    throttled = MagicMock(status_code=429, headers={"Retry-After": "0"})
+    ok = MagicMock(status_code=200, headers={})
+    governor = QuotaGovernor(per_minute=600, per_day=1000)
+
+    with (
+        patch("services.google_books.governor", governor),
+        patch("services.google_books.httpx.get", side_effect=[throttled, ok]),
+    ):
+        assert google_books.google_get("https://example.test") is ok
+
+    assert governor.metrics()["backoffs"] == 1
+
+
+# ------------------
+# REQUEST COALESCING
+# ------------------
+
+
+def slow_volume_response(url, **kwargs):
+    time.sleep(0.2)
+    return volume_response(url.rsplit("/", 1)[-1])
+
+
+def test_concurrent_identical_details_make_one_upstream_call():
+    results = []
+    barrier = threading.Barrier(10)
+
+    def worker():
+        barrier.wait()
+        results.append(google_books.get_book_details("abc"))
+
+    with patch("services.google_books.httpx.get") as mock_get:
+        mock_get.side_effect = slow_volume_response
+        threads = [threading.Thread(target=worker) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert mock_get.call_count == 1
+    assert results == [{"title": "abc"}] * 10
+
+
+def test_concurrent_searches_share_normalized_key():
+    search_response = MagicMock(status_code=200)
+    search_response.json.return_value = {"items": []}
+
+    def slow_search(url, **kwargs):
+        time.sleep(0.2)
+        return search_response
+
+    terms = ["Dune", "dune", "  DUNE ", "dune"]
+    barrier = threading.Barrier(len(terms))
+
+    def worker(term):
+        barrier.wait()
+        google_books.search_books(term)
+
+    with patch("services.google_books.httpx.get", side_effect=slow_search) as mock:
+        threads = [threading.Thread(target=worker, args=(t,)) for t in terms]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert mock.call_count == 1
+
+
+def test_search_results_are_cached_and_served_stale_when_upstream_fails():
+    search_response = MagicMock(status_code=200)
+    search_response.json.return_value = {
+        "items": [{"id": "a", "volumeInfo": {"title": "Dune"}}]
+    }
+
+    with patch("services.google_books.httpx.get", return_value=search_response) as mock:
+        first = google_books.search_books("Dune")
+        assert google_books.search_books(" dune ") == first
+    assert mock.call_count == 1
+
+    with (
+        patch.object(google_books.search_cache, "ttl", -1),
+        patch("services.google_books.httpx.get") as mock_get,
+    ):
+        google_books.search_cache.set("dune", first)
+        mock_get.side_effect = httpx.ConnectTimeout("timed out")
+        assert google_books.search_books("Dune") == first
+
+
+def test_sync_and_async_callers_share_one_call():
+    async def main():
+        sync_call = asyncio.to_thread(google_books.get_book_details, "abc")
+        async_calls = [google_books.get_book_details_async("abc") for _ in range(5)]
+        return await asyncio.gather(sync_call, *async_calls)
+
+    with patch("services.google_books.httpx.get") as mock_get:
+        mock_get.side_effect = slow_volume_response
+        results = asyncio.run(main())
+
+    assert mock_get.call_count == 1
+    assert results == [{"title": "abc"}] * 6
+
+
+def test_interactive_call_does_not_join_a_failing_prefetch():
+    prefetch_started, release = threading.Event(), threading.Event()
+
+    def fetch(url, priority):
+        if priority == Priority.PREFETCH:
+            prefetch_started.set()
+            release.wait(5)
+            raise QuotaExceeded("Timed out waiting for Google Books quota.")
+        return volume_response("abc")
+
+    def prefetch():
+        # Falls back to the entry the interactive call cached meanwhile.
+        google_books.get_book_details("abc", Priority.PREFETCH)
+
+    with patch("services.google_books.google_get", side_effect=fetch):
+        thread = threading.Thread(target=prefetch)
+        thread.start()
+        prefetch_started.wait(5)
+        try:
+            assert google_books.get_book_details("abc") == {"title": "abc"}
+        finally:
+            release.set()
+            thread.join()
+
+
+def test_coalesced_callers_share_errors():
+    flight = SingleFlight()
+    calls = []
+    barrier = threading.Barrier(5)
+    errors = []
+
+    def failing():
+        calls.append(1)
+        time.sleep(0.2)
+        raise ValueError("upstream down")
+
+    def worker():
+        barrier.wait()
+        try:
+            flight.do("key", failing)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(errors) == 5
+    assert flight.in_flight() == 0
+
+
+# --------------------------
+# CIRCUIT BREAKER AND HEDGING
+# --------------------------
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("books.test", failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_breaker_half_open_probe_closes_circuit():
+    breaker = CircuitBreaker("books.test", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker("books.test", failure_threshold=1, slow_call_threshold=1)
+    breaker.record(ok=True, seconds=3)
+
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_google_get_fails_fast_when_circuit_open():
+    with patch("services.google_books.httpx.get") as mock_get:
+        mock_get.side_effect = httpx.ConnectTimeout("timed out")
+        for _ in range(google_books.settings.GOOGLE_BREAKER_FAILURES):
+            with pytest.raises(httpx.ConnectTimeout):
+                google_books.google_get(google_books.BOOK_URL.format("abc"))
+
+        with pytest.raises(CircuitOpenError):
+            google_books.google_get(google_books.BOOK_URL.format("abc"))
+
+    assert mock_get.call_count == google_books.settings.GOOGLE_BREAKER_FAILURES
+
+
+def test_get_book_details_serves_stale_entry_when_upstream_down():
+    expired_cache = TTLCache(ttl=-1)
+    expired_cache.set("abc", {"title": "cached"})
+
+    with (
+        patch("services.google_books.details_cache", expired_cache),
+        patch("services.google_books.httpx.get") as mock_get,
+    ):
+        mock_get.side_effect = httpx.ConnectTimeout("timed out")
+        assert google_books.get_book_details("abc") == {"title": "cached"}
+
+
+def test_get_book_details_serves_stale_entry_on_server_error():
+    expired_cache = TTLCache(ttl=-1)
+    expired_cache.set("abc", {"title": "cached"})
+
+    with (
+        patch("services.google_books.details_cache", expired_cache),
+        patch("services.google_books.httpx.get") as mock_get,
+    ):
+        mock_get.return_value = MagicMock(status_code=500, headers={})
+        assert google_books.get_book_details("abc") == {"title": "cached"}
+
+        expired_cache.clear()
+        with pytest.raises(google_books.UpstreamServerError):
+            google_books.get_book_details("abc")
+
+
+def test_slow_call_threshold_follows_host_latency():
+    stats = LatencyStats()
+    assert (
+        google_books._slow_call_threshold(stats)
+        == google_books.settings.GOOGLE_SLOW_CALL_SECONDS
+    )
+
+    for _ in range(google_books.HEDGE_MIN_SAMPLES):
+        stats.record(0.2)
+    assert google_books._slow_call_threshold(stats) == pytest.approx(0.8)
+
+    for _ in range(200):
+        stats.record(30.0)
+    assert (
+        google_books._slow_call_threshold(stats)
+        == google_books.settings.GOOGLE_SLOW_CALL_SECONDS
+    )
+
+
+def test_hedged_call_returns_faster_attempt():
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        if len(attempts) == 1:
+            time.sleep(0.5)
+            return "slow"
+        return "fast"
+
+    started = time.monotonic()
+    assert hedged_call(call, delay=0.05) == "fast"
+    assert time.monotonic() - started < 0.5
+
+
+def test_hedged_call_skips_hedge_without_quota():
+    def call():
+        time.sleep(0.1)
+        return "only"
+
+    assert hedged_call(call, delay=0.01, can_hedge=lambda: False) == "only"
+
+
+# ----------------------
+# DESCRIPTION CLEANING
+# ----------------------
+
+DESCRIPTIONS = [
+    "",
+    "Plain text",
+    "<p><b>Bold</b> and <i>italic</i>.</p><p>Second &amp; last.</p>",
+    "Line one<br>Line two<br/>Line three",
+    "&ldquo;Quoted&rdquo; &mdash; &copy; 2020 &nbsp;&eacute;",
+    "&foo; &amp &lt;tag&gt; &#65;&#x42;&#X43; &#150; &#0; &#99999999; &#xD800;",
+    "&#65x; &#x41g; &#xZ; &#; &#65 &#x41 &#1;",
+    "<script>var x = '<p>';</script>kept<style>p {}</style>",
+    "<ruby>kanji<rt>reading</rt><rp>(</rp></ruby><template>t</template>",
+    "<!-- comment -->a<!DOCTYPE html>b<?pi?>c<![CDATA[d]]>e",
+    "<script><![CDATA[cdata]]></script>",
+    "<p>unterminated <!-- comment",
+    "<pre>  \n  </pre>  \n  <p>   </p><textarea> </textarea>",
+    "a\r\nb <div>\n\n</div> <span> </span>",
+    "<b><i>misnested</b></i> </p> stray close",
+    "<ul><li>one<li>two</ul>",
+    "<p class=\"x\" data-a='1 > 2'>attrs</p>",
+    "1 < 2 and 3 > 2 <",
+]
+
+
+def random_markup(rng: random.Random) -> str:
+    pieces = [
+        "<p>", "</p>", "<b>", "</b>", "<br>", "<br/>", "<script>", "</script>",
+        "<pre>", "</pre>", "<!-- c -->", "<![CDATA[x]]>", "&amp;", "&lt;",
+        "&nbsp;", "&#8212;", "&#x41;", "&bogus;", "&", "<", ">", " ", "\n",
+        "word", "Ünïcødé",
+    ]  # fmt: skip
+    return "".join(rng.choice(pieces) for _ in range(rng.randint(0, 40)))
+
+
+@pytest.mark.parametrize("markup", DESCRIPTIONS)
+def test_strip_tags_matches_beautifulsoup(markup):
+    assert strip_tags(markup) == BeautifulSoup(markup, "html.parser").get_text()
+
+
+def test_strip_tags_matches_beautifulsoup_on_random_markup():
+    rng = random.Random(50)
+    for _ in range(500):
+        markup = random_markup(rng)
+        expected = BeautifulSoup(markup, "html.parser").get_text()
+        assert strip_tags(markup) == expected, markup
+
+
+def test_clean_and_shorten_description_truncates_plain_text():
+    description = "<p>" + "word " * 100 + "</p>"
+
+    cleaned = google_books.clean_and_shorten_description(description, max_length=50)
+
+    assert cleaned.endswith("...") and len(cleaned) <= 50
+    assert "<" not in cleaned
+
+
+def test_clean_and_shorten_description_memoizes_per_volume():
+    with patch.object(google_books, "strip_tags", side_effect=strip_tags) as mock_strip:
+        first = google_books.clean_and_shorten_description("<b>One</b>", volume_id="v1")
+        again = google_books.clean_and_shorten_description("<b>One</b>", volume_id="v1")
+        assert first == again == "One"
+        assert mock_strip.call_count == 1
+
+        # An edited description upstream is not served from the memo.
+        edited = google_books.clean_and_shorten_description(
+            "<b>Two</b>", volume_id="v1"
+        )
+        assert edited == "Two"
+        assert mock_strip.call_count == 2
+
+
+def test_quota_is_split_between_api_workers(monkeypatch):
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 4)
+
+    assert settings.per_worker(1000) == 250
+    assert settings.per_worker(2) == 1
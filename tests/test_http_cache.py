@@ -0,0 +1,33 @@
+from datetime import datetime
+
+from starlette.requests import Request
+
+from services.http_cache import is_not_modified, make_etag
+
+
+def request_with(headers: dict) -> Request:
+    raw = [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "headers": raw})
+
+
+def test_if_none_match_uses_weak_comparison_and_lists():
+    etag = make_etag("details", "abc", {"title": "Dune"})
+    strong = etag.removeprefix("W/")
+
+    assert is_not_modified(request_with({"If-None-Match": etag}), etag)
+    assert is_not_modified(request_with({"If-None-Match": f'"other", {strong}'}), etag)
+    assert is_not_modified(request_with({"If-None-Match": "*"}), etag)
+    assert not is_not_modified(request_with({"If-None-Match": '"other"'}), etag)
+
+
+def test_if_modified_since_applies_only_without_if_none_match():
+    modified = datetime(2025, 3, 1, 12, 0, 0, 500)
+    since = {"If-Modified-Since": "Sat, 01 Mar 2025 12:00:00 GMT"}
+
+    assert is_not_modified(request_with(since), 'W/"x"', modified)
+    assert not is_not_modified(
+        request_with(since), 'W/"x"', datetime(2025, 3, 1, 12, 0, 1)
+    )
+    assert not is_not_modified(
+        request_with({**since, "If-None-Match": '"y"'}), 'W/"x"', modified
+    )
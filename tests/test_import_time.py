@@ -0,0 +1,12 @@
+from benchmarks.import_time import measure
+
+# Generous enough for a cold CI runner; a regression that drags Streamlit or
+# the LLM stack back into the API shows up as a multiple of this.
+IMPORT_BUDGET_SECONDS = 3.0
+
+
+def test_api_import_stays_within_budget():
+    cumulative = measure("main")
+
+    assert not {"streamlit", "marvin", "openai"} & set(cumulative)
+    assert cumulative["main"] < IMPORT_BUDGET_SECONDS
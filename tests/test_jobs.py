@@ -0,0 +1,89 @@
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from sqlmodel import Session, SQLModel, create_engine
+
+from main import run_recommendation_job
+from models import JobStatus, RecommendationJob
+from services import jobs
+
+
+def test_recommendation_job_lifecycle(client, session, mock_search_books):
+    response = client.post("/jobs/recommendations", json={"title": "Dune"})
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    assert response.json()["status"] == "queued"
+
+    job = jobs.claim_next(session)
+    assert job.id == job_id
+    assert job.status == JobStatus.RUNNING
+    assert jobs.claim_next(session) is None
+
+    with patch("main.recommend_for_seed", return_value=["Python Book"]):
+        jobs.run_job(session, job, run_recommendation_job)
+
+    response = client.get(f"/jobs/{job_id}")
+    assert response.status_code == 200
+    assert response.json()["status"] == "succeeded"
+    assert response.json()["result"][0]["id"] == "12345"
+
+
+def test_failed_job_records_error(client, session):
+    job = jobs.enqueue(session, title="Dune")
+    job = jobs.claim_next(session)
+
+    with patch("main.recommend_for_seed", side_effect=RuntimeError("LLM down")):
+        jobs.run_job(session, job, run_recommendation_job)
+
+    body = client.get(f"/jobs/{job.id}").json()
+    assert body["status"] == "failed"
+    assert body["error"] == "LLM down"
+
+
+def test_job_abandoned_on_last_attempt_is_failed(client, session):
+    job = jobs.enqueue(session, title="Dune")
+    job.status = JobStatus.RUNNING
+    job.attempts = jobs.MAX_ATTEMPTS
+    job.started_at = datetime.utcnow() - jobs.STALE_AFTER - timedelta(minutes=1)
+    session.add(job)
+    session.commit()
+
+    assert jobs.claim_next(session) is None
+
+    body = client.get(f"/jobs/{job.id}").json()
+    assert body["status"] == "failed"
+    assert "3 attempts" in body["error"]
+
+
+def test_create_job_requires_book_or_title(client):
+    assert client.post("/jobs/recommendations", json={}).status_code == 400
+    assert (
+        client.post("/jobs/recommendations", json={"book_id": 999}).status_code == 404
+    )
+
+
+def test_worker_pool_drains_queue(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        job_ids = [jobs.enqueue(session, title=f"Book {n}").id for n in range(4)]
+
+    pool = jobs.JobWorkerPool(
+        engine, lambda session, job: [job.title], concurrency=2, poll_interval=0.05
+    )
+    pool.start()
+    try:
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            with Session(engine) as session:
+                done = [
+                    session.get(RecommendationJob, job_id).status for job_id in job_ids
+                ]
+            if all(status == JobStatus.SUCCEEDED for status in done):
+                break
+            time.sleep(0.05)
+    finally:
+        pool.stop()
+
+    assert done == [JobStatus.SUCCEEDED] * 4
@@ -0,0 +1,270 @@
+from datetime import datetime, timedelta
+
+from sqlmodel import select
+
+from models import Book, UserBookChange, UserBookStatus, UserBookTombstone
+from services import library
+
+
+def save(auth_client, user_id, book_id, status="to_read"):
+    response = auth_client.post(
+        "/user-books/", json={"user_id": user_id, "book_id": book_id, "status": status}
+    )
+    assert response.status_code == 200
+
+
+def version(auth_client, user_id) -> int:
+    return auth_client.get(f"/user-books/version?user_id={user_id}").json()["version"]
+
+
+def test_every_save_patch_and_delete_bumps_version(
+    auth_client, session, create_test_user, test_book
+):
+    user_id = create_test_user.id
+    assert version(auth_client, user_id) == 0
+
+    save(auth_client, user_id, test_book.id)
+    assert version(auth_client, user_id) == 1
+    row = session.exec(select(UserBookStatus)).one()
+    assert row.version == 1
+
+    auth_client.patch(
+        f"/user-books/{user_id}/{test_book.id}/", json={"status": "reading"}
+    )
+    assert version(auth_client, user_id) == 2
+
+    auth_client.delete(f"/user-books/{user_id}/{test_book.id}/")
+    assert version(auth_client, user_id) == 3
+    tombstone = session.exec(select(UserBookTombstone)).one()
+    assert (tombstone.book_id, tombstone.version) == (test_book.id, 3)
+
+
+def test_one_flush_bumps_each_user_once(session, create_test_user, test_book):
+    other = Book(title="Emma", bookid="emma")
+    session.add(other)
+    session.commit()
+
+    # Read ids up front: touching an expired instance would autoflush.
+    user_id, book_ids = create_test_user.id, [test_book.id, other.id]
+    for book_id in book_ids:
+        session.add(UserBookStatus(user_id=user_id, book_id=book_id, status="to_read"))
+    session.commit()
+
+    assert library.current_version(session, user_id)[0] == 1
+
+
+def test_delta_returns_changes_and_tombstones_since_version(
+    auth_client, session, create_test_user, test_book
+):
+    user_id = create_test_user.id
+    other = Book(title="Emma", bookid="emma")
+    session.add(other)
+    session.commit()
+    save(auth_client, user_id, test_book.id)
+    save(auth_client, user_id, other.id)
+    synced = version(auth_client, user_id)
+
+    auth_client.patch(
+        f"/user-books/{user_id}/{other.id}/", json={"status": "completed"}
+    )
+    auth_client.delete(f"/user-books/{user_id}/{test_book.id}/")
+
+    delta = auth_client.get(f"/user-books/?user_id={user_id}&since={synced}").json()
+    assert delta["since"] == synced
+    assert delta["version"] == synced + 2
+    assert [(book["id"], book["status"]) for book in delta["changed"]] == [
+        (other.id, "completed")
+    ]
+    assert delta["deleted"] == [test_book.id]
+
+    full = auth_client.get(f"/user-books/?user_id={user_id}&since=0").json()
+    assert [book["id"] for book in full["changed"]] == [other.id]
+
+    current = auth_client.get(
+        f"/user-books/?user_id={user_id}&since={delta['version']}"
+    )
+    assert current.json()["changed"] == [] and current.json()["deleted"] == []
+
+
+def test_resaving_a_deleted_book_clears_its_tombstone(
+    auth_client, session, create_test_user, test_book
+):
+    user_id = create_test_user.id
+    save(auth_client, user_id, test_book.id)
+    auth_client.delete(f"/user-books/{user_id}/{test_book.id}/")
+    save(auth_client, user_id, test_book.id)
+
+    assert session.exec(select(UserBookTombstone)).all() == []
+    delta = auth_client.get(f"/user-books/?user_id={user_id}&since=0").json()
+    assert [book["id"] for book in delta["changed"]] == [test_book.id]
+    assert delta["deleted"] == []
+
+
+def test_patch_stamps_updated_at_and_logs_changes(
+    auth_client, session, create_test_user, test_book
+):
+    user_id = create_test_user.id
+    save(auth_client, user_id, test_book.id)
+    before = session.exec(select(UserBookStatus)).one().updated_at
+
+    auth_client.patch(
+        f"/user-books/{user_id}/{test_book.id}/", json={"status": "reading"}
+    )
+    auth_client.delete(f"/user-books/{user_id}/{test_book.id}/")
+    session.expire_all()
+
+    changes = auth_client.get(f"/user-books/changes?user_id={user_id}").json()
+    assert [(c["book_id"], c["op"], c["version"]) for c in changes] == [
+        (test_book.id, "save", 1),
+        (test_book.id, "update", 2),
+        (test_book.id, "delete", 3),
+    ]
+    after = auth_client.get(
+        f"/user-books/changes?user_id={user_id}&after_id={changes[0]['id']}"
+    ).json()
+    assert [c["op"] for c in after] == ["update", "delete"]
+    assert changes[1]["ts"] > before.isoformat()
+    assert changes[1]["ts"] > changes[0]["ts"]
+
+
+def test_compact_keeps_latest_state_per_book(session, create_test_user, test_book):
+    other = Book(title="Emma", bookid="emma")
+    session.add(other)
+    session.commit()
+    user_id, book_id, other_id = create_test_user.id, test_book.id, other.id
+
+    session.add(UserBookStatus(user_id=user_id, book_id=book_id, status="to_read"))
+    session.add(UserBookStatus(user_id=user_id, book_id=other_id, status="to_read"))
+    session.commit()
+    row = session.exec(
+        select(UserBookStatus).where(UserBookStatus.book_id == book_id)
+    ).one()
+    row.status = "reading"
+    session.commit()
+    session.delete(
+        session.exec(
+            select(UserBookStatus).where(UserBookStatus.book_id == other_id)
+        ).one()
+    )
+    session.commit()
+
+    removed = library.compact(session, datetime.utcnow() + timedelta(seconds=1))
+
+    assert removed == 3
+    remaining = session.exec(select(UserBookChange)).all()
+    assert [(c.book_id, c.op) for c in remaining] == [(book_id, "update")]
+    assert session.exec(select(UserBookTombstone)).all() == []
+
+
+def test_compact_leaves_recent_entries(session, create_test_user, test_book):
+    session.add(
+        UserBookStatus(
+            user_id=create_test_user.id, book_id=test_book.id, status="to_read"
+        )
+    )
+    session.commit()
+
+    assert library.compact(session, datetime.utcnow() - timedelta(days=1)) == 0
+    assert len(session.exec(select(UserBookChange)).all()) == 1
+
+
+def test_cursors_before_compacted_deletes_must_resync(
+    auth_client, session, create_test_user, test_book
+):
+    user_id = create_test_user.id
+    other = Book(title="Emma", bookid="emma")
+    session.add(other)
+    session.commit()
+    book_id, other_id = test_book.id, other.id
+    save(auth_client, user_id, book_id)
+    save(auth_client, user_id, other_id)
+    stale_version = version(auth_client, user_id)
+    stale_change_id = auth_client.get(f"/user-books/changes?user_id={user_id}").json()[
+        -1
+    ]["id"]
+    auth_client.delete(f"/user-books/{user_id}/{book_id}/")
+    current = version(auth_client, user_id)
+
+    library.compact(session, datetime.utcnow() + timedelta(seconds=1))
+
+    delta = f"/user-books/?user_id={user_id}&since="
+    changes = f"/user-books/changes?user_id={user_id}&after_id="
+    assert auth_client.get(delta + str(stale_version)).status_code == 410
+    assert auth_client.get(changes + str(stale_change_id)).status_code == 410
+    # Starting over, or already past the delete, still works.
+    full = auth_client.get(delta + "0")
+    assert full.status_code == 200
+    assert [book["id"] for book in full.json()["changed"]] == [other_id]
+    assert auth_client.get(delta + str(current)).status_code == 200
+    assert auth_client.get(changes + "0").status_code == 200
+
+
+def test_batch_applies_edits_and_deletes_under_one_version(
+    auth_client, session, create_test_user, test_book
+):
+    user_id = create_test_user.id
+    others = [Book(title=f"Book {n}", bookid=f"vol{n}") for n in range(3)]
+    session.add_all(others)
+    session.commit()
+    book_ids = [test_book.id] + [book.id for book in others]
+    for book_id in book_ids[:3]:
+        save(auth_client, user_id, book_id)
+
+    response = auth_client.post(
+        "/user-books/batch/",
+        json={
+            "user_id": user_id,
+            "items": [
+                {"book_id": book_ids[0], "status": "completed", "rating": 5},
+                {"book_id": book_ids[1], "status": "completed", "rating": 5},
+                {"book_id": book_ids[2], "delete": True},
+                {"book_id": book_ids[3], "delete": True},
+                {"book_id": book_ids[0], "status": "reading"},
+                {"book_id": book_ids[1]},
+            ],
+        },
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["version"] == 4
+    assert [result["outcome"] for result in body["results"]] == [
+        "updated",
+        "updated",
+        "deleted",
+        "not_found",
+        "duplicate",
+        "duplicate",
+    ]
+    session.expire_all()
+    rows = session.exec(select(UserBookStatus).order_by(UserBookStatus.book_id)).all()
+    assert [(r.book_id, r.status, r.rating, r.version) for r in rows] == [
+        (book_ids[0], "completed", 5, 4),
+        (book_ids[1], "completed", 5, 4),
+    ]
+    assert all(row.updated_at is not None for row in rows)
+    tombstone = session.exec(select(UserBookTombstone)).one()
+    assert (tombstone.book_id, tombstone.version) == (book_ids[2], 4)
+    changes = auth_client.get(f"/user-books/changes?user_id={user_id}&after_id=3")
+    assert [(c["book_id"], c["op"]) for c in changes.json()] == [
+        (book_ids[0], "update"),
+        (book_ids[1], "update"),
+        (book_ids[2], "delete"),
+    ]
+
+
+def test_batch_without_changes_keeps_version(
+    auth_client, session, create_test_user, test_book
+):
+    user_id = create_test_user.id
+    save(auth_client, user_id, test_book.id)
+
+    response = auth_client.post(
+        "/user-books/batch/",
+        json={"user_id": user_id, "items": [{"book_id": test_book.id}]},
+    )
+
+    assert response.json() == {
+        "version": 1,
+        "results": [{"book_id": test_book.id, "outcome": "unchanged"}],
+    }
@@ -1,8 +1,26 @@
+import asyncio
+import json
 import textwrap
+import threading
+import time
+from unittest.mock import patch
 
+import bcrypt
+import httpx
 import pytest
 from bs4 import BeautifulSoup
 
+from main import app
+from models import Book
+from services import google_books
+from services.passwords import HashingBusy, pwd_context
+from services.recommender import (
+    REBUILD_DEBOUNCE,
+    recommend_from_catalogue,
+    recommender,
+)
+from services.resilience import CircuitOpenError
+
 # ------------------
 # USER RELATED TESTS
 # ------------------
@@ -82,6 +100,68 @@ def test_login(
     assert ("access_token" in json_data) == token_expected
 
 
+def test_login_rehashes_outdated_password_hash(client, session, create_test_user):
+    create_test_user.password_hash = bcrypt.hashpw(
+        b"password123", bcrypt.gensalt(rounds=4)
+    ).decode()
+    session.add(create_test_user)
+    session.commit()
+
+    response = client.post(
+        "/auth/token", data={"username": "validuser", "password": "password123"}
+    )
+
+    assert response.status_code == 200
+    session.refresh(create_test_user)
+    assert not pwd_context.needs_update(create_test_user.password_hash)
+    assert create_test_user.verify_password("password123")
+
+
+def test_login_returns_503_when_hashing_pool_is_saturated(client, create_test_user):
+    with patch("auth.verify_and_update_async", side_effect=HashingBusy):
+        response = client.post(
+            "/auth/token", data={"username": "validuser", "password": "password123"}
+        )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_login_db_calls_do_not_block_other_requests(client, session, create_test_user):
+    in_login, other_served = threading.Event(), threading.Event()
+    waited = []
+    real_exec = session.exec
+
+    def slow_exec(*args, **kwargs):
+        # Held until another request is served; that can only happen if the
+        # login's DB call is off the event loop.
+        if not in_login.is_set():
+            in_login.set()
+            waited.append(other_served.wait(timeout=2))
+        return real_exec(*args, **kwargs)
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as ac:
+            login = asyncio.create_task(
+                ac.post(
+                    "/auth/token",
+                    data={"username": "validuser", "password": "password123"},
+                )
+            )
+            await asyncio.to_thread(in_login.wait, 2)
+            other = await ac.get("/")
+            other_served.set()
+            return await login, other
+
+    with patch.object(session, "exec", side_effect=slow_exec):
+        login, other = asyncio.run(main())
+
+    assert other.status_code == 200
+    assert login.status_code == 200
+    assert waited == [True]
+
+
 # ------------------
 # BOOK RELATED TESTS
 # ------------------
@@ -141,6 +221,35 @@ def test_get_user_books(auth_client, create_test_user, test_book):
     assert len(response.json()) == 1
 
 
+def test_user_books_revalidate_with_etag(auth_client, create_test_user, test_book):
+    url = f"/user-books/?user_id={create_test_user.id}"
+    auth_client.post(
+        "/user-books/",
+        json={
+            "user_id": create_test_user.id,
+            "book_id": test_book.id,
+            "status": "to_read",
+        },
+    )
+    first = auth_client.get(url)
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+    assert "Last-Modified" in first.headers
+
+    unchanged = auth_client.get(url, headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+
+    auth_client.patch(
+        f"/user-books/{create_test_user.id}/{test_book.id}/",
+        json={"status": "reading", "rating": 4},
+    )
+    changed = auth_client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()[0]["rating"] == 4
+
+
 def test_update_user_book_status(auth_client, create_test_user, test_book):
     post_response = auth_client.post(
         "/user-books/",
@@ -198,6 +307,69 @@ def test_search_google_books_not_found(client, mock_search_books):
     assert response.status_code == 404
 
 
+def test_search_google_books_schedules_prefetch(client, mock_search_books):
+    with patch("main.prefetch_book_details") as mock_prefetch:
+        response = client.get("/google-books/search/?term=Python&prefetch=true")
+
+    assert response.status_code == 200
+    mock_prefetch.assert_called_once_with(["12345"], top_k=5)
+
+
+def test_search_falls_back_to_local_catalogue(client, test_book, mock_search_books):
+    mock_search_books.side_effect = CircuitOpenError("www.googleapis.com", 30)
+    response = client.get("/google-books/search/?term=Test")
+
+    assert response.status_code == 200
+    assert response.json()[0]["id"] == test_book.bookid
+
+
+def test_search_without_local_match_returns_503(client, mock_search_books):
+    mock_search_books.side_effect = CircuitOpenError("www.googleapis.com", 30)
+    response = client.get("/google-books/search/?term=Nothing")
+
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+
+def test_local_fallback_treats_wildcards_literally(
+    client, test_book, mock_search_books
+):
+    mock_search_books.side_effect = CircuitOpenError("www.googleapis.com", 30)
+    response = client.get("/google-books/search/?term=%25")
+
+    assert response.status_code == 503
+
+
+def test_google_timeouts_without_fallback_return_503(client):
+    google_books.details_cache.clear()
+    google_books.search_cache.clear()
+    try:
+        with patch(
+            "services.google_books.httpx.get",
+            side_effect=httpx.ConnectTimeout("timed out"),
+        ):
+            details = client.get("/google-books/details/notsaved1/")
+            search = client.get("/google-books/search/?term=zzz")
+    finally:
+        google_books.breakers.clear()
+        google_books.latency_stats.clear()
+
+    for response in (details, search):
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
+
+
+def test_google_book_details_falls_back_to_local_catalogue(
+    client, test_book, mock_get_book_details
+):
+    mock_get_book_details.side_effect = CircuitOpenError("www.googleapis.com", 30)
+    response = client.get(f"/google-books/details/{test_book.bookid}/")
+
+    assert response.status_code == 200
+    assert response.json()["title"] == test_book.title
+    assert response.json()["published_date"] == "2024-12-31"
+
+
 def clean_and_shorten_description(description: str, max_length: int = 300):
     """Remove HTML tags from the description and truncate it."""
     plain_text = BeautifulSoup(description, "html.parser").get_text()
@@ -221,6 +393,21 @@ def test_google_book_details_success(client, mock_get_book_details):
     assert response.json() == expected_response
 
 
+def test_google_book_details_not_modified(client, mock_get_book_details):
+    first = client.get("/google-books/details/RQ6xDwAAQBAJ/")
+    assert first.headers["Cache-Control"].startswith("public, max-age=")
+
+    with patch("main.clean_and_shorten_description") as mock_clean:
+        response = client.get(
+            "/google-books/details/RQ6xDwAAQBAJ/",
+            headers={"If-None-Match": first.headers["ETag"]},
+        )
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == first.headers["ETag"]
+    mock_clean.assert_not_called()
+
+
 def test_google_book_details_not_found(client, mock_get_book_details_not_found):
     response = client.get("/google-books/details/invalid-book-id/")
     assert response.status_code == 404
@@ -249,3 +436,151 @@ def test_save_google_book_not_found(
     )
     assert response.status_code == 404
     assert "Book with ID" in response.json()["detail"]
+
+
+# ---------------------
+# RECOMMENDATION TESTS
+# ---------------------
+
+SPACE_OPERA = "An epic space opera of interstellar empires, starship fleets and war"
+
+
+@pytest.fixture(name="space_books")
+def space_books_fixture(session):
+    books = [
+        Book(
+            title=f"Starship Saga {n}",
+            bookid=f"space{n}",
+            authors="Jane Stellar",
+            description=SPACE_OPERA,
+        )
+        for n in range(5)
+    ]
+    books.append(
+        Book(
+            title="Garden Recipes",
+            bookid="cook1",
+            authors="Chef Basil",
+            description="Simple vegetarian recipes using herbs from your garden",
+        )
+    )
+    session.add_all(books)
+    session.commit()
+    recommender.build(session)
+    return books
+
+
+def test_recommendations_served_from_local_catalogue(client, space_books):
+    with patch("main.recommend_for_seed") as mock_llm:
+        response = client.get(f"/books/{space_books[0].id}/recommendations")
+
+    assert response.status_code == 200
+    ids = [book["id"] for book in response.json()]
+    assert ids and all(book_id.startswith("space") for book_id in ids)
+    assert "space0" not in ids
+    mock_llm.assert_not_called()
+
+
+def test_stale_recommender_rebuilds_in_background(session, space_books):
+    new_book = Book(
+        title="Starship Pilots",
+        bookid="space9",
+        authors="Ada Orbit",
+        description="A starship crew explores distant galaxies and planets",
+    )
+    session.add(new_book)
+    session.commit()
+    recommender.mark_stale()
+    recommender.built_at -= REBUILD_DEBOUNCE + 1
+
+    # The current index answers while the rebuild runs off the request.
+    assert recommend_from_catalogue(session, space_books[0])
+    deadline = time.monotonic() + 5
+    while new_book.id not in recommender.row_of and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert new_book.id in recommender.row_of
+    assert not recommender.needs_rebuild()
+
+
+def test_recommendations_fall_back_to_llm_for_cold_books(
+    client, session, test_book, mock_search_books
+):
+    recommender.build(session)
+    with patch("main.recommend_for_seed") as mock_llm:
+        mock_llm.return_value = ["Python Book by Test Author"]
+        response = client.get(f"/books/{test_book.id}/recommendations")
+
+    assert response.status_code == 200
+    assert response.json()[0]["id"] == "12345"
+    mock_llm.assert_called_once()
+
+
+def test_batch_recommendations_use_one_llm_call(client, session, mock_search_books):
+    books = [
+        Book(title="Dune", bookid="dune1"),
+        Book(title="Emma", bookid="emma1"),
+    ]
+    session.add_all(books)
+    session.commit()
+    recommender.build(session)
+
+    with patch("main.recommend_for_seeds") as mock_llm:
+        mock_llm.return_value = [
+            ["Python Book by Test Author", "Hyperion"],
+            ["Python Book"],
+        ]
+        response = client.post(
+            "/books/recommendations/batch",
+            json={"book_ids": [books[0].id, books[1].id]},
+        )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [rec["id"] for rec in body[str(books[0].id)]] == ["12345", "12345"]
+    assert [rec["id"] for rec in body[str(books[1].id)]] == ["12345"]
+    mock_llm.assert_called_once()
+    assert mock_search_books.call_count == 2
+
+
+def test_batch_recommendations_unknown_book(client):
+    response = client.post("/books/recommendations/batch", json={"book_ids": [999]})
+    assert response.status_code == 404
+
+
+def parse_sse(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_stream_recommendations_emits_results_as_resolved(client, mock_search_books):
+    def search(title, priority=None):
+        if title == "Slow Book":
+            time.sleep(0.3)
+        return [{**mock_search_books.return_value[0], "google_id": title}]
+
+    mock_search_books.side_effect = search
+    with patch("main.recommend_for_seed") as mock_llm:
+        mock_llm.return_value = ["Slow Book by Someone", "Fast Book"]
+        response = client.post("/recommend/stream", json={"title": "Dune"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    assert [event for event, _ in events] == ["book", "book", "done"]
+    assert [data["id"] for _, data in events[:2]] == ["Fast Book", "Slow Book"]
+
+
+def test_stream_recommendations_reports_errors_in_band(client):
+    with patch("main.recommend_for_seed", side_effect=RuntimeError("LLM down")):
+        response = client.post("/recommend/stream", json={"title": "Dune"})
+
+    assert [event for event, _ in parse_sse(response.text)] == ["error", "done"]
+
+
+def test_stream_book_recommendations_not_found(client):
+    response = client.get("/books/999/recommendations/stream")
+    assert response.status_code == 404
@@ -0,0 +1,116 @@
+from unittest.mock import patch
+
+import pytest
+
+from models import Book
+from services import marvin_ai
+from services.marvin_ai import SeedBook
+
+
+@pytest.fixture(autouse=True)
+def llm_cache(tmp_path, monkeypatch):
+    cache = marvin_ai.LLMCache(
+        str(tmp_path / "llm_cache.sqlite3"), ttl=3600, max_entries=100
+    )
+    monkeypatch.setattr(marvin_ai, "llm_cache", cache)
+    return cache
+
+
+def test_batch_packs_cache_misses_into_one_call():
+    seeds = [SeedBook(title="Dune"), SeedBook(title="Emma")]
+
+    with patch("services.marvin_ai.recommend_similar_books_batch") as mock_batch:
+        mock_batch.return_value = [["Hyperion"], ["Persuasion"]]
+        assert marvin_ai.recommend_for_seeds(seeds) == [["Hyperion"], ["Persuasion"]]
+
+    mock_batch.assert_called_once_with(seeds)
+
+
+def test_each_seed_is_cached_on_its_own():
+    with patch("services.marvin_ai.recommend_similar_books_batch") as mock_batch:
+        mock_batch.return_value = [["Hyperion"], ["Persuasion"]]
+        marvin_ai.recommend_for_seeds([SeedBook(title="Dune"), SeedBook(title="Emma")])
+
+    with patch("services.marvin_ai.recommend_similar_books") as mock_single:
+        mock_single.return_value = ["Middlemarch"]
+        results = marvin_ai.recommend_for_seeds(
+            [SeedBook(title="  DUNE"), SeedBook(title="Middlemarch")]
+        )
+
+    assert results == [["Hyperion"], ["Middlemarch"]]
+    mock_single.assert_called_once()
+
+
+def test_mismatched_batch_falls_back_to_single_calls():
+    seeds = [SeedBook(title="Dune"), SeedBook(title="Emma")]
+
+    with (
+        patch("services.marvin_ai.recommend_similar_books_batch") as mock_batch,
+        patch("services.marvin_ai.recommend_similar_books") as mock_single,
+    ):
+        mock_batch.return_value = [["Hyperion"]]
+        mock_single.side_effect = [["Hyperion"], ["Persuasion"]]
+        assert marvin_ai.recommend_for_seeds(seeds) == [["Hyperion"], ["Persuasion"]]
+
+
+def test_seed_key_ignores_formatting_but_not_content():
+    key = marvin_ai.seed_key(SeedBook(title="Dune", authors=["Frank Herbert"]))
+
+    assert key == marvin_ai.seed_key(
+        SeedBook(title="  DUNE ", authors=["frank  herbert"])
+    )
+    assert key != marvin_ai.seed_key(SeedBook(title="Dune Messiah"))
+    with patch("services.marvin_ai.model_name", return_value="another-model"):
+        assert key != marvin_ai.seed_key(
+            SeedBook(title="Dune", authors=["Frank Herbert"])
+        )
+
+
+def test_cache_persists_expires_and_reports_hit_rate(llm_cache):
+    llm_cache.set("dune", ["Hyperion"])
+    reopened = marvin_ai.LLMCache(llm_cache.path, ttl=3600, max_entries=100)
+
+    assert reopened.get("dune") == ["Hyperion"]
+    assert reopened.get("emma") is None
+    assert reopened.stats() == {
+        "entries": 1,
+        "hits": 1,
+        "misses": 1,
+        "hit_rate": 0.5,
+    }
+
+    expired = marvin_ai.LLMCache(llm_cache.path, ttl=-1, max_entries=100)
+    assert expired.get("dune") is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = marvin_ai.LLMCache(
+        str(tmp_path / "small.sqlite3"), ttl=3600, max_entries=10
+    )
+    for n in range(10):
+        cache.set(f"book-{n}", [str(n)])
+    cache.get("book-0")
+    cache.set("book-10", ["10"])
+
+    assert "book-0" in cache
+    assert "book-1" not in cache
+    assert cache.stats()["entries"] == 9
+
+
+def test_prewarm_fills_cache_for_uncached_books(session, llm_cache):
+    session.add_all(
+        [
+            Book(bookid="a", title="Dune", authors="Frank Herbert"),
+            Book(bookid="b", title="Emma", authors="Jane Austen"),
+        ]
+    )
+    session.commit()
+    dune = SeedBook(title="Dune", authors=["Frank Herbert"])
+    llm_cache.set(marvin_ai.seed_key(dune), ["Hyperion"])
+
+    with patch("services.marvin_ai.recommend_similar_books") as mock_single:
+        mock_single.return_value = ["Persuasion"]
+        assert marvin_ai.prewarm(session) == 1
+        assert marvin_ai.prewarm(session) == 0
+
+    mock_single.assert_called_once()
@@ -0,0 +1,104 @@
+from datetime import datetime
+
+from sqlmodel import select
+
+from models import Book, ReadingStat, UserBookStatus
+from services import reading_stats
+
+
+def stat_rows(session, user_id):
+    session.expire_all()
+    return {
+        (row.kind, row.key): (row.count, row.total)
+        for row in session.exec(
+            select(ReadingStat).where(ReadingStat.user_id == user_id)
+        )
+    }
+
+
+def test_incremental_stats_match_full_rebuild(
+    auth_client, session, create_test_user, test_book
+):
+    user_id = create_test_user.id
+    books = [
+        Book(title="Emma", bookid="emma", authors="Jane Austen"),
+        Book(title="Persuasion", bookid="persuasion", authors="Jane Austen"),
+        Book(
+            title="Good Omens", bookid="omens", authors="Terry Pratchett, Neil Gaiman"
+        ),
+    ]
+    session.add_all(books)
+    session.commit()
+    book_ids = [test_book.id] + [book.id for book in books]
+
+    for book_id in book_ids:
+        auth_client.post(
+            "/user-books/",
+            json={"user_id": user_id, "book_id": book_id, "status": "to_read"},
+        )
+    auth_client.patch(
+        f"/user-books/{user_id}/{book_ids[1]}/",
+        json={"status": "completed", "rating": 5},
+    )
+    auth_client.patch(
+        f"/user-books/{user_id}/{book_ids[1]}/",
+        json={"status": "completed", "rating": 3},
+    )
+    auth_client.post(
+        "/user-books/batch/",
+        json={
+            "user_id": user_id,
+            "items": [
+                {"book_id": book_ids[2], "status": "completed", "rating": 4},
+                {"book_id": book_ids[3], "status": "reading"},
+                {"book_id": book_ids[0], "delete": True},
+            ],
+        },
+    )
+    auth_client.delete(f"/user-books/{user_id}/{book_ids[3]}/")
+
+    incremental = stat_rows(session, user_id)
+    reading_stats.rebuild(session, user_id)
+    assert stat_rows(session, user_id) == incremental
+
+    stats = auth_client.get(f"/user-books/stats?user_id={user_id}").json()
+    month = datetime.utcnow().strftime("%Y-%m")
+    assert stats["status_counts"] == {"completed": 2}
+    assert stats["completed_per_month"] == {month: 2}
+    assert stats["completed_per_year"] == {month[:4]: 2}
+    assert stats["rated_count"] == 2
+    assert stats["average_rating"] == 3.5
+    assert stats["top_authors"] == [{"author": "Jane Austen", "count": 2}]
+
+
+def test_completed_at_is_kept_across_edits_and_cleared_on_leaving(
+    session, create_test_user, test_book
+):
+    user_id, book_id = create_test_user.id, test_book.id
+    session.add(UserBookStatus(user_id=user_id, book_id=book_id, status="completed"))
+    session.commit()
+    row = session.get(UserBookStatus, (user_id, book_id))
+    finished = row.completed_at
+    assert finished is not None
+
+    row.rating = 4
+    session.commit()
+    assert row.completed_at == finished
+
+    # Set without reading first: the old status comes from the database.
+    row.status = "reading"
+    session.commit()
+    assert row.completed_at is None
+    rows = stat_rows(session, user_id)
+    assert [key for key in rows if key[0] in ("status", "month")] == [
+        ("status", "reading")
+    ]
+    assert rows[("rating", "")] == (1, 4.0)
+
+
+def test_stats_for_an_empty_library(auth_client, create_test_user):
+    response = auth_client.get(f"/user-books/stats?user_id={create_test_user.id}")
+
+    assert response.status_code == 200
+    assert response.json()["status_counts"] == {}
+    assert response.json()["average_rating"] is None
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+
+from models import RevokedToken
+from services import tokens
+from services.tokens import (
+    InvalidToken,
+    SigningKeys,
+    create_access_token,
+    verify_access_token,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_revocations(monkeypatch):
+    monkeypatch.setattr(tokens.revocations, "_revoked", {})
+
+
+def test_token_carries_identity_and_verifies_without_db():
+    token = create_access_token(7, "validuser")
+
+    claims = verify_access_token(token)
+
+    assert (claims.id, claims.username) == (7, "validuser")
+    assert len(claims.jti) == 32
+    assert jwt.get_unverified_header(token)["kid"] == tokens.signing_keys.current_kid
+
+
+def test_rotated_keys_still_verify_until_removed(monkeypatch):
+    monkeypatch.setattr(tokens, "signing_keys", SigningKeys("old-secret"))
+    old_token = create_access_token(7, "validuser")
+
+    monkeypatch.setattr(
+        tokens, "signing_keys", SigningKeys("new-secret", ["old-secret"])
+    )
+    assert verify_access_token(old_token).id == 7
+
+    monkeypatch.setattr(tokens, "signing_keys", SigningKeys("new-secret"))
+    with pytest.raises(InvalidToken):
+        verify_access_token(old_token)
+
+
+def test_tokens_without_user_id_are_rejected():
+    legacy = jwt.encode(
+        {"sub": "validuser", "exp": datetime.utcnow() + timedelta(minutes=5)},
+        tokens.signing_keys.current,
+        algorithm=tokens.ALGORITHM,
+    )
+
+    with pytest.raises(InvalidToken):
+        verify_access_token(legacy)
+
+
+def test_sync_picks_up_other_workers_revocations_and_prunes_expired(session):
+    now = datetime.utcnow()
+    session.add(RevokedToken(jti="live", expires_at=now + timedelta(minutes=5)))
+    session.add(RevokedToken(jti="expired", expires_at=now - timedelta(minutes=5)))
+    session.commit()
+
+    tokens.revocations.sync(session)
+
+    assert "live" in tokens.revocations
+    assert "expired" not in tokens.revocations
+    assert session.get(RevokedToken, "expired") is None
+
+
+def test_logout_revokes_token(client, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    assert client.get("/auth/users/me", headers=headers).status_code == 200
+
+    assert client.post("/auth/logout", headers=headers).status_code == 200
+
+    assert client.get("/auth/users/me", headers=headers).status_code == 401
+    assert client.get("/users/", headers=headers).status_code == 401
@@ -0,0 +1,134 @@
+import random
+
+import pytest
+
+from models import Book, UserBookStatus
+from services import trending
+from services.trending import HALF_LIFE, TrendingTracker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_top_matches_brute_force_under_random_events(clock):
+    tracker = TrendingTracker(clock=clock)
+    events = []
+    rng = random.Random(7)
+    for _ in range(2000):
+        clock.now += rng.uniform(0, 600)
+        book_id, weight = rng.randrange(50), rng.choice([1.0, 1.5, 2.0])
+        tracker.record(book_id, weight)
+        events.append((clock.now, book_id, weight))
+
+    expected = {}
+    for at, book_id, weight in events:
+        decayed = weight * 2 ** ((at - clock.now) / HALF_LIFE)
+        expected[book_id] = expected.get(book_id, 0.0) + decayed
+    best = sorted(expected.items(), key=lambda item: -item[1])[:10]
+
+    top = tracker.top(10)
+    assert [book_id for book_id, _ in top] == [book_id for book_id, _ in best]
+    assert [score for _, score in top] == pytest.approx([s for _, s in best])
+    # Stale heap entries are bounded by compaction.
+    assert len(tracker._heap) <= 2 * len(tracker.scores) + 64
+
+
+def test_old_events_decay_behind_recent_ones(clock):
+    tracker = TrendingTracker(clock=clock)
+    for _ in range(4):
+        tracker.record(1)
+    clock.now += 3 * HALF_LIFE
+    tracker.record(2)
+    tracker.record(2)
+
+    assert [book_id for book_id, _ in tracker.top(2)] == [2, 1]
+    assert tracker.top(2)[1][1] == pytest.approx(4 / 8)
+
+
+def test_rebase_keeps_scores(clock):
+    tracker = TrendingTracker(clock=clock)
+    tracker.record(1)
+    clock.now += (trending.REBASE_AFTER + 1) * HALF_LIFE
+    tracker.record(2)
+
+    assert tracker.t0 == clock.now
+    assert tracker.top(5) == [(2, pytest.approx(1.0))]
+
+
+def test_sync_merges_workers_through_the_snapshot(clock, tmp_path):
+    path = str(tmp_path / "trending.json")
+    first, second = TrendingTracker(clock=clock), TrendingTracker(clock=clock)
+    first.record(1)
+    first.record(1)
+    clock.now += HALF_LIFE
+    second.record(2)
+
+    first.sync(path)
+    second.sync(path)
+    first.sync(path)
+
+    for tracker in (first, second):
+        assert dict(tracker.top(5)) == {1: pytest.approx(1.0), 2: pytest.approx(1.0)}
+    restarted = TrendingTracker(clock=clock)
+    restarted.sync(path)
+    assert len(restarted.top(5)) == 2
+
+
+@pytest.fixture
+def fresh_tracker(monkeypatch, clock):
+    tracker = TrendingTracker(clock=clock)
+    monkeypatch.setattr(trending, "tracker", tracker)
+    return tracker
+
+
+def test_saves_and_status_changes_feed_the_endpoint(
+    auth_client, session, create_test_user, test_book, fresh_tracker
+):
+    user_id = create_test_user.id
+    other = Book(title="Emma", bookid="emma")
+    session.add(other)
+    session.commit()
+    for book_id in (test_book.id, other.id):
+        auth_client.post(
+            "/user-books/",
+            json={"user_id": user_id, "book_id": book_id, "status": "to_read"},
+        )
+    auth_client.patch(
+        f"/user-books/{user_id}/{other.id}/", json={"status": "completed", "rating": 4}
+    )
+    # A rating-only edit is not a status change and adds nothing.
+    auth_client.patch(
+        f"/user-books/{user_id}/{other.id}/", json={"status": "completed", "rating": 5}
+    )
+
+    assert fresh_tracker.top(5) == [
+        (other.id, pytest.approx(3.0)),
+        (test_book.id, pytest.approx(1.0)),
+    ]
+    response = auth_client.get("/books/trending")
+    assert [book["id"] for book in response.json()] == ["emma", test_book.bookid]
+
+    cached = auth_client.get(
+        "/books/trending", headers={"If-None-Match": response.headers["ETag"]}
+    )
+    assert cached.status_code == 304
+
+
+def test_rolled_back_changes_are_not_counted(session, create_test_user, fresh_tracker):
+    session.add(
+        UserBookStatus(user_id=create_test_user.id, book_id=999, status="to_read")
+    )
+    session.flush()
+    session.rollback()
+
+    assert fresh_tracker.top(5) == []